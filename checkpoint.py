@@ -0,0 +1,86 @@
+"""
+Append-only checkpoint for resumable enrichment runs
+
+Records one processed filename per line (NDJSON). Each completion is a
+single O_APPEND write instead of rewriting the whole checkpoint, and the
+file is fsynced every `flush_every` completions and again at exit. A
+`legacy_path` JSON list from before the NDJSON format seeds a new checkpoint,
+so runs started under the old format keep their progress.
+
+Usage:
+    checkpoint = Checkpoint("vocab_enrichment_checkpoint.ndjson")
+    if filename not in checkpoint:
+        ...
+        checkpoint.add(filename)
+"""
+
+import atexit
+import os
+
+import orjson
+
+
+class Checkpoint:
+    """Set of processed filenames backed by an append-only NDJSON file."""
+
+    def __init__(self, path: str, flush_every: int = 25, legacy_path: str | None = None):
+        self.path = path
+        self.flush_every = flush_every
+        if legacy_path and not os.path.exists(path) and os.path.exists(legacy_path):
+            self._migrate(legacy_path)
+        self.processed = self._load()
+        self._fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self._unsynced = 0
+        atexit.register(self.close)
+
+    def _migrate(self, legacy_path: str):
+        """Write the legacy JSON list of filenames out as this checkpoint's NDJSON."""
+        with open(legacy_path, "rb") as f:
+            filenames = orjson.loads(f.read())
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(b"".join(orjson.dumps(filename) + b"\n" for filename in filenames))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def _load(self) -> set:
+        if not os.path.exists(self.path):
+            return set()
+        with open(self.path, "rb") as f:
+            # A torn final line from a crash is ignored; that file is redone
+            processed = set()
+            for line in f:
+                try:
+                    processed.add(orjson.loads(line))
+                except orjson.JSONDecodeError:
+                    continue
+            return processed
+
+    def __contains__(self, filename: str) -> bool:
+        return filename in self.processed
+
+    def __len__(self) -> int:
+        return len(self.processed)
+
+    def add(self, filename: str):
+        """Record a processed file; lines are well under PIPE_BUF so appends are atomic."""
+        if filename in self.processed:
+            return
+        self.processed.add(filename)
+        os.write(self._fd, orjson.dumps(filename) + b"\n")
+        self._unsynced += 1
+        if self._unsynced >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        if self._fd is not None and self._unsynced:
+            os.fsync(self._fd)
+            self._unsynced = 0
+
+    def close(self):
+        if self._fd is None:
+            return
+        self.flush()
+        os.close(self._fd)
+        self._fd = None
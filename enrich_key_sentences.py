@@ -8,33 +8,57 @@ for quality extraction.
 Writes `key_sentence` field into each quote in output/*.json files.
 """
 
-import json
+import asyncio
 import os
 import re
-import time
 from pathlib import Path
-from openai import OpenAI
+import orjson
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
 from dotenv import load_dotenv
+from checkpoint import Checkpoint
+from rate_limiter import AsyncLimiter, estimate_tokens, retry_openai
 
 load_dotenv(".env.local")
 
 OUTPUT_DIR = "output"
-CHECKPOINT_FILE = "key_sentences_checkpoint.json"
+CHECKPOINT_FILE = "key_sentences_checkpoint.ndjson"
+LEGACY_CHECKPOINT_FILE = "key_sentences_checkpoint.json"  # JSON list written by earlier versions
 BATCH_SIZE = 10  # Quotes per API call
-
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-
-
-def load_checkpoint() -> set:
-    if os.path.exists(CHECKPOINT_FILE):
-        with open(CHECKPOINT_FILE, "r") as f:
-            return set(json.load(f))
-    return set()
-
-
-def save_checkpoint(processed: set):
-    with open(CHECKPOINT_FILE, "w") as f:
-        json.dump(list(processed), f)
+MAX_TOKENS = 3000
+
+# OpenAI account limits for gpt-4o-mini
+RPM_LIMIT = 500
+TPM_LIMIT = 200_000
+MAX_CONCURRENT = 20
+FILE_CONCURRENCY = 20  # Files processed at once
+
+# Concurrent requests share HTTP/2 connections instead of each opening its
+# own TCP+TLS session
+client = AsyncOpenAI(
+    api_key=os.getenv("OPENAI_API_KEY"),
+    max_retries=0,  # retry_openai() retries instead of the SDK
+    http_client=DefaultAsyncHttpxClient(
+        http2=True,
+        limits=httpx.Limits(max_connections=MAX_CONCURRENT, max_keepalive_connections=MAX_CONCURRENT)
+    )
+)
+limiter = AsyncLimiter(rpm=RPM_LIMIT, tpm=TPM_LIMIT)
+semaphore = asyncio.Semaphore(MAX_CONCURRENT)
+
+
+@retry_openai()
+async def create_completion(messages: list[dict]):
+    """Rate-limited chat completion, retried on transient API errors."""
+    async with semaphore:
+        await limiter.acquire(estimate_tokens(messages, MAX_TOKENS))
+        return await client.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=messages,
+            temperature=0,
+            max_tokens=MAX_TOKENS,
+            response_format={"type": "json_object"},
+        )
 
 
 def extract_key_sentence_local(text: str, vocab_words: list[str]) -> str:
@@ -58,7 +82,7 @@ def extract_key_sentence_local(text: str, vocab_words: list[str]) -> str:
     return sentences[0] if sentences else text[:150]
 
 
-def extract_key_sentences_batch(quotes_batch: list[dict]) -> list[str]:
+async def extract_key_sentences_batch(quotes_batch: list[dict]) -> list[str]:
     """
     Use OpenAI to extract the best key sentence from each quote in a batch.
     """
@@ -75,51 +99,47 @@ def extract_key_sentences_batch(quotes_batch: list[dict]) -> list[str]:
 
     prompt = "\n".join(items)
 
+    messages = [
+        {
+            "role": "system",
+            "content": (
+                "You distill quotes into short key sentences for preview cards. "
+                "Rules:\n"
+                "1. Output must be UNDER 15 WORDS.\n"
+                "2. Must contain at least one of the given vocabulary words.\n"
+                "3. Must capture the core message of the full quote.\n"
+                "4. Remove filler words that start sentences (Well, And, So, "
+                "You know, I think, I mean, Like, Basically, Actually, Right). "
+                "Clean the beginning so the sentence starts strong.\n"
+                "5. It should be a complete, grammatical sentence — not a fragment.\n"
+                "6. You may lightly edit for brevity (trim clauses, remove hedging) "
+                "but keep the speaker's original phrasing for the key idea.\n\n"
+                "Example:\n"
+                "Full quote: \"And it's not bad because it's not well-intentioned, "
+                "but it's bad because it's not contextual. So when someone tells "
+                "you to quit your job...\"\n"
+                "Vocabulary: [\"well-intentioned\", \"contextual\"]\n"
+                "Key sentence: \"It's not bad because it's not well-intentioned, "
+                "but because it's not contextual.\"\n\n"
+                "Return ONLY valid JSON."
+            ),
+        },
+        {
+            "role": "user",
+            "content": (
+                f"For each of the {len(quotes_batch)} quotes below, produce "
+                f"a refined key sentence (under 15 words, no filler words, "
+                f"contains a vocabulary word, captures the core message).\n\n"
+                f"{prompt}\n\n"
+                f'Return JSON: {{"sentences": ["sentence1", "sentence2", ...]}}'
+            ),
+        },
+    ]
+
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {
-                    "role": "system",
-                    "content": (
-                        "You distill quotes into short key sentences for preview cards. "
-                        "Rules:\n"
-                        "1. Output must be UNDER 15 WORDS.\n"
-                        "2. Must contain at least one of the given vocabulary words.\n"
-                        "3. Must capture the core message of the full quote.\n"
-                        "4. Remove filler words that start sentences (Well, And, So, "
-                        "You know, I think, I mean, Like, Basically, Actually, Right). "
-                        "Clean the beginning so the sentence starts strong.\n"
-                        "5. It should be a complete, grammatical sentence — not a fragment.\n"
-                        "6. You may lightly edit for brevity (trim clauses, remove hedging) "
-                        "but keep the speaker's original phrasing for the key idea.\n\n"
-                        "Example:\n"
-                        "Full quote: \"And it's not bad because it's not well-intentioned, "
-                        "but it's bad because it's not contextual. So when someone tells "
-                        "you to quit your job...\"\n"
-                        "Vocabulary: [\"well-intentioned\", \"contextual\"]\n"
-                        "Key sentence: \"It's not bad because it's not well-intentioned, "
-                        "but because it's not contextual.\"\n\n"
-                        "Return ONLY valid JSON."
-                    ),
-                },
-                {
-                    "role": "user",
-                    "content": (
-                        f"For each of the {len(quotes_batch)} quotes below, produce "
-                        f"a refined key sentence (under 15 words, no filler words, "
-                        f"contains a vocabulary word, captures the core message).\n\n"
-                        f"{prompt}\n\n"
-                        f'Return JSON: {{"sentences": ["sentence1", "sentence2", ...]}}'
-                    ),
-                },
-            ],
-            temperature=0,
-            max_tokens=3000,
-            response_format={"type": "json_object"},
-        )
+        response = await create_completion(messages)
 
-        result = json.loads(response.choices[0].message.content)
+        result = orjson.loads(response.choices[0].message.content)
         sentences = result.get("sentences", [])
 
         # Pad if API returned fewer items than expected
@@ -145,67 +165,81 @@ def extract_key_sentences_batch(quotes_batch: list[dict]) -> list[str]:
         return results
 
 
-def process_file(filepath: str) -> bool:
-    with open(filepath, "r", encoding="utf-8") as f:
-        quotes = json.load(f)
+async def process_file(filepath: str) -> bool:
+    with open(filepath, "rb") as f:
+        quotes = orjson.loads(f.read())
 
     # Skip if already enriched
     if quotes and "key_sentence" in quotes[0]:
         return False
 
-    # Process in batches
-    for batch_start in range(0, len(quotes), BATCH_SIZE):
-        batch = quotes[batch_start : batch_start + BATCH_SIZE]
-        sentences = extract_key_sentences_batch(batch)
-
+    # Send all batches concurrently
+    batches = [
+        quotes[batch_start : batch_start + BATCH_SIZE]
+        for batch_start in range(0, len(quotes), BATCH_SIZE)
+    ]
+    results = await asyncio.gather(
+        *(extract_key_sentences_batch(batch) for batch in batches),
+        return_exceptions=True,
+    )
+
+    for batch, sentences in zip(batches, results):
+        if isinstance(sentences, Exception):
+            raise sentences
         for q, sentence in zip(batch, sentences):
             q["key_sentence"] = sentence
 
-        time.sleep(0.3)
-
-    with open(filepath, "w", encoding="utf-8") as f:
-        json.dump(quotes, f, indent=2, ensure_ascii=False)
+    with open(filepath, "wb") as f:
+        f.write(orjson.dumps(quotes, option=orjson.OPT_INDENT_2))
 
     return True
 
 
-def main():
-    processed = load_checkpoint()
+async def amain():
+    processed = Checkpoint(CHECKPOINT_FILE, legacy_path=LEGACY_CHECKPOINT_FILE)
     files = sorted(Path(OUTPUT_DIR).glob("*_quotes.json"))
     total = len(files)
-    enriched = 0
-    skipped = 0
 
     print(f"Extracting key sentences for {total} files...")
     print(f"Already processed: {len(processed)}")
     print("=" * 60)
 
-    for i, filepath in enumerate(files, 1):
-        filename = filepath.name
-        if filename in processed:
-            skipped += 1
-            continue
+    file_semaphore = asyncio.Semaphore(FILE_CONCURRENCY)
+    checkpoint_lock = asyncio.Lock()
 
+    async def run(i: int, filepath: Path) -> str:
+        filename = filepath.name
         speaker = filename.replace("_quotes.json", "").replace("_", " ")
-        print(f"[{i}/{total}] {speaker}...", end=" ")
 
-        try:
-            modified = process_file(str(filepath))
-            if modified:
-                enriched += 1
-                print("done")
-            else:
-                print("already has key_sentence")
+        async with file_semaphore:
+            try:
+                modified = await process_file(str(filepath))
+            except Exception as e:
+                print(f"[{i}/{total}] {speaker}... ERROR: {e}")
+                return "error"
 
+        async with checkpoint_lock:
             processed.add(filename)
-            save_checkpoint(processed)
 
-        except Exception as e:
-            print(f"ERROR: {e}")
+        print(f"[{i}/{total}] {speaker}... {'done' if modified else 'already has key_sentence'}")
+        return "enriched" if modified else "unchanged"
+
+    # Files are independent; the shared limiter keeps total API load in bounds
+    statuses = await asyncio.gather(*(
+        run(i, filepath)
+        for i, filepath in enumerate(files, 1)
+        if filepath.name not in processed
+    ))
+    enriched = statuses.count("enriched")
+    skipped = total - len(statuses)
 
     print("\n" + "=" * 60)
     print(f"Done! Key sentences: {enriched} enriched, {skipped} skipped")
 
 
+def main():
+    asyncio.run(amain())
+
+
 if __name__ == "__main__":
     main()
@@ -8,21 +8,73 @@ OpenAI API for ambiguous cases.
 Output: speaker_profiles_enriched.json
 """
 
-import json
+import codecs
+import functools
 import os
 import re
 import time
 from pathlib import Path
+import orjson
 from openai import OpenAI
 from dotenv import load_dotenv
+from rate_limiter import retry_openai
 
 load_dotenv(".env.local")
 
 SPEAKER_PROFILES_PATH = "speaker_profiles.json"
 TRANSCRIPTS_DIR = "transcripts"
 OUTPUT_PATH = "speaker_profiles_enriched.json"
+INTRO_CHARS = 3000  # Lenny's introduction is always near the top
+READ_CHUNK_BYTES = 4096
+
+client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=0)  # retry_openai() retries instead of the SDK
+
+# Common patterns in Lenny's intros. {name} is replaced per speaker with
+# "(?:Full Name|First)" before compiling.
+INTRO_PATTERN_TEMPLATES = [
+    # "[Name] is [a/an/the] [role] at [company]"
+    r"{name}\s+is\s+(?:a|an|the\s+)?(.+?)\s+at\s+([A-Z][^\.,]+)",
+    # "[Name] is [a/an/the] [role] of [company]"
+    r"{name}\s+is\s+(?:a|an|the\s+)?(.+?)\s+of\s+([A-Z][^\.,]+)",
+    # "was [role] at [company]"
+    r"{name}\s+was\s+(?:a|an|the\s+)?(.+?)\s+at\s+([A-Z][^\.,]+)",
+    # "[Name], [role] at [company]"
+    r"{name},\s+(.+?)\s+at\s+([A-Z][^\.,]+)",
+    # "who is [role] at [company]"
+    r"who\s+is\s+(?:a|an|the\s+)?(.+?)\s+at\s+([A-Z][^\.,]+)",
+    # "[Name] is [role] and [something] at [company]"
+    r"{name}\s+is\s+(.+?)\s+at\s+([A-Z][^\.,]+)",
+]
+
+ROLE_TRAILING_WORD = re.compile(r'\s+(and|or|the|a|an)\s*$')
+COMPANY_TRAILING_PUNCT = re.compile(r'[,.\s]+$')
+
+
+# All templates as one alternation: a single scan tells whether any matches
+COMBINED_INTRO_TEMPLATE = "|".join(f"(?:{template})" for template in INTRO_PATTERN_TEMPLATES)
+
+
+@functools.lru_cache(maxsize=4096)
+def compile_intro_patterns(speaker_name: str) -> tuple[re.Pattern, list[re.Pattern]]:
+    """Compile the combined and the individual intro patterns for a speaker (cached per speaker)."""
+    first_name = speaker_name.split()[0]
+    name = f"(?:{re.escape(speaker_name)}|{re.escape(first_name)})"
+    combined = re.compile(COMBINED_INTRO_TEMPLATE.replace("{name}", name), re.IGNORECASE)
+    patterns = [re.compile(t.replace("{name}", name), re.IGNORECASE) for t in INTRO_PATTERN_TEMPLATES]
+    return combined, patterns
+
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+def read_intro(transcript_path: str) -> str:
+    """Read just the opening INTRO_CHARS characters of a transcript, 4 KiB at a time."""
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+    text = ""
+    with open(transcript_path, "rb") as f:
+        while len(text) < INTRO_CHARS:
+            chunk = f.read(READ_CHUNK_BYTES)
+            if not chunk:
+                break
+            text += decoder.decode(chunk)
+    return text[:INTRO_CHARS]
 
 
 def extract_role_company_from_transcript(transcript_text: str, speaker_name: str) -> dict:
@@ -31,62 +83,54 @@ def extract_role_company_from_transcript(transcript_text: str, speaker_name: str
     Lenny typically introduces guests with their title and company.
     """
     # Look for Lenny's introduction section (usually within first 2000 chars)
-    intro_section = transcript_text[:3000]
+    intro_section = transcript_text[:INTRO_CHARS]
+    combined, patterns = compile_intro_patterns(speaker_name)
 
-    # Common patterns in Lenny's intros:
-    # "Today my guest is [Name]. [Name] is [role] at [company]"
-    # "[Name] is the [role] at [company]"
-    # "[Name], [role] at [company]"
-    # "who is [role] at [company]"
-
-    first_name = speaker_name.split()[0]
-    last_name = speaker_name.split()[-1] if len(speaker_name.split()) > 1 else ""
-
-    patterns = [
-        # "[Name] is [a/an/the] [role] at [company]"
-        rf"(?:{re.escape(speaker_name)}|{re.escape(first_name)})\s+is\s+(?:a|an|the\s+)?(.+?)\s+at\s+([A-Z][^\.,]+)",
-        # "[Name] is [a/an/the] [role] of [company]"
-        rf"(?:{re.escape(speaker_name)}|{re.escape(first_name)})\s+is\s+(?:a|an|the\s+)?(.+?)\s+of\s+([A-Z][^\.,]+)",
-        # "was [role] at [company]"
-        rf"(?:{re.escape(speaker_name)}|{re.escape(first_name)})\s+was\s+(?:a|an|the\s+)?(.+?)\s+at\s+([A-Z][^\.,]+)",
-        # "[Name], [role] at [company]"
-        rf"(?:{re.escape(speaker_name)}|{re.escape(first_name)}),\s+(.+?)\s+at\s+([A-Z][^\.,]+)",
-        # "who is [role] at [company]"
-        rf"who\s+is\s+(?:a|an|the\s+)?(.+?)\s+at\s+([A-Z][^\.,]+)",
-        # "[Name] is [role] and [something] at [company]"
-        rf"(?:{re.escape(speaker_name)}|{re.escape(first_name)})\s+is\s+(.+?)\s+at\s+([A-Z][^\.,]+)",
-    ]
+    # Most misses are settled by one scan instead of six
+    if not combined.search(intro_section):
+        return None
 
+    # Templates are ranked, so the earliest template wins over the earliest position
     for pattern in patterns:
-        match = re.search(pattern, intro_section, re.IGNORECASE)
+        match = pattern.search(intro_section)
         if match:
             role = match.group(1).strip()
             company = match.group(2).strip()
             # Clean up role - remove trailing articles/prepositions
-            role = re.sub(r'\s+(and|or|the|a|an)\s*$', '', role).strip()
+            role = ROLE_TRAILING_WORD.sub('', role).strip()
             # Clean up company - remove trailing punctuation
-            company = re.sub(r'[,.\s]+$', '', company).strip()
+            company = COMPANY_TRAILING_PUNCT.sub('', company).strip()
             if len(role) > 3 and len(company) > 1 and len(role) < 100:
                 return {"role": role, "company": company}
 
     return None
 
 
+@retry_openai()
+def create_completion(messages: list[dict]):
+    """Chat completion, retried on transient API errors."""
+    return client.chat.completions.create(
+        model="gpt-4o-mini",
+        messages=messages,
+        temperature=0,
+        max_tokens=100,
+        response_format={"type": "json_object"}
+    )
+
+
 def extract_role_company_with_api(transcript_text: str, speaker_name: str) -> dict:
     """Use OpenAI API to extract role and company when regex fails."""
-    intro_section = transcript_text[:3000]
+    intro_section = transcript_text[:INTRO_CHARS]
 
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You extract speaker information from podcast transcripts. Return ONLY valid JSON."
-                },
-                {
-                    "role": "user",
-                    "content": f"""From this transcript introduction, extract the job title/role and company for "{speaker_name}".
+        response = create_completion([
+            {
+                "role": "system",
+                "content": "You extract speaker information from podcast transcripts. Return ONLY valid JSON."
+            },
+            {
+                "role": "user",
+                "content": f"""From this transcript introduction, extract the job title/role and company for "{speaker_name}".
 
 Transcript excerpt:
 {intro_section}
@@ -95,14 +139,10 @@ Return JSON in this exact format:
 {{"role": "their job title", "company": "their company name"}}
 
 If you cannot determine the role, use "Guest". If you cannot determine the company, use ""."""
-                }
-            ],
-            temperature=0,
-            max_tokens=100,
-            response_format={"type": "json_object"}
-        )
-
-        result = json.loads(response.choices[0].message.content)
+            }
+        ])
+
+        result = orjson.loads(response.choices[0].message.content)
         return {
             "role": result.get("role", "Guest"),
             "company": result.get("company", "")
@@ -114,8 +154,8 @@ If you cannot determine the role, use "Guest". If you cannot determine the compa
 
 def main():
     # Load existing profiles
-    with open(SPEAKER_PROFILES_PATH, "r", encoding="utf-8") as f:
-        profiles = json.load(f)
+    with open(SPEAKER_PROFILES_PATH, "rb") as f:
+        profiles = orjson.loads(f.read())
 
     enriched = {}
     total = len(profiles)
@@ -136,8 +176,7 @@ def main():
         role_company = None
 
         if os.path.exists(transcript_path):
-            with open(transcript_path, "r", encoding="utf-8") as f:
-                transcript_text = f.read()
+            transcript_text = read_intro(transcript_path)
 
             # Try regex first
             role_company = extract_role_company_from_transcript(transcript_text, speaker)
@@ -170,8 +209,8 @@ def main():
         }
 
     # Save enriched profiles
-    with open(OUTPUT_PATH, "w", encoding="utf-8") as f:
-        json.dump(enriched, f, indent=2, ensure_ascii=False)
+    with open(OUTPUT_PATH, "wb") as f:
+        f.write(orjson.dumps(enriched, option=orjson.OPT_INDENT_2))
 
     print("\n" + "=" * 60)
     print(f"Done! Enriched profiles saved to {OUTPUT_PATH}")
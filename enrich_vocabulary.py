@@ -5,58 +5,161 @@ Reads all quote JSON files from output/ and enriches each quote's
 vocabulary_highlights (string array) into structured vocabulary objects
 with definition, businessContext, and exampleUsage.
 
-Uses OpenAI API with batching (5-10 words per call) for efficiency.
+Uses OpenAI API with row-marshaling: the word lists of several quotes are
+packed into one call and the results demuxed back by quote_id. Definitions
+are cached per word in vocab_cache.json, so only words never seen before
+are sent to the API; new definitions are appended to vocab_cache.ndjson as
+files finish and folded into the JSON once at the end of the run.
 Writes enriched vocabulary back into each quote JSON file.
 """
 
-import json
+import asyncio
 import os
-import time
 from pathlib import Path
-from openai import OpenAI
+import orjson
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
 from dotenv import load_dotenv
+from checkpoint import Checkpoint
+from rate_limiter import AsyncLimiter, estimate_tokens, retry_openai
 
 load_dotenv(".env.local")
 
 OUTPUT_DIR = "output"
-CHECKPOINT_FILE = "vocab_enrichment_checkpoint.json"
-BATCH_SIZE = 6  # Words per API call
-
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-
-
-def load_checkpoint() -> set:
-    """Load set of already-processed files."""
-    if os.path.exists(CHECKPOINT_FILE):
-        with open(CHECKPOINT_FILE, "r") as f:
-            return set(json.load(f))
-    return set()
+CHECKPOINT_FILE = "vocab_enrichment_checkpoint.ndjson"
+LEGACY_CHECKPOINT_FILE = "vocab_enrichment_checkpoint.json"  # JSON list written by earlier versions
+VOCAB_CACHE_FILE = "vocab_cache.json"
+VOCAB_CACHE_LOG_FILE = "vocab_cache.ndjson"  # Definitions added since the last full save
+BATCH_SIZE = 6  # Words per API call (Batch API mode)
+MAX_TOKENS = 2000
+QUOTES_PER_CALL = 6  # Quotes packed into one marshalled API call
+MARSHAL_TOKEN_BUDGET = 6000  # Max prompt tokens per marshalled call
+MAX_TOKENS_PER_WORD = 300  # Output budget per requested word
+MODEL_MAX_OUTPUT_TOKENS = 16_384  # gpt-4o-mini's completion limit
+
+# OpenAI account limits for gpt-4o-mini
+RPM_LIMIT = 500
+TPM_LIMIT = 200_000
+MAX_CONCURRENT = 20
+FILE_CONCURRENCY = 20  # Files processed at once
+
+# Concurrent requests share HTTP/2 connections instead of each opening its
+# own TCP+TLS session
+client = AsyncOpenAI(
+    api_key=os.getenv("OPENAI_API_KEY"),
+    max_retries=0,  # retry_openai() retries instead of the SDK
+    http_client=DefaultAsyncHttpxClient(
+        http2=True,
+        limits=httpx.Limits(max_connections=MAX_CONCURRENT, max_keepalive_connections=MAX_CONCURRENT)
+    )
+)
+limiter = AsyncLimiter(rpm=RPM_LIMIT, tpm=TPM_LIMIT)
+semaphore = asyncio.Semaphore(MAX_CONCURRENT)
+
+# Definitions are context-independent, so each word is only requested once:
+# normalized word -> {definition, businessContext, exampleUsage}
+vocab_cache: dict[str, dict] = {}
+# (key, definition) pairs cached since they were last appended to the log
+new_cache_entries: list[tuple[str, dict]] = []
+
+
+def cache_key(word: str) -> str:
+    return word.lower().strip()
+
+
+def load_vocab_cache() -> dict:
+    """Load cached word definitions from previous runs."""
+    cache = {}
+    if os.path.exists(VOCAB_CACHE_FILE):
+        with open(VOCAB_CACHE_FILE, "rb") as f:
+            cache = orjson.loads(f.read())
+
+    # Definitions logged by a run that stopped before its final save
+    if os.path.exists(VOCAB_CACHE_LOG_FILE):
+        with open(VOCAB_CACHE_LOG_FILE, "rb") as f:
+            for line in f:
+                try:
+                    key, definition = orjson.loads(line)
+                except (TypeError, ValueError):
+                    continue  # Torn last line from a crash mid-append
+                cache[key] = definition
+    return cache
+
+
+def append_vocab_cache():
+    """Append the definitions cached since the last call to the log."""
+    if not new_cache_entries:
+        return
+    with open(VOCAB_CACHE_LOG_FILE, "ab") as f:
+        f.write(b"".join(orjson.dumps([key, definition]) + b"\n" for key, definition in new_cache_entries))
+    new_cache_entries.clear()
+
+
+def save_vocab_cache():
+    """Persist every cached word definition in one file and drop the log."""
+    tmp_path = VOCAB_CACHE_FILE + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(orjson.dumps(vocab_cache, option=orjson.OPT_INDENT_2))
+    os.replace(tmp_path, VOCAB_CACHE_FILE)
+    if os.path.exists(VOCAB_CACHE_LOG_FILE):
+        os.remove(VOCAB_CACHE_LOG_FILE)
+
+
+def cache_vocabulary(vocabulary: list[dict]):
+    """Write API-generated definitions through to the cache, ignoring stubs."""
+    for item in vocabulary:
+        if item["definition"]:
+            key = cache_key(item["word"])
+            vocab_cache[key] = {
+                "definition": item["definition"],
+                "businessContext": item["businessContext"],
+                "exampleUsage": item["exampleUsage"]
+            }
+            new_cache_entries.append((key, vocab_cache[key]))
+
+
+def merge_vocabulary(words: list[str], generated: list[dict]) -> list[dict]:
+    """Assemble a quote's vocabulary in highlight order from the cache and API results."""
+    by_key = {cache_key(item["word"]): item for item in generated}
+    vocabulary = []
+    for word in words:
+        key = cache_key(word)
+        if key in by_key:
+            vocabulary.append(by_key[key])
+        elif key in vocab_cache:
+            vocabulary.append({"word": word, **vocab_cache[key]})
+        else:
+            vocabulary.append(stub_vocabulary([word])[0])
+    return vocabulary
 
 
-def save_checkpoint(processed: set):
-    """Save checkpoint of processed files."""
-    with open(CHECKPOINT_FILE, "w") as f:
-        json.dump(list(processed), f)
+@retry_openai()
+async def create_completion(messages: list[dict], max_tokens: int = MAX_TOKENS):
+    """Rate-limited chat completion, retried on transient API errors."""
+    async with semaphore:
+        await limiter.acquire(estimate_tokens(messages, max_tokens))
+        return await client.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=messages,
+            temperature=0.3,
+            max_tokens=max_tokens,
+            response_format={"type": "json_object"}
+        )
 
 
-def enrich_vocabulary_batch(words: list[str], quote_text: str, context: str) -> list[dict]:
-    """
-    Generate structured vocabulary objects for a batch of words using OpenAI.
-    """
+def build_vocabulary_messages(words: list[str], quote_text: str, context: str) -> list[dict]:
+    """Build the chat messages asking for definitions of a batch of words."""
     words_list = "\n".join(f"- {w}" for w in words)
 
-    try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {
-                    "role": "system",
-                    "content": """You are a business English vocabulary expert. Generate structured vocabulary definitions
+    return [
+        {
+            "role": "system",
+            "content": """You are a business English vocabulary expert. Generate structured vocabulary definitions
 for words/phrases used in business podcast contexts. Return ONLY valid JSON."""
-                },
-                {
-                    "role": "user",
-                    "content": f"""For each word/phrase below, generate a vocabulary object with:
+        },
+        {
+            "role": "user",
+            "content": f"""For each word/phrase below, generate a vocabulary object with:
 - word: the original word/phrase
 - definition: clear, concise definition (1-2 sentences)
 - businessContext: how this is specifically used in business/tech/startup settings (1-2 sentences)
@@ -72,54 +175,169 @@ Surrounding context:
 "{context[:500]}"
 
 Return a JSON array of objects with keys: word, definition, businessContext, exampleUsage"""
-                }
-            ],
-            temperature=0.3,
-            max_tokens=2000,
-            response_format={"type": "json_object"}
-        )
+        }
+    ]
+
+
+def parse_vocabulary_response(content: str) -> list[dict]:
+    """Parse the model's JSON reply into clean vocabulary objects."""
+    result = orjson.loads(content)
+
+    # Handle both {vocabulary: [...]} and [...] formats
+    if isinstance(result, dict):
+        vocab_list = result.get("vocabulary", result.get("words", result.get("items", [])))
+        if not isinstance(vocab_list, list):
+            # Try to find any list value in the dict
+            for v in result.values():
+                if isinstance(v, list):
+                    vocab_list = v
+                    break
+    elif isinstance(result, list):
+        vocab_list = result
+    else:
+        vocab_list = []
+
+    return clean_vocabulary(vocab_list)
+
+
+def clean_vocabulary(vocab_list: list) -> list[dict]:
+    """Validate and clean each vocabulary item returned by the model."""
+    enriched = []
+    for item in vocab_list:
+        if isinstance(item, dict) and "word" in item:
+            enriched.append({
+                "word": item["word"],
+                "definition": item.get("definition", ""),
+                "businessContext": item.get("businessContext", ""),
+                "exampleUsage": item.get("exampleUsage", "")
+            })
+
+    return enriched
+
+
+def stub_vocabulary(words: list[str]) -> list[dict]:
+    """Basic vocabulary objects with empty fields, used when the API fails."""
+    return [{"word": w, "definition": "", "businessContext": "", "exampleUsage": ""} for w in words]
+
+
+def build_marshalled_messages(jobs: list[dict]) -> list[dict]:
+    """Build one prompt covering several quotes, each in its own numbered section."""
+    sections = []
+    for job in jobs:
+        words_list = "\n".join(f"- {w}" for w in job["words"])
+        sections.append(f"""### Quote {job['quote_id']}
+Words/Phrases:
+{words_list}
 
-        result = json.loads(response.choices[0].message.content)
-
-        # Handle both {vocabulary: [...]} and [...] formats
-        if isinstance(result, dict):
-            vocab_list = result.get("vocabulary", result.get("words", result.get("items", [])))
-            if not isinstance(vocab_list, list):
-                # Try to find any list value in the dict
-                for v in result.values():
-                    if isinstance(v, list):
-                        vocab_list = v
-                        break
-        elif isinstance(result, list):
-            vocab_list = result
-        else:
-            vocab_list = []
+Original quote for context:
+"{job['text']}"
+
+Surrounding context:
+"{job['context'][:500]}\"""")
+    quote_sections = "\n\n".join(sections)
+
+    return [
+        {
+            "role": "system",
+            "content": """You are a business English vocabulary expert. Generate structured vocabulary definitions
+for words/phrases used in business podcast contexts. Return ONLY valid JSON."""
+        },
+        {
+            "role": "user",
+            "content": f"""For every word/phrase in each quote section below, generate a vocabulary object with:
+- word: the original word/phrase
+- definition: clear, concise definition (1-2 sentences)
+- businessContext: how this is specifically used in business/tech/startup settings (1-2 sentences)
+- exampleUsage: a natural example sentence using this word in a business meeting or email
+
+{quote_sections}
 
-        # Validate and clean each item
-        enriched = []
-        for item in vocab_list:
-            if isinstance(item, dict) and "word" in item:
-                enriched.append({
-                    "word": item["word"],
-                    "definition": item.get("definition", ""),
-                    "businessContext": item.get("businessContext", ""),
-                    "exampleUsage": item.get("exampleUsage", "")
-                })
+Return JSON: {{"results": [{{"quote_id": <quote number>, "vocabulary": [{{"word": ..., "definition": ..., "businessContext": ..., "exampleUsage": ...}}]}}, ...]}}
+Include one entry in "results" for every quote section."""
+        }
+    ]
 
-        return enriched
 
+async def enrich_vocab_marshalled(jobs: list[dict]) -> dict[int, list[dict]]:
+    """
+    Generate structured vocabulary for several quotes in a single OpenAI call.
+
+    Each job is {quote_id, words, text, context}. Returns quote_id -> vocabulary;
+    quotes the model skipped (or a failed call) get basic stubs.
+    """
+    messages = build_marshalled_messages(jobs)
+    # Requests above the model's output limit are rejected outright
+    max_tokens = min(MAX_TOKENS_PER_WORD * sum(len(job["words"]) for job in jobs), MODEL_MAX_OUTPUT_TOKENS)
+    by_id = {}
+
+    try:
+        response = await create_completion(messages, max_tokens=max_tokens)
+        result = orjson.loads(response.choices[0].message.content)
+        entries = result.get("results", [])
     except Exception as e:
         print(f"    API error: {e}")
-        # Return basic stubs on failure
-        return [{"word": w, "definition": "", "businessContext": "", "exampleUsage": ""} for w in words]
+        entries = []
 
-
-def process_file(filepath: str) -> bool:
+    # A malformed entry only costs its own quote, not the whole group
+    for entry in entries if isinstance(entries, list) else []:
+        if not isinstance(entry, dict):
+            continue
+        try:
+            quote_id = int(entry["quote_id"])
+        except (KeyError, TypeError, ValueError):
+            continue
+        vocabulary = entry.get("vocabulary", [])
+        if isinstance(vocabulary, list):
+            by_id[quote_id] = clean_vocabulary(vocabulary)
+
+    return {job["quote_id"]: by_id.get(job["quote_id"]) or stub_vocabulary(job["words"]) for job in jobs}
+
+
+def group_jobs(jobs: list[dict]) -> list[list[dict]]:
+    """Pack quote jobs into groups bounded by QUOTES_PER_CALL, MARSHAL_TOKEN_BUDGET and MODEL_MAX_OUTPUT_TOKENS."""
+    groups = []
+    current = []
+    current_tokens = 0
+    current_words = 0
+
+    for job in jobs:
+        job_tokens = estimate_tokens([{"content": "\n".join(job["words"]) + job["text"] + job["context"][:500]}])
+        if current and (len(current) >= QUOTES_PER_CALL
+                        or current_tokens + job_tokens > MARSHAL_TOKEN_BUDGET
+                        or (current_words + len(job["words"])) * MAX_TOKENS_PER_WORD > MODEL_MAX_OUTPUT_TOKENS):
+            groups.append(current)
+            current = []
+            current_tokens = 0
+            current_words = 0
+        current.append(job)
+        current_tokens += job_tokens
+        current_words += len(job["words"])
+
+    if current:
+        groups.append(current)
+    return groups
+
+
+def is_enriched(quote: dict) -> bool:
+    """True if the quote already carries structured vocabulary from a previous run."""
+    vocabulary = quote.get("vocabulary")
+    if not isinstance(vocabulary, list):
+        return False
+    return not vocabulary or (isinstance(vocabulary[0], dict) and "definition" in vocabulary[0])
+
+
+async def process_file(filepath: str) -> bool:
     """Process a single quote JSON file, enriching its vocabulary."""
-    with open(filepath, "r", encoding="utf-8") as f:
-        quotes = json.load(f)
+    with open(filepath, "rb") as f:
+        quotes = orjson.loads(f.read())
+
+    # Skip if already enriched: every quote gets "vocabulary" in the same write,
+    # so the first quote settles it without walking the file
+    if quotes and is_enriched(quotes[0]):
+        return False
 
     modified = False
+    jobs = []
 
     for qi, quote in enumerate(quotes):
         vocab_highlights = quote.get("vocabulary_highlights", [])
@@ -132,65 +350,86 @@ def process_file(filepath: str) -> bool:
             quote["vocabulary"] = []
             continue
 
-        # Process in batches
-        all_enriched = []
-        for batch_start in range(0, len(vocab_highlights), BATCH_SIZE):
-            batch = vocab_highlights[batch_start:batch_start + BATCH_SIZE]
-            enriched = enrich_vocabulary_batch(
-                batch,
-                quote.get("text", ""),
-                quote.get("context", "")
-            )
-            all_enriched.extend(enriched)
-            time.sleep(0.5)  # Rate limiting
+        missing = [w for w in vocab_highlights if cache_key(w) not in vocab_cache]
+        if not missing:
+            quote["vocabulary"] = merge_vocabulary(vocab_highlights, [])
+            modified = True
+            continue
 
-        # Store enriched vocabulary in new field
-        quote["vocabulary"] = all_enriched
+        jobs.append({
+            "quote_id": qi,
+            "words": missing,
+            "text": quote.get("text", ""),
+            "context": quote.get("context", "")
+        })
         modified = True
 
+    # One API call per group of quotes, all groups sent concurrently
+    results = await asyncio.gather(
+        *(enrich_vocab_marshalled(group) for group in group_jobs(jobs)),
+        return_exceptions=True
+    )
+
+    # Demux results back to quotes by quote_id
+    for vocab_by_id in results:
+        if isinstance(vocab_by_id, Exception):
+            raise vocab_by_id
+        for qi, vocabulary in vocab_by_id.items():
+            cache_vocabulary(vocabulary)
+            quotes[qi]["vocabulary"] = merge_vocabulary(
+                quotes[qi]["vocabulary_highlights"], vocabulary
+            )
+
     if modified:
-        with open(filepath, "w", encoding="utf-8") as f:
-            json.dump(quotes, f, indent=2, ensure_ascii=False)
+        with open(filepath, "wb") as f:
+            f.write(orjson.dumps(quotes, option=orjson.OPT_INDENT_2))
 
     return modified
 
 
-def main():
-    processed = load_checkpoint()
+async def amain():
+    processed = Checkpoint(CHECKPOINT_FILE, legacy_path=LEGACY_CHECKPOINT_FILE)
+    vocab_cache.update(load_vocab_cache())
     files = sorted(Path(OUTPUT_DIR).glob("*_quotes.json"))
     total = len(files)
-    already_done = 0
-    enriched_count = 0
-    error_count = 0
 
     print(f"Enriching vocabulary for {total} quote files...")
     print(f"Already processed: {len(processed)} files")
+    print(f"Cached definitions: {len(vocab_cache)} words")
     print("=" * 60)
 
-    for i, filepath in enumerate(files, 1):
-        filename = filepath.name
-
-        if filename in processed:
-            already_done += 1
-            continue
+    file_semaphore = asyncio.Semaphore(FILE_CONCURRENCY)
+    checkpoint_lock = asyncio.Lock()
 
+    async def run(i: int, filepath: Path) -> str:
+        filename = filepath.name
         speaker = filename.replace("_quotes.json", "").replace("_", " ")
-        print(f"[{i}/{total}] {speaker}...", end=" ")
 
-        try:
-            modified = process_file(str(filepath))
-            if modified:
-                enriched_count += 1
-                print("enriched")
-            else:
-                print("already structured")
+        async with file_semaphore:
+            try:
+                modified = await process_file(str(filepath))
+            except Exception as e:
+                print(f"[{i}/{total}] {speaker}... ERROR: {e}")
+                return "error"
 
+        async with checkpoint_lock:
+            # Only this file's new definitions are written, not the whole cache
+            append_vocab_cache()
             processed.add(filename)
-            save_checkpoint(processed)
 
-        except Exception as e:
-            error_count += 1
-            print(f"ERROR: {e}")
+        print(f"[{i}/{total}] {speaker}... {'enriched' if modified else 'already structured'}")
+        return "enriched" if modified else "unchanged"
+
+    # Files are independent; the shared limiter keeps total API load in bounds
+    statuses = await asyncio.gather(*(
+        run(i, filepath)
+        for i, filepath in enumerate(files, 1)
+        if filepath.name not in processed
+    ))
+    save_vocab_cache()
+    enriched_count = statuses.count("enriched")
+    error_count = statuses.count("error")
+    already_done = total - len(statuses)
 
     print("\n" + "=" * 60)
     print(f"Done! Vocabulary enrichment complete.")
@@ -200,5 +439,9 @@ def main():
     print(f"  Total files:    {total}")
 
 
+def main():
+    asyncio.run(amain())
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,238 @@
+"""
+Phase 1B (Batch API): Enrich Vocabulary with Definitions
+
+Same enrichment as enrich_vocabulary.py, but every word batch is submitted
+as one OpenAI Batch API job instead of thousands of synchronous calls.
+Batch jobs cost ~50% less and are not bound by the per-minute rate limits,
+which makes this the right mode for full-corpus overnight runs. Results
+arrive within the 24h completion window.
+
+Usage:
+    python enrich_vocabulary_batch_api.py                  # submit, wait, apply
+    python enrich_vocabulary_batch_api.py --resume BATCH_ID  # wait for an existing job
+"""
+
+import argparse
+import hashlib
+import os
+import time
+from collections import defaultdict
+from pathlib import Path
+import orjson
+from openai import OpenAI
+from dotenv import load_dotenv
+
+from enrich_vocabulary import (
+    BATCH_SIZE,
+    MAX_TOKENS,
+    OUTPUT_DIR,
+    build_vocabulary_messages,
+    parse_vocabulary_response,
+    stub_vocabulary,
+)
+
+load_dotenv(".env.local")
+
+BATCH_INPUT_FILE = "vocab_batch_input.jsonl"
+POLL_INTERVAL_SECONDS = 60
+TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+
+def highlights_hash(vocab_highlights: list) -> str:
+    """Short hash of a quote's highlights, so results only land on the words they define."""
+    return hashlib.sha256(orjson.dumps(vocab_highlights)).hexdigest()[:12]
+
+
+def collect_requests() -> list[dict]:
+    """Build one Batch API request per (file, quote, word batch) still missing vocabulary.
+
+    Custom IDs are "<filename>:<quote index>:<batch index>:<highlights hash>".
+    """
+    requests = []
+
+    for filepath in sorted(Path(OUTPUT_DIR).glob("*_quotes.json")):
+        with open(filepath, "rb") as f:
+            quotes = orjson.loads(f.read())
+
+        for qi, quote in enumerate(quotes):
+            vocab_highlights = quote.get("vocabulary_highlights", [])
+
+            # Skip quotes that are already enriched or have nothing to enrich
+            if "vocabulary" in quote or not vocab_highlights:
+                continue
+            if isinstance(vocab_highlights[0], dict):
+                continue
+
+            highlights_id = highlights_hash(vocab_highlights)
+            for batch_idx, batch_start in enumerate(range(0, len(vocab_highlights), BATCH_SIZE)):
+                batch = vocab_highlights[batch_start:batch_start + BATCH_SIZE]
+                requests.append({
+                    "custom_id": f"{filepath.name}:{qi}:{batch_idx}:{highlights_id}",
+                    "method": "POST",
+                    "url": "/v1/chat/completions",
+                    "body": {
+                        "model": "gpt-4o-mini",
+                        "messages": build_vocabulary_messages(
+                            batch,
+                            quote.get("text", ""),
+                            quote.get("context", "")
+                        ),
+                        "temperature": 0.3,
+                        "max_tokens": MAX_TOKENS,
+                        "response_format": {"type": "json_object"}
+                    }
+                })
+
+    return requests
+
+
+def submit_batch(requests: list[dict]) -> str:
+    """Write requests to JSONL, upload, and create the batch job. Returns the batch ID."""
+    with open(BATCH_INPUT_FILE, "wb") as f:
+        for request in requests:
+            f.write(orjson.dumps(request) + b"\n")
+
+    with open(BATCH_INPUT_FILE, "rb") as f:
+        input_file = client.files.create(file=f, purpose="batch")
+
+    batch = client.batches.create(
+        input_file_id=input_file.id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h"
+    )
+    return batch.id
+
+
+def wait_for_batch(batch_id: str):
+    """Poll until the batch reaches a terminal status."""
+    while True:
+        batch = client.batches.retrieve(batch_id)
+        counts = batch.request_counts
+        print(f"  Status: {batch.status} "
+              f"({counts.completed}/{counts.total} done, {counts.failed} failed)")
+
+        if batch.status in TERMINAL_STATUSES:
+            return batch
+
+        time.sleep(POLL_INTERVAL_SECONDS)
+
+
+def download_results(batch) -> dict:
+    """Download the output file and return {filename: {(qi, highlights hash): {batch_idx: vocabulary}}}."""
+    results = defaultdict(lambda: defaultdict(dict))
+    if not batch.output_file_id:
+        return results
+
+    content = client.files.content(batch.output_file_id).text
+    for line in content.splitlines():
+        if not line.strip():
+            continue
+
+        record = orjson.loads(line)
+        try:
+            filename, qi, batch_idx, highlights_id = record["custom_id"].rsplit(":", 3)
+        except ValueError:
+            print(f"    Unrecognized custom_id {record['custom_id']}")
+            continue
+        response = record.get("response") or {}
+
+        if response.get("status_code") != 200:
+            continue
+
+        try:
+            body = response["body"]
+            vocabulary = parse_vocabulary_response(body["choices"][0]["message"]["content"])
+        except (KeyError, IndexError, orjson.JSONDecodeError) as e:
+            print(f"    Bad response for {record['custom_id']}: {e}")
+            continue
+
+        results[filename][(int(qi), highlights_id)][int(batch_idx)] = vocabulary
+
+    return results
+
+
+def apply_results(results: dict) -> tuple[int, int]:
+    """Write batch results back into the quote files. Returns (files, quotes) updated.
+
+    A quote is skipped if it no longer exists, already has vocabulary, or its
+    highlights changed since the batch was submitted.
+    """
+    files_updated = 0
+    quotes_updated = 0
+
+    for filename, quote_results in results.items():
+        filepath = Path(OUTPUT_DIR) / filename
+        with open(filepath, "rb") as f:
+            quotes = orjson.loads(f.read())
+        updated = 0
+
+        for (qi, highlights_id), batches in quote_results.items():
+            if qi >= len(quotes) or "vocabulary" in quotes[qi]:
+                continue
+            quote = quotes[qi]
+            vocab_highlights = quote.get("vocabulary_highlights", [])
+            if highlights_hash(vocab_highlights) != highlights_id:
+                continue
+
+            # Reassemble batches in order; stub any batch that failed
+            vocabulary = []
+            for batch_idx, batch_start in enumerate(range(0, len(vocab_highlights), BATCH_SIZE)):
+                if batch_idx in batches:
+                    vocabulary.extend(batches[batch_idx])
+                else:
+                    vocabulary.extend(stub_vocabulary(vocab_highlights[batch_start:batch_start + BATCH_SIZE]))
+
+            quote["vocabulary"] = vocabulary
+            updated += 1
+
+        if not updated:
+            continue
+
+        with open(filepath, "wb") as f:
+            f.write(orjson.dumps(quotes, option=orjson.OPT_INDENT_2))
+        files_updated += 1
+        quotes_updated += updated
+
+    return files_updated, quotes_updated
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Enrich vocabulary via the OpenAI Batch API")
+    parser.add_argument("--resume", metavar="BATCH_ID", help="Wait for and apply an existing batch")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    if args.resume:
+        batch_id = args.resume
+        print(f"Resuming batch {batch_id}")
+    else:
+        requests = collect_requests()
+        if not requests:
+            print("All vocabulary is already enriched! Nothing to do.")
+            return
+
+        print(f"Submitting {len(requests)} requests to the Batch API...")
+        batch_id = submit_batch(requests)
+        print(f"Batch created: {batch_id}")
+        print(f"(Resume later with: python enrich_vocabulary_batch_api.py --resume {batch_id})")
+
+    print("=" * 60)
+    batch = wait_for_batch(batch_id)
+
+    if batch.status != "completed":
+        print(f"\nBatch ended with status '{batch.status}'. No files were changed.")
+        return
+
+    results = download_results(batch)
+    files_updated, quotes_updated = apply_results(results)
+
+    print("\n" + "=" * 60)
+    print(f"Done! Vocabulary enrichment complete.")
+    print(f"  Files updated:  {files_updated}")
+    print(f"  Quotes updated: {quotes_updated}")
+
+
+if __name__ == "__main__":
+    main()
@@ -14,10 +14,16 @@ Output:
   - fluent-stakeholder/public/data/quotes.json
 """
 
-import json
+import functools
+import heapq
 import os
 import re
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+import msgspec
+import orjson
+from msgspec import UNSET, UnsetType
 
 OUTPUT_DIR = "output"
 ENRICHED_PROFILES = "speaker_profiles_enriched.json"
@@ -25,13 +31,59 @@ FALLBACK_PROFILES = "speaker_profiles.json"
 EPISODE_DATES = "episode_dates.json"
 REACT_OUTPUT_DIR = "fluent-stakeholder/public/data"
 REACT_OUTPUT_FILE = os.path.join(REACT_OUTPUT_DIR, "quotes.json")
+WRITE_BUFFER_SIZE = 1 << 20  # 1 MiB
 
+SLUG_STRIP = re.compile(r'[^\w\s-]')
+SLUG_DASHES = re.compile(r'[-\s]+')
 
+
+class Insight(msgspec.Struct):
+    """AI insight attached to a vocabulary item (Phase 1C)."""
+    nuance: str = ""
+    synonyms: list[str] = []
+    antonyms: list[str] = []
+
+
+class VocabItem(msgspec.Struct):
+    """Structured vocabulary item (Phase 1B)."""
+    word: str = ""
+    definition: str = ""
+    businessContext: str = ""
+    exampleUsage: str = ""
+    insight: Insight | None = None
+
+
+class Quote(msgspec.Struct):
+    """The fields of an output/*_quotes.json quote that the export reads.
+
+    Missing fields decode to the same defaults the dict lookups used;
+    UNSET marks fields whose fallback comes from the speaker profile.
+    """
+    text: str = ""
+    speaker: str | UnsetType = UNSET
+    timestamp: str = ""
+    context: str = ""
+    vocabulary_highlights: list[str | VocabItem] = []
+    vocabulary: list[VocabItem] | None = None
+    topics: list[str] = []
+    difficulty_level: str = "Intermediate"
+    speaker_function: str | UnsetType = UNSET
+    speaker_expertise: list[str] | UnsetType = UNSET
+    key_sentence: str = ""
+    text_ko: str = ""
+    text_zh: str = ""
+    text_es: str = ""
+
+
+QUOTES_DECODER = msgspec.json.Decoder(list[Quote])
+
+
+@functools.lru_cache(maxsize=None)
 def slugify(text: str) -> str:
-    """Convert text to URL-friendly slug."""
+    """Convert text to URL-friendly slug (cached: called once per quote with few distinct speakers)."""
     text = text.lower().strip()
-    text = re.sub(r'[^\w\s-]', '', text)
-    text = re.sub(r'[-\s]+', '-', text)
+    text = SLUG_STRIP.sub('', text)
+    text = SLUG_DASHES.sub('-', text)
     return text
 
 
@@ -39,12 +91,12 @@ def load_speaker_profiles() -> dict:
     """Load enriched profiles, falling back to base profiles."""
     if os.path.exists(ENRICHED_PROFILES):
         print(f"Using enriched profiles: {ENRICHED_PROFILES}")
-        with open(ENRICHED_PROFILES, "r", encoding="utf-8") as f:
-            return json.load(f)
+        with open(ENRICHED_PROFILES, "rb") as f:
+            return orjson.loads(f.read())
 
     print(f"Enriched profiles not found, using fallback: {FALLBACK_PROFILES}")
-    with open(FALLBACK_PROFILES, "r", encoding="utf-8") as f:
-        base = json.load(f)
+    with open(FALLBACK_PROFILES, "rb") as f:
+        base = orjson.loads(f.read())
 
     # Convert base format to enriched format
     enriched = {}
@@ -58,60 +110,47 @@ def load_speaker_profiles() -> dict:
     return enriched
 
 
-def normalize_vocabulary(vocab_highlights, vocab_enriched=None):
+def vocab_item_to_dict(v: VocabItem, include_insight: bool = True) -> dict:
+    """Build the React-ready dict for one vocabulary item."""
+    item = {
+        "word": v.word,
+        "definition": v.definition,
+        "businessContext": v.businessContext,
+        "exampleUsage": v.exampleUsage,
+    }
+    # Include insight if present (from Phase 1C)
+    if include_insight and v.insight is not None:
+        item["insight"] = {
+            "nuance": v.insight.nuance,
+            "synonyms": v.insight.synonyms,
+            "antonyms": v.insight.antonyms
+        }
+    return item
+
+
+def normalize_vocabulary(vocab_highlights: list[str | VocabItem], vocab_enriched: list[VocabItem] | None = None) -> list[dict]:
     """
     Normalize vocabulary into structured format.
     Handles: string arrays, already-structured objects, or enriched objects.
+    Item types are checked once when the file is decoded, not here.
     """
     # If enriched vocabulary exists (from Phase 1B), use it
-    if vocab_enriched and isinstance(vocab_enriched, list) and len(vocab_enriched) > 0:
-        if isinstance(vocab_enriched[0], dict):
-            result = []
-            for v in vocab_enriched:
-                item = {
-                    "word": v.get("word", ""),
-                    "definition": v.get("definition", ""),
-                    "businessContext": v.get("businessContext", ""),
-                    "exampleUsage": v.get("exampleUsage", ""),
-                }
-                # Include insight if present (from Phase 1C)
-                if "insight" in v:
-                    item["insight"] = {
-                        "nuance": v["insight"].get("nuance", ""),
-                        "synonyms": v["insight"].get("synonyms", []),
-                        "antonyms": v["insight"].get("antonyms", [])
-                    }
-                result.append(item)
-            return result
+    if vocab_enriched:
+        return [vocab_item_to_dict(v) for v in vocab_enriched]
 
     # Fall back to converting string arrays to basic objects
-    if vocab_highlights and isinstance(vocab_highlights, list):
-        result = []
-        for v in vocab_highlights:
-            if isinstance(v, str):
-                result.append({
-                    "word": v,
-                    "definition": "",
-                    "businessContext": "",
-                    "exampleUsage": ""
-                })
-            elif isinstance(v, dict):
-                result.append({
-                    "word": v.get("word", ""),
-                    "definition": v.get("definition", ""),
-                    "businessContext": v.get("businessContext", ""),
-                    "exampleUsage": v.get("exampleUsage", ""),
-                })
-        return result
-
-    return []
+    return [
+        {"word": v, "definition": "", "businessContext": "", "exampleUsage": ""}
+        if isinstance(v, str) else vocab_item_to_dict(v, include_insight=False)
+        for v in vocab_highlights
+    ]
 
 
 def load_episode_dates() -> dict:
     """Load episode publish dates. Returns speaker_name → date string mapping."""
     if os.path.exists(EPISODE_DATES):
-        with open(EPISODE_DATES, "r", encoding="utf-8") as f:
-            return json.load(f)
+        with open(EPISODE_DATES, "rb") as f:
+            return orjson.loads(f.read())
     print(f"Warning: {EPISODE_DATES} not found. Episode ordering will be unavailable.")
     return {}
 
@@ -128,92 +167,179 @@ def date_to_order(dates: dict) -> dict:
     return order_map
 
 
+def sort_key(quote: dict) -> tuple:
+    """Output order: by speaker name, then by ID."""
+    return (quote["speaker"], quote["id"])
+
+
+def write_merged_json(spool, chunks: list[list[tuple]], output_path: str):
+    """
+    Stream spooled quotes into one JSON array without loading them all.
+
+    Each chunk is a sorted list of (sort_key, offset, length) entries pointing
+    into the spool file. heapq.merge yields them in global order (ties keep
+    file order), and each entry is formatted exactly as json.dump(indent=2)
+    would place it inside the array.
+    """
+    with open(output_path, "wb", buffering=WRITE_BUFFER_SIZE) as out:
+        first = True
+        for _, offset, length in heapq.merge(*chunks, key=lambda entry: entry[0]):
+            spool.seek(offset)
+            item = msgspec.json.format(spool.read(length), indent=2)
+            out.write(b"[\n  " if first else b",\n  ")
+            out.write(item.replace(b"\n", b"\n  "))
+            first = False
+        out.write(b"[]" if first else b"\n]")
+
+
+def load_and_transform(filepath: str, profiles: dict, episode_order: dict) -> tuple[list[tuple], dict]:
+    """
+    Read one quote file and build its React-ready quotes.
+
+    Runs in a worker process, so it only touches its arguments. Returns the
+    file's quotes as sorted (sort_key, encoded JSON) pairs plus the file's
+    summary stats, or ([], None) for an empty file.
+    """
+    with open(filepath, "rb") as f:
+        quotes = QUOTES_DECODER.decode(f.read())
+
+    if not quotes:
+        return [], None
+
+    encoder = msgspec.json.Encoder()
+    speaker_name = quotes[0].speaker
+    if speaker_name is UNSET:
+        speaker_name = Path(filepath).stem.replace("_", " ")
+    speaker_slug = slugify(speaker_name)
+    profile = profiles.get(speaker_name, {})
+    file_quotes = []
+    stats = {
+        "quotes": 0,
+        "topics": set(),
+        "functions": set(),
+        "difficulties": set(),
+        "vocab_count": 0,
+        "has_translations": 0,
+        "has_enriched_vocab": 0,
+        "has_insights": 0,
+        "has_episode_order": 0,
+    }
+
+    for qi, quote in enumerate(quotes):
+        stats["quotes"] += 1
+
+        # Generate unique ID
+        quote_id = f"{speaker_slug}-{qi + 1}"
+
+        # Get topics
+        topics = quote.topics
+        primary_topic = topics[0] if topics else "General"
+        stats["topics"].update(topics)
+
+        # Normalize vocabulary
+        vocabulary = normalize_vocabulary(
+            quote.vocabulary_highlights,
+            quote.vocabulary
+        )
+
+        # Build the React-ready quote object
+        react_quote = {
+            "id": quote_id,
+            "speaker": speaker_name,
+            "role": profile.get("role", "Guest" if quote.speaker_function is UNSET else quote.speaker_function),
+            "company": profile.get("company", ""),
+            "speaker_function": profile.get("function", "Unknown") if quote.speaker_function is UNSET else quote.speaker_function,
+            "speaker_expertise": profile.get("expertise", []) if quote.speaker_expertise is UNSET else quote.speaker_expertise,
+            "topic": primary_topic,
+            "topics": topics,
+            "text": quote.text,
+            "keySentence": quote.key_sentence,
+            "text_ko": quote.text_ko,
+            "text_zh": quote.text_zh,
+            "text_es": quote.text_es,
+            "fullContext": quote.context,
+            "vocabulary": vocabulary,
+            "difficulty_level": quote.difficulty_level,
+            "timestamp": quote.timestamp,
+            "episodeOrder": episode_order.get(speaker_name, 0)
+        }
+
+        # Summary stats
+        stats["functions"].add(react_quote["speaker_function"])
+        stats["difficulties"].add(react_quote["difficulty_level"])
+        stats["vocab_count"] += len(vocabulary)
+        stats["has_translations"] += bool(react_quote["text_ko"])
+        stats["has_enriched_vocab"] += any(v.get("definition") for v in vocabulary)
+        stats["has_insights"] += any(v.get("insight") for v in vocabulary)
+        stats["has_episode_order"] += react_quote["episodeOrder"] > 0
+
+        file_quotes.append(react_quote)
+
+    # Sort by speaker name then by ID for consistency
+    file_quotes.sort(key=sort_key)
+    return [(sort_key(q), encoder.encode(q)) for q in file_quotes], stats
+
+
 def main():
     profiles = load_speaker_profiles()
     episode_dates = load_episode_dates()
     episode_order = date_to_order(episode_dates)
     files = sorted(Path(OUTPUT_DIR).glob("*_quotes.json"))
 
-    all_quotes = []
     topics_set = set()
     speakers_count = 0
     quote_count = 0
+    functions = set()
+    difficulties = set()
+    vocab_count = 0
+    has_translations = 0
+    has_enriched_vocab = 0
+    has_insights = 0
+    has_episode_order = 0
 
     print(f"Exporting {len(files)} speaker files to React-ready JSON...")
     print("=" * 60)
 
-    for filepath in files:
-        with open(filepath, "r", encoding="utf-8") as f:
-            quotes = json.load(f)
-
-        if not quotes:
-            continue
-
-        speakers_count += 1
-        speaker_name = quotes[0].get("speaker", filepath.stem.replace("_", " "))
-        profile = profiles.get(speaker_name, {})
-
-        for qi, quote in enumerate(quotes):
-            quote_count += 1
-
-            # Generate unique ID
-            quote_id = f"{slugify(speaker_name)}-{qi + 1}"
-
-            # Get topics
-            topics = quote.get("topics", [])
-            primary_topic = topics[0] if topics else "General"
-            for t in topics:
-                topics_set.add(t)
-
-            # Normalize vocabulary
-            vocabulary = normalize_vocabulary(
-                quote.get("vocabulary_highlights", []),
-                quote.get("vocabulary", None)
-            )
-
-            # Build the React-ready quote object
-            react_quote = {
-                "id": quote_id,
-                "speaker": speaker_name,
-                "role": profile.get("role", quote.get("speaker_function", "Guest")),
-                "company": profile.get("company", ""),
-                "speaker_function": quote.get("speaker_function", profile.get("function", "Unknown")),
-                "speaker_expertise": quote.get("speaker_expertise", profile.get("expertise", [])),
-                "topic": primary_topic,
-                "topics": topics,
-                "text": quote.get("text", ""),
-                "keySentence": quote.get("key_sentence", ""),
-                "text_ko": quote.get("text_ko", ""),
-                "text_zh": quote.get("text_zh", ""),
-                "text_es": quote.get("text_es", ""),
-                "fullContext": quote.get("context", ""),
-                "vocabulary": vocabulary,
-                "difficulty_level": quote.get("difficulty_level", "Intermediate"),
-                "timestamp": quote.get("timestamp", ""),
-                "episodeOrder": episode_order.get(speaker_name, 0)
-            }
-
-            all_quotes.append(react_quote)
-
-    # Sort by speaker name then by ID for consistency
-    all_quotes.sort(key=lambda q: (q["speaker"], q["id"]))
+    # Pass 1: parse and transform files across all cores, then spool each
+    # file's sorted quotes to a temp file, keeping only
+    # (sort_key, offset, length) in memory
+    spool = tempfile.TemporaryFile()
+    chunks = []
+    spool_offset = 0
+    transform = functools.partial(load_and_transform, profiles=profiles, episode_order=episode_order)
+
+    with ProcessPoolExecutor() as executor:
+        for encoded_quotes, stats in executor.map(transform, [str(p) for p in files], chunksize=8):
+            if stats is None:
+                continue
+
+            speakers_count += 1
+            quote_count += stats["quotes"]
+            topics_set |= stats["topics"]
+            functions |= stats["functions"]
+            difficulties |= stats["difficulties"]
+            vocab_count += stats["vocab_count"]
+            has_translations += stats["has_translations"]
+            has_enriched_vocab += stats["has_enriched_vocab"]
+            has_insights += stats["has_insights"]
+            has_episode_order += stats["has_episode_order"]
+
+            chunk = []
+            for key, data in encoded_quotes:
+                spool.write(data)
+                chunk.append((key, spool_offset, len(data)))
+                spool_offset += len(data)
+            chunks.append(chunk)
 
     # Ensure output directory exists
     os.makedirs(REACT_OUTPUT_DIR, exist_ok=True)
 
-    # Write the combined JSON
-    with open(REACT_OUTPUT_FILE, "w", encoding="utf-8") as f:
-        json.dump(all_quotes, f, indent=2, ensure_ascii=False)
+    # Pass 2: merge the sorted chunks into the combined JSON
+    with spool:
+        spool.flush()
+        write_merged_json(spool, chunks, REACT_OUTPUT_FILE)
 
     # Print summary
-    functions = set(q["speaker_function"] for q in all_quotes)
-    difficulties = set(q["difficulty_level"] for q in all_quotes)
-    vocab_count = sum(len(q["vocabulary"]) for q in all_quotes)
-    has_translations = sum(1 for q in all_quotes if q["text_ko"])
-    has_enriched_vocab = sum(1 for q in all_quotes if any(v.get("definition") for v in q["vocabulary"]))
-    has_insights = sum(1 for q in all_quotes if any(v.get("insight") for v in q["vocabulary"]))
-    has_episode_order = sum(1 for q in all_quotes if q.get("episodeOrder", 0) > 0)
-
     print("\n" + "=" * 60)
     print(f"Export complete! {REACT_OUTPUT_FILE}")
     print(f"  Speakers:           {speakers_count}")
@@ -1,121 +1,167 @@
-import json
+"""
+Export all quotes from output/*_quotes.json to quotes_complete.csv.
+
+The formatted Excel workbook (quotes_complete.xlsx) is opt-in since it
+costs far more than the CSV: run with --xlsx when stakeholders need it.
+"""
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
 from pathlib import Path
-from collections import Counter
+import orjson
 import pandas as pd
 from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import Font, Alignment
-from openpyxl.utils.dataframe import dataframe_to_rows
 from openpyxl.utils import get_column_letter
 
 
+def load_quote_file(file_path: Path) -> list[dict]:
+    """Read and parse one *_quotes.json file."""
+    return orjson.loads(file_path.read_bytes())
+
+
 def load_all_quotes(output_dir: Path) -> list[dict]:
     """Load all quotes from *_quotes.json files in output directory."""
-    all_quotes = []
     quote_files = sorted(output_dir.glob("*_quotes.json"))
     
-    for file_path in quote_files:
-        with open(file_path, "r", encoding="utf-8") as f:
-            quotes = json.load(f)
-            all_quotes.extend(quotes)
-    
-    return all_quotes
+    # Read files in parallel; map keeps the sorted file order
+    with ThreadPoolExecutor() as executor:
+        results = executor.map(load_quote_file, quote_files)
+        return list(chain.from_iterable(results))
 
 
 def transform_quotes_to_dataframe(quotes: list[dict]) -> pd.DataFrame:
     """Transform quotes list to DataFrame with proper column order."""
-    rows = []
-    
-    for idx, quote in enumerate(quotes, start=1):
-        row = {
-            "id": idx,
-            "speaker": quote.get("speaker", ""),
-            "speaker_function": quote.get("speaker_function", ""),
-            "speaker_expertise": ", ".join(quote.get("speaker_expertise", [])),
-            "text": quote.get("text", ""),
-            "text_ko": quote.get("text_ko", ""),
-            "text_zh": quote.get("text_zh", ""),
-            "text_es": quote.get("text_es", ""),
-            "timestamp": quote.get("timestamp", ""),
-            "context": quote.get("context", ""),
-            "vocabulary_highlights": ", ".join(quote.get("vocabulary_highlights", [])),
-            "topics": ", ".join(quote.get("topics", [])),
-            "difficulty_level": quote.get("difficulty_level", "")
-        }
-        rows.append(row)
-    
     # Define column order
     columns = [
         "id", "speaker", "speaker_function", "speaker_expertise",
         "text", "text_ko", "text_zh", "text_es",
         "timestamp", "context", "vocabulary_highlights", "topics", "difficulty_level"
     ]
+    list_columns = ["speaker_expertise", "vocabulary_highlights", "topics"]
     
-    df = pd.DataFrame(rows, columns=columns)
+    df = pd.DataFrame.from_records(quotes).reindex(columns=columns[1:])
+    
+    # Raw topic lists for the summary histogram (not exported)
+    topics_list = df["topics"]
+    
+    # Join list fields into comma-separated strings; missing fields become ""
+    for column in list_columns:
+        df[column] = df[column].map(", ".join, na_action="ignore")
+    df = df.fillna("")
+    
+    # Few distinct values repeated across every quote; categories keep
+    # first-appearance order so value_counts ties print as before
+    for column in ["speaker", "speaker_function", "difficulty_level"]:
+        df[column] = pd.Categorical(df[column], categories=df[column].unique())
+    
+    df.insert(0, "id", range(1, len(df) + 1))
+    df["topics_list"] = topics_list
     return df
 
 
+# Auto-width columns (with max width limit for readability)
+MAX_WIDTHS = {
+    "id": 6,
+    "speaker": 25,
+    "speaker_function": 18,
+    "speaker_expertise": 35,
+    "text": 60,
+    "text_ko": 50,
+    "text_zh": 50,
+    "text_es": 50,
+    "timestamp": 12,
+    "context": 60,
+    "vocabulary_highlights": 35,
+    "topics": 30,
+    "difficulty_level": 15
+}
+
+# Long content columns that wrap (text columns and context)
+WRAP_COLUMNS = ["text", "text_ko", "text_zh", "text_es", "context"]
+
+
+def column_widths(df: pd.DataFrame) -> list[float]:
+    """Calculate each column's width from its header and the first 100 rows."""
+    sample = df.head(100)
+    # Length of every non-empty value (capped at 100), longest per column
+    lengths = sample.astype(str).apply(lambda col: col.str.len())
+    col_lens = lengths.where(sample.astype(bool), 0).clip(upper=100).max().fillna(0).astype(int)
+    return [
+        min(max(len(str(column)), int(col_lens[column])) + 2, MAX_WIDTHS.get(column, 50))
+        for column in df.columns
+    ]
+
+
 def create_formatted_excel(df: pd.DataFrame, output_path: Path):
     """Create formatted Excel file with auto-width, filters, frozen header, and bold header."""
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Quotes"
-    
-    # Write DataFrame to worksheet
-    for r_idx, row in enumerate(dataframe_to_rows(df, index=False, header=True), start=1):
-        for c_idx, value in enumerate(row, start=1):
-            cell = ws.cell(row=r_idx, column=c_idx, value=value)
-            
-            # Bold header row
-            if r_idx == 1:
-                cell.font = Font(bold=True)
-                cell.alignment = Alignment(horizontal="center", vertical="center")
-            else:
-                # Wrap text for long content columns
-                if c_idx in [5, 6, 7, 8, 10]:  # text columns and context
-                    cell.alignment = Alignment(wrap_text=True, vertical="top")
-    
-    # Auto-width columns (with max width limit for readability)
-    max_widths = {
-        "id": 6,
-        "speaker": 25,
-        "speaker_function": 18,
-        "speaker_expertise": 35,
-        "text": 60,
-        "text_ko": 50,
-        "text_zh": 50,
-        "text_es": 50,
-        "timestamp": 12,
-        "context": 60,
-        "vocabulary_highlights": 35,
-        "topics": 30,
-        "difficulty_level": 15
-    }
-    
-    for col_idx, column in enumerate(df.columns, start=1):
-        col_letter = get_column_letter(col_idx)
+    with pd.ExcelWriter(output_path, engine="xlsxwriter") as writer:
+        # Header is written separately so it gets our format instead of pandas'
+        df.to_excel(writer, sheet_name="Quotes", index=False, header=False, startrow=1)
+        workbook = writer.book
+        ws = writer.sheets["Quotes"]
+        
+        # Bold header row
+        header_fmt = workbook.add_format({"bold": True, "align": "center", "valign": "vcenter"})
+        ws.write_row(0, 0, df.columns, header_fmt)
+        
+        # Widths, with wrap text for long content columns
+        wrap_fmt = workbook.add_format({"text_wrap": True, "valign": "top"})
+        for col_idx, (column, width) in enumerate(zip(df.columns, column_widths(df))):
+            ws.set_column(col_idx, col_idx, width, wrap_fmt if column in WRAP_COLUMNS else None)
         
-        # Calculate width based on content (sample first 100 rows)
-        max_length = len(str(column))  # Start with header length
-        for row_idx in range(2, min(len(df) + 2, 102)):
-            cell_value = ws.cell(row=row_idx, column=col_idx).value
-            if cell_value:
-                max_length = max(max_length, min(len(str(cell_value)), 100))
+        # Add filters to header row
+        ws.autofilter(0, 0, len(df), len(df.columns) - 1)
         
-        # Apply width with limits
-        width = min(max_length + 2, max_widths.get(column, 50))
-        ws.column_dimensions[col_letter].width = width
+        # Freeze first row (header)
+        ws.freeze_panes(1, 0)
+
+
+def create_formatted_excel_openpyxl(df: pd.DataFrame, output_path: Path):
+    """Create formatted Excel file with auto-width, filters, frozen header, and bold header (openpyxl)."""
+    # Write-only mode streams rows straight to the XML writer
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Quotes")
+    
+    # Column widths must be set before any rows are written
+    for col_idx, width in enumerate(column_widths(df), start=1):
+        ws.column_dimensions[get_column_letter(col_idx)].width = width
     
     # Add filters to header row
-    ws.auto_filter.ref = ws.dimensions
+    ws.auto_filter.ref = f"A1:{get_column_letter(len(df.columns))}{len(df) + 1}"
     
     # Freeze first row (header)
     ws.freeze_panes = "A2"
     
+    # Bold header row
+    header_font = Font(bold=True)
+    header_alignment = Alignment(horizontal="center", vertical="center")
+    header = []
+    for column in df.columns:
+        cell = WriteOnlyCell(ws, value=column)
+        cell.font = header_font
+        cell.alignment = header_alignment
+        header.append(cell)
+    ws.append(header)
+    
+    # Wrap text for long content columns
+    wrap_alignment = Alignment(wrap_text=True, vertical="top")
+    wrap_columns = [df.columns.get_loc(column) for column in WRAP_COLUMNS]
+    for row in df.itertuples(index=False, name=None):
+        row = list(row)
+        for c_idx in wrap_columns:
+            cell = WriteOnlyCell(ws, value=row[c_idx])
+            cell.alignment = wrap_alignment
+            row[c_idx] = cell
+        ws.append(row)
+    
     # Save workbook
     wb.save(output_path)
 
 
-def print_summary(df: pd.DataFrame, quotes: list[dict]):
+def print_summary(df: pd.DataFrame):
     """Print detailed summary statistics."""
     print("\n" + "=" * 60)
     print("EXPORT SUMMARY")
@@ -130,22 +176,19 @@ def print_summary(df: pd.DataFrame, quotes: list[dict]):
     
     # Speaker functions with counts
     print(f"\nSpeaker functions:")
-    function_counts = df["speaker_function"].value_counts()
+    function_counts = df["speaker_function"].value_counts(sort=False).sort_values(ascending=False, kind="stable")
     for func, count in function_counts.items():
         print(f"  - {func}: {count}")
     
     # Topics with counts (need to split and count individually)
     print(f"\nTopics:")
-    all_topics = []
-    for quote in quotes:
-        all_topics.extend(quote.get("topics", []))
-    topic_counts = Counter(all_topics)
-    for topic, count in topic_counts.most_common():
+    topic_counts = df["topics_list"].explode().value_counts(sort=False).sort_values(ascending=False, kind="stable")
+    for topic, count in topic_counts.items():
         print(f"  - {topic}: {count}")
     
     # Difficulty levels with counts
     print(f"\nDifficulty levels:")
-    difficulty_counts = df["difficulty_level"].value_counts()
+    difficulty_counts = df["difficulty_level"].value_counts(sort=False).sort_values(ascending=False, kind="stable")
     for level, count in difficulty_counts.items():
         print(f"  - {level}: {count}")
     
@@ -153,18 +196,25 @@ def print_summary(df: pd.DataFrame, quotes: list[dict]):
     print(f"\nLanguages: English, Korean, Chinese, Spanish")
     
     # Check translation coverage
-    ko_count = df["text_ko"].notna().sum() - (df["text_ko"] == "").sum()
-    zh_count = df["text_zh"].notna().sum() - (df["text_zh"] == "").sum()
-    es_count = df["text_es"].notna().sum() - (df["text_es"] == "").sum()
+    present = (df[["text_ko", "text_zh", "text_es"]].fillna("") != "").sum()
     print(f"  - English (text): {len(df)} quotes")
-    print(f"  - Korean (text_ko): {ko_count} quotes")
-    print(f"  - Chinese (text_zh): {zh_count} quotes")
-    print(f"  - Spanish (text_es): {es_count} quotes")
+    print(f"  - Korean (text_ko): {present['text_ko']} quotes")
+    print(f"  - Chinese (text_zh): {present['text_zh']} quotes")
+    print(f"  - Spanish (text_es): {present['text_es']} quotes")
     
     print("\n" + "=" * 60)
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Export all quotes to CSV (and optionally Excel)")
+    parser.add_argument("--xlsx", action="store_true",
+                        help="Also write the formatted Excel file for stakeholders")
+    parser.add_argument("--openpyxl", action="store_true",
+                        help="Write the Excel file with openpyxl instead of xlsxwriter (implies --xlsx)")
+    parser.add_argument("--no-csv", action="store_true",
+                        help="Skip the CSV export")
+    args = parser.parse_args()
+    
     base_dir = Path(__file__).parent
     output_dir = base_dir / "output"
     
@@ -186,21 +236,27 @@ def main():
     # Transform to DataFrame
     print("Transforming data...")
     df = transform_quotes_to_dataframe(quotes)
+    export_df = df.drop(columns="topics_list")
     
-    # Export to Excel
-    excel_path = output_dir / "quotes_complete.xlsx"
-    print(f"Creating Excel file: {excel_path}")
-    create_formatted_excel(df, excel_path)
-    print(f"  -> Saved: {excel_path}")
+    # Export to Excel (opt-in: much slower than CSV)
+    if args.xlsx or args.openpyxl:
+        excel_path = output_dir / "quotes_complete.xlsx"
+        print(f"Creating Excel file: {excel_path}")
+        if args.openpyxl:
+            create_formatted_excel_openpyxl(export_df, excel_path)
+        else:
+            create_formatted_excel(export_df, excel_path)
+        print(f"  -> Saved: {excel_path}")
     
     # Export to CSV
-    csv_path = output_dir / "quotes_complete.csv"
-    print(f"Creating CSV file: {csv_path}")
-    df.to_csv(csv_path, index=False, encoding="utf-8-sig")
-    print(f"  -> Saved: {csv_path}")
+    if not args.no_csv:
+        csv_path = output_dir / "quotes_complete.csv"
+        print(f"Creating CSV file: {csv_path}")
+        export_df.to_csv(csv_path, index=False, encoding="utf-8-sig")
+        print(f"  -> Saved: {csv_path}")
     
     # Print summary
-    print_summary(df, quotes)
+    print_summary(df)
 
 
 if __name__ == "__main__":
@@ -1,54 +1,111 @@
+import asyncio
+import mmap
 import os
-import json
-import time
 from pathlib import Path
-from anthropic import Anthropic
+import httpx
+import orjson
+import anthropic
+from anthropic import AsyncAnthropic
+from quote_parsing import REPAIR_PROMPT, parse_quotes_response
+from rate_limiter import AsyncLimiter, estimate_tokens, retry_on
+
+MAX_TOKENS = 4096
+
+# Default values for speakers without a profile
+DEFAULT_PROFILE = {"function": "Leadership", "expertise": []}
+
+# Anthropic account limits for Claude Sonnet (adjust to your tier)
+RPM_LIMIT = 50
+TPM_LIMIT = 400_000
+MAX_CONCURRENT = 8
+
+# Errors worth retrying: rate limits, overload/server errors, dropped connections
+RETRYABLE_ERRORS = (
+    anthropic.RateLimitError,
+    anthropic.InternalServerError,
+    anthropic.ServiceUnavailableError,
+    anthropic.OverloadedError,
+    anthropic.APIConnectionError,
+)
+
+# One client for every request; its HTTP/2 pool lets concurrent requests
+# share connections instead of each opening its own TCP+TLS session
+client = AsyncAnthropic(
+    api_key=os.environ.get("ANTHROPIC_API_KEY"),
+    max_retries=0,  # retry_on() retries instead of the SDK
+    http_client=anthropic.DefaultAsyncHttpxClient(
+        http2=True,
+        limits=httpx.Limits(max_connections=MAX_CONCURRENT, max_keepalive_connections=MAX_CONCURRENT)
+    )
+)
+semaphore = asyncio.Semaphore(MAX_CONCURRENT)
+limiter = AsyncLimiter(rpm=RPM_LIMIT, tpm=TPM_LIMIT)
 
 
 def load_file(file_path: str) -> str:
     """Load and return contents of a text file."""
-    with open(file_path, "r", encoding="utf-8") as f:
-        return f.read()
-
-
-def extract_quotes(transcript: str, prompt: str) -> list:
+    with open(file_path, "rb") as f:
+        # mmap can't map an empty file
+        if os.fstat(f.fileno()).st_size == 0:
+            return ""
+        # Decode straight from the mapped pages instead of via a read buffer
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return str(mm, "utf-8")
+
+
+@retry_on(RETRYABLE_ERRORS)
+async def create_message(messages: list[dict]):
+    """Rate-limited message request, retried with backoff on transient API errors."""
+    async with semaphore:
+        await limiter.acquire(estimate_tokens(messages, MAX_TOKENS))
+        # Streamed so long generations keep the connection active instead of
+        # idling toward a read timeout; the final message is the same object
+        async with client.messages.stream(
+            model="claude-sonnet-4-20250514",
+            max_tokens=MAX_TOKENS,
+            messages=messages
+        ) as stream:
+            return await stream.get_final_message()
+
+
+async def extract_quotes(transcript: str, prompt: str) -> list:
     """Call Anthropic API to extract quotes from transcript."""
-    client = Anthropic(api_key=os.environ.get("ANTHROPIC_API_KEY"))
-
-    message = client.messages.create(
-        model="claude-sonnet-4-20250514",
-        max_tokens=4096,
-        messages=[
-            {
-                "role": "user",
-                "content": f"{prompt}\n\nHere is the podcast transcript to analyze:\n\n{transcript}"
-            }
-        ]
-    )
+    # The extraction prompt is identical for every file, so it goes in its own
+    # block marked for prompt caching; only the transcript block changes
+    messages = [
+        {
+            "role": "user",
+            "content": [
+                {"type": "text", "text": prompt, "cache_control": {"type": "ephemeral"}},
+                {"type": "text", "text": f"Here is the podcast transcript to analyze:\n\n{transcript}"}
+            ]
+        }
+    ]
+
+    message = await create_message(messages)
 
     response_text = message.content[0].text
-    quotes = json.loads(response_text)
-    return quotes
+    try:
+        return parse_quotes_response(response_text)
+    except orjson.JSONDecodeError:
+        # Have the model fix its own output rather than redo the whole extraction
+        repair = await create_message([
+            {"role": "user", "content": REPAIR_PROMPT.format(text=response_text)}
+        ])
+        return parse_quotes_response(repair.content[0].text)
 
 
 def enrich_quotes_with_speaker_info(quotes: list, speaker_profiles: dict) -> list:
     """Add speaker_function and speaker_expertise to each quote."""
     for quote in quotes:
-        speaker_name = quote.get("speaker", "")
-        
-        if speaker_name in speaker_profiles:
-            profile = speaker_profiles[speaker_name]
-            quote["speaker_function"] = profile.get("function", "Leadership")
-            quote["speaker_expertise"] = profile.get("expertise", [])
-        else:
-            # Default values for unknown speakers
-            quote["speaker_function"] = "Leadership"
-            quote["speaker_expertise"] = []
+        profile = speaker_profiles.get(quote.get("speaker", ""), DEFAULT_PROFILE)
+        quote["speaker_function"] = profile.get("function", "Leadership")
+        quote["speaker_expertise"] = profile.get("expertise", [])
     
     return quotes
 
 
-def main():
+async def amain():
     base_dir = Path(__file__).parent
     transcripts_dir = base_dir / "transcripts"
     prompt_path = base_dir / "extraction_prompt.txt"
@@ -59,8 +116,8 @@ def main():
 
     # Load speaker profiles
     print("Loading speaker profiles...")
-    with open(speaker_profiles_path, "r", encoding="utf-8") as f:
-        speaker_profiles = json.load(f)
+    with open(speaker_profiles_path, "rb") as f:
+        speaker_profiles = orjson.loads(f.read())
 
     # Get all .txt files in transcripts folder
     transcript_files = sorted(transcripts_dir.glob("*.txt"))
@@ -76,46 +133,45 @@ def main():
     print("Loading extraction prompt...")
     prompt = load_file(prompt_path)
 
-    # Track statistics
-    total_quotes = 0
-    errors = []
-
-    # Process each transcript
-    for index, transcript_path in enumerate(transcript_files, start=1):
+    async def process(index: int, transcript_path: Path) -> int:
+        """Extract, enrich and save one transcript's quotes. Returns the quote count."""
         filename = transcript_path.name
-        print(f"Processing {index}/{total_files}: {filename}")
 
-        try:
-            # Load transcript
-            transcript = load_file(transcript_path)
+        # Load transcript
+        transcript = load_file(transcript_path)
 
-            # Extract quotes via API
-            quotes = extract_quotes(transcript, prompt)
-            
-            # Enrich quotes with speaker profile info
-            quotes = enrich_quotes_with_speaker_info(quotes, speaker_profiles)
-            
-            num_quotes = len(quotes)
-            total_quotes += num_quotes
+        # Extract quotes via API
+        quotes = await extract_quotes(transcript, prompt)
 
-            # Save to output file
-            output_filename = transcript_path.stem + "_quotes.json"
-            output_path = output_dir / output_filename
+        # Enrich quotes with speaker profile info
+        quotes = enrich_quotes_with_speaker_info(quotes, speaker_profiles)
 
-            with open(output_path, "w", encoding="utf-8") as f:
-                json.dump(quotes, f, indent=2, ensure_ascii=False)
+        # Save to output file
+        output_filename = transcript_path.stem + "_quotes.json"
+        output_path = output_dir / output_filename
 
-            print(f"  -> Extracted {num_quotes} quotes, saved to {output_filename}")
+        output_path.write_bytes(orjson.dumps(quotes, option=orjson.OPT_INDENT_2))
 
-        except Exception as e:
-            error_msg = f"{filename}: {str(e)}"
-            errors.append(error_msg)
-            print(f"  -> ERROR: {str(e)}")
+        print(f"Processed {index}/{total_files}: {filename}")
+        print(f"  -> Extracted {len(quotes)} quotes, saved to {output_filename}")
+        return len(quotes)
 
-        # Add delay between API calls (except after the last file)
-        if index < total_files:
-            print("  -> Waiting 2 seconds before next file...")
-            time.sleep(2)
+    # Process all transcripts concurrently, bounded by the semaphore and limiter
+    results = await asyncio.gather(
+        *(process(index, path) for index, path in enumerate(transcript_files, start=1)),
+        return_exceptions=True
+    )
+
+    # Track statistics
+    total_quotes = 0
+    errors = []
+    for transcript_path, result in zip(transcript_files, results):
+        if isinstance(result, Exception):
+            error_msg = f"{transcript_path.name}: {str(result)}"
+            errors.append(error_msg)
+            print(f"ERROR {error_msg}")
+        else:
+            total_quotes += result
 
     # Print summary
     print("\n" + "=" * 50)
@@ -134,5 +190,9 @@ def main():
     print("=" * 50)
 
 
+def main():
+    asyncio.run(amain())
+
+
 if __name__ == "__main__":
     main()
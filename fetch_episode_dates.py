@@ -7,49 +7,91 @@ Fetches: GitHub raw transcript frontmatter for each speaker
 Output: episode_dates.json
 """
 
-import json
+import functools
 import os
 import re
-import time
-import urllib.request
-import urllib.error
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
+import httpx
+import orjson
 
 OUTPUT_DIR = "output"
 DATES_FILE = "episode_dates.json"
 BASE_RAW_URL = "https://raw.githubusercontent.com/swathidbhat/lennys-podcast-claire-vo/main/episodes"
+MAX_WORKERS = 16  # Concurrent requests over the shared HTTP/2 connection
+FRONTMATTER_BYTES = 1024  # Enough to cover the YAML frontmatter
+SLUG_SEPARATORS = re.compile(r'[^a-z0-9]+')
+PUBLISH_DATE_PATTERN = re.compile(rb'publish_date:\s*(\d{4}-\d{2}-\d{2})')
 
 
+@functools.lru_cache(maxsize=None)
 def speaker_to_slug(speaker_name: str) -> str:
     """Convert speaker name to GitHub folder slug."""
     # Handle special cases
     slug = speaker_name.lower().strip()
     # Replace spaces and special chars with hyphens
-    slug = re.sub(r'[^a-z0-9]+', '-', slug)
+    slug = SLUG_SEPARATORS.sub('-', slug)
     slug = slug.strip('-')
     return slug
 
 
-def fetch_publish_date(slug: str) -> str | None:
+def make_client() -> httpx.Client:
+    """One HTTP/2 client shared by all workers, so requests reuse a single connection."""
+    headers = {"User-Agent": "Mozilla/5.0"}
+    # An optional token raises GitHub's unauthenticated rate limit
+    token = os.environ.get("GITHUB_TOKEN")
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+    return httpx.Client(http2=True, headers=headers, timeout=10,
+                        limits=httpx.Limits(max_connections=MAX_WORKERS))
+
+
+def fetch_publish_date(client: httpx.Client, slug: str) -> str | None:
     """Fetch the publish_date from a transcript's YAML frontmatter."""
     url = f"{BASE_RAW_URL}/{slug}/transcript.md"
     try:
-        req = urllib.request.Request(url, headers={"User-Agent": "Mozilla/5.0"})
-        with urllib.request.urlopen(req, timeout=10) as resp:
-            # Read just the first 500 bytes - enough for frontmatter
-            content = resp.read(500).decode("utf-8", errors="replace")
-            match = re.search(r'publish_date:\s*(\d{4}-\d{2}-\d{2})', content)
+        # Ask for the frontmatter only (206); still cap the read if the Range is ignored
+        headers = {"Range": f"bytes=0-{FRONTMATTER_BYTES - 1}"}
+        with client.stream("GET", url, headers=headers) as resp:
+            resp.raise_for_status()
+            head = b""
+            for chunk in resp.iter_bytes():
+                head += chunk
+                if len(head) >= FRONTMATTER_BYTES:
+                    break
+            match = PUBLISH_DATE_PATTERN.search(head, 0, FRONTMATTER_BYTES)
             if match:
-                return match.group(1)
-    except urllib.error.HTTPError as e:
-        if e.code == 404:
+                return match.group(1).decode()
+    except httpx.HTTPStatusError as e:
+        if e.response.status_code == 404:
             return None
-        print(f"  HTTP {e.code} for {slug}")
+        print(f"  HTTP {e.response.status_code} for {slug}")
     except Exception as e:
         print(f"  Error for {slug}: {e}")
     return None
 
 
+def find_publish_date(client: httpx.Client, speaker_name: str, stem: str) -> tuple[str, str | None]:
+    """Try the speaker's slug and its known variants. Returns (slug, date)."""
+    slug = speaker_to_slug(speaker_name)
+
+    # Try the slug directly
+    date = fetch_publish_date(client, slug)
+
+    # Try alternate slugs for "2.0" episodes
+    if date is None and "2.0" in stem:
+        # Also try with underscore variant
+        alt_slug2 = slug.replace("-2-0", "-20")
+        if alt_slug2 != slug:
+            date = fetch_publish_date(client, alt_slug2)
+
+    # Try removing trailing underscores/numbers
+    if date is None and slug.endswith("-"):
+        date = fetch_publish_date(client, slug.rstrip("-"))
+
+    return slug, date
+
+
 def main():
     # Get all speaker names from output files
     files = sorted(Path(OUTPUT_DIR).glob("*_quotes.json"))
@@ -58,58 +100,52 @@ def main():
     # Load existing dates to allow resume
     existing = {}
     if os.path.exists(DATES_FILE):
-        with open(DATES_FILE, "r", encoding="utf-8") as f:
-            existing = json.load(f)
+        with open(DATES_FILE, "rb") as f:
+            existing = orjson.loads(f.read())
         print(f"Loaded {len(existing)} existing date entries")
 
     dates = dict(existing)
     fetched = 0
     not_found = []
 
+    # Speakers still missing a date, in file order
+    pending = []
     for filepath in files:
         # Extract speaker name from filename
         stem = filepath.stem.replace("_quotes", "")
         speaker_name = stem.replace("_", " ")
 
         # Skip if already fetched
-        if speaker_name in dates:
-            continue
-
-        slug = speaker_to_slug(speaker_name)
-
-        # Try the slug directly
-        date = fetch_publish_date(slug)
-
-        # Try alternate slugs for "2.0" episodes
-        if date is None and "2.0" in stem:
-            alt_slug = slug.replace("-20", "-20")  # already correct
-            # Also try with underscore variant
-            alt_slug2 = slug.replace("-2-0", "-20")
-            if alt_slug2 != slug:
-                date = fetch_publish_date(alt_slug2)
-
-        # Try removing trailing underscores/numbers
-        if date is None and slug.endswith("-"):
-            date = fetch_publish_date(slug.rstrip("-"))
-
-        if date:
-            dates[speaker_name] = date
-            fetched += 1
-            print(f"  [{fetched}] {speaker_name}: {date}")
-        else:
-            not_found.append((speaker_name, slug))
-
-        # Save checkpoint every 20 fetches
-        if fetched > 0 and fetched % 20 == 0:
-            with open(DATES_FILE, "w", encoding="utf-8") as f:
-                json.dump(dates, f, indent=2, ensure_ascii=False)
-
-        # Rate limit: small delay between requests
-        time.sleep(0.2)
+        if speaker_name not in dates:
+            pending.append((speaker_name, stem))
+
+    with make_client() as client, ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        futures = {
+            executor.submit(find_publish_date, client, speaker_name, stem): speaker_name
+            for speaker_name, stem in pending
+        }
+        for future in as_completed(futures):
+            speaker_name = futures[future]
+            slug, date = future.result()
+
+            if date:
+                dates[speaker_name] = date
+                fetched += 1
+                print(f"  [{fetched}] {speaker_name}: {date}")
+
+                # Save checkpoint every 20 fetches
+                if fetched % 20 == 0:
+                    Path(DATES_FILE).write_bytes(orjson.dumps(dates, option=orjson.OPT_INDENT_2))
+            else:
+                not_found.append((speaker_name, slug))
+
+    # Keep new entries in file order regardless of completion order
+    order = {speaker_name: i for i, (speaker_name, _) in enumerate(pending)}
+    dates = dict(sorted(dates.items(), key=lambda item: order.get(item[0], -1)))
+    not_found.sort(key=lambda entry: order[entry[0]])
 
     # Final save
-    with open(DATES_FILE, "w", encoding="utf-8") as f:
-        json.dump(dates, f, indent=2, ensure_ascii=False)
+    Path(DATES_FILE).write_bytes(orjson.dumps(dates, option=orjson.OPT_INDENT_2))
 
     print(f"\n{'=' * 60}")
     print(f"Total speakers with dates: {len(dates)}")
@@ -0,0 +1,193 @@
+"""
+Fill missing translations via the OpenAI Batch API
+
+Same backfill as fill_missing_translations_openai.py, but every quote with
+missing translations becomes one request in a single Batch API job. Batch
+jobs cost 50% less, have no per-minute rate limits and need no sleeps
+between calls; results arrive within the 24h completion window. Each file
+is written once after its results are applied.
+
+Usage:
+    python fill_missing_translations_batch_api.py                  # submit, wait, apply
+    python fill_missing_translations_batch_api.py --resume BATCH_ID  # wait for an existing job
+"""
+
+import argparse
+import os
+import time
+from collections import defaultdict
+
+import orjson
+
+from fill_missing_translations_openai import (
+    LANGUAGE_NAMES,
+    MAX_TOKENS,
+    MODEL,
+    OUTPUT_DIR,
+    TEMPERATURE,
+    build_translate_all_messages,
+    client,
+    get_quote_files,
+    is_missing_translation,
+    parse_translations,
+)
+
+BATCH_INPUT_FILE = "translation_batch_input.jsonl"
+POLL_INTERVAL_SECONDS = 60
+TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+
+def collect_requests():
+    """Build one Batch API request per quote that is missing any translation."""
+    requests = []
+    
+    for filepath in get_quote_files():
+        with open(filepath, 'rb') as f:
+            quotes = orjson.loads(f.read())
+        
+        for quote_idx, quote in enumerate(quotes):
+            english_text = quote.get("text", "")
+            missing_fields = [f for f in LANGUAGE_NAMES if is_missing_translation(quote, f)]
+            if not english_text or not missing_fields:
+                continue
+            
+            requests.append({
+                "custom_id": f"{os.path.basename(filepath)}#{quote_idx}#{','.join(missing_fields)}",
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {
+                    "model": MODEL,
+                    "messages": build_translate_all_messages(english_text, missing_fields),
+                    "temperature": TEMPERATURE,
+                    "max_tokens": MAX_TOKENS * len(missing_fields),
+                    "response_format": {"type": "json_object"}
+                }
+            })
+    
+    return requests
+
+
+def submit_batch(requests):
+    """Write requests to JSONL, upload, and create the batch job. Returns the batch ID."""
+    with open(BATCH_INPUT_FILE, 'wb') as f:
+        for request in requests:
+            f.write(orjson.dumps(request) + b"\n")
+    
+    with open(BATCH_INPUT_FILE, 'rb') as f:
+        input_file = client.files.create(file=f, purpose="batch")
+    
+    batch = client.batches.create(
+        input_file_id=input_file.id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h"
+    )
+    return batch.id
+
+
+def wait_for_batch(batch_id):
+    """Poll until the batch reaches a terminal status."""
+    while True:
+        batch = client.batches.retrieve(batch_id)
+        counts = batch.request_counts
+        print(f"  Status: {batch.status} "
+              f"({counts.completed}/{counts.total} done, {counts.failed} failed)")
+        
+        if batch.status in TERMINAL_STATUSES:
+            return batch
+        
+        time.sleep(POLL_INTERVAL_SECONDS)
+
+
+def download_results(batch):
+    """Download the output file and return {filename: {quote_idx: {field: translation}}}."""
+    results = defaultdict(dict)
+    if not batch.output_file_id:
+        return results
+    
+    content = client.files.content(batch.output_file_id).text
+    for line in content.splitlines():
+        if not line.strip():
+            continue
+        
+        record = orjson.loads(line)
+        filename, quote_idx, fields = record["custom_id"].rsplit("#", 2)
+        response = record.get("response") or {}
+        
+        if response.get("status_code") != 200:
+            continue
+        
+        try:
+            body = response["body"]
+            translations = parse_translations(body["choices"][0]["message"]["content"], fields.split(","))
+        except (KeyError, IndexError, orjson.JSONDecodeError) as e:
+            print(f"    Bad response for {record['custom_id']}: {e}")
+            continue
+        
+        results[filename][int(quote_idx)] = translations
+    
+    return results
+
+
+def apply_results(results):
+    """Write translations back into the quote files. Returns per-language counts."""
+    added = {field: 0 for field in LANGUAGE_NAMES}
+    
+    for filename, quote_translations in results.items():
+        filepath = os.path.join(OUTPUT_DIR, filename)
+        with open(filepath, 'rb') as f:
+            quotes = orjson.loads(f.read())
+        
+        for quote_idx, translations in quote_translations.items():
+            for field, translation in translations.items():
+                # Don't overwrite anything filled in while the batch was running
+                if is_missing_translation(quotes[quote_idx], field):
+                    quotes[quote_idx][field] = translation
+                    added[field] += 1
+        
+        with open(filepath, 'wb') as f:
+            f.write(orjson.dumps(quotes, option=orjson.OPT_INDENT_2))
+    
+    return added
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fill missing translations via the OpenAI Batch API")
+    parser.add_argument("--resume", metavar="BATCH_ID", help="Wait for and apply an existing batch")
+    args = parser.parse_args()
+    
+    print("=" * 70)
+    if args.resume:
+        batch_id = args.resume
+        print(f"Resuming batch {batch_id}")
+    else:
+        requests = collect_requests()
+        if not requests:
+            print("All translations are complete! Nothing to do.")
+            return
+        
+        print(f"Submitting {len(requests)} quotes to the Batch API...")
+        batch_id = submit_batch(requests)
+        print(f"Batch created: {batch_id}")
+        print(f"(Resume later with: python fill_missing_translations_batch_api.py --resume {batch_id})")
+    
+    print("=" * 70)
+    batch = wait_for_batch(batch_id)
+    
+    if batch.status != "completed":
+        print(f"\nBatch ended with status '{batch.status}'. No files were changed.")
+        return
+    
+    added = apply_results(download_results(batch))
+    
+    print("\n" + "=" * 70)
+    print("SUMMARY")
+    print("=" * 70)
+    print(f"Korean translations:      {added['text_ko']}")
+    print(f"Chinese translations:     {added['text_zh']}")
+    print(f"Spanish translations:     {added['text_es']}")
+    print("\nRun fill_missing_translations_openai.py to retry anything the batch missed.")
+    print("\nDone!")
+
+
+if __name__ == "__main__":
+    main()
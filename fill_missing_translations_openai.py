@@ -3,19 +3,20 @@ Fill missing translations in quote files using OpenAI GPT-4o-mini
 """
 
 import os
-import json
 import glob
-import time
 from datetime import datetime
+from pathlib import Path
+import orjson
 from dotenv import load_dotenv
 
 from openai import OpenAI
+from rate_limiter import retry_openai
 
 # Load environment variables
 load_dotenv('.env.local')
 
 # Initialize OpenAI client
-client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"), max_retries=0)  # retry_openai() retries instead of the SDK
 
 # Model configuration
 MODEL = "gpt-4o-mini"
@@ -25,9 +26,6 @@ MAX_TOKENS = 500
 # File paths
 OUTPUT_DIR = "output"
 
-# Rate limit delay (seconds)
-RATE_LIMIT_DELAY = 1
-
 # Cost per 1M tokens for GPT-4o-mini
 COST_PER_1M_INPUT_TOKENS = 0.15
 COST_PER_1M_OUTPUT_TOKENS = 0.60
@@ -48,6 +46,11 @@ LANGUAGE_NAMES = {
 }
 
 
+# Translations made during this run, keyed by (stripped English text, field),
+# so repeated quotes (intros, taglines) are translated only once
+translation_cache = {}
+
+
 def is_missing_translation(quote, field):
     """Check if a translation field is missing or empty."""
     if field not in quote:
@@ -60,12 +63,17 @@ def is_missing_translation(quote, field):
     return False
 
 
+@retry_openai()
+def create_completion(**kwargs):
+    """GPT-4o-mini chat completion, retried with backoff on 429s and transient errors."""
+    return client.chat.completions.create(model=MODEL, **kwargs)
+
+
 def translate_text(english_text, language_field):
     """Translate text using OpenAI GPT-4o-mini."""
     prompt = PROMPTS[language_field]
     
-    response = client.chat.completions.create(
-        model=MODEL,
+    response = create_completion(
         messages=[
             {
                 "role": "system",
@@ -87,12 +95,75 @@ def translate_text(english_text, language_field):
     return translation, input_tokens, output_tokens
 
 
-def process_quote_file(filepath):
-    """Process a single quote file and fill missing translations."""
-    # Load quotes
-    with open(filepath, 'r', encoding='utf-8') as f:
-        quotes = json.load(f)
+def build_translate_all_messages(english_text, language_fields):
+    """Build the chat messages asking for several translations as one JSON object."""
+    instructions = "\n\n".join(
+        f"{field} ({LANGUAGE_NAMES[field]}): {PROMPTS[field]}" for field in language_fields
+    )
+    prompt = f"""Translate the user's English business quote into each language below, following that language's instructions.
+
+{instructions}
+
+Return a JSON object with exactly these keys: {", ".join(language_fields)}. Each value is ONLY the translation."""
+    
+    return [
+        {
+            "role": "system",
+            "content": prompt
+        },
+        {
+            "role": "user",
+            "content": english_text
+        }
+    ]
+
+
+def parse_translations(content, language_fields):
+    """Parse a combined reply into {field: translation}, dropping missing or empty fields."""
+    result = orjson.loads(content)
+    translations = {}
+    for field in language_fields:
+        value = result.get(field)
+        if isinstance(value, str) and value.strip():
+            translations[field] = value.strip()
+    return translations
+
+
+def translate_all(english_text, language_fields):
+    """
+    Translate text into several languages with one GPT-4o-mini call.
+    
+    Returns ({field: translation}, input_tokens, output_tokens). Fields the
+    model left out or returned empty are omitted from the dict.
+    """
+    response = create_completion(
+        messages=build_translate_all_messages(english_text, language_fields),
+        temperature=TEMPERATURE,
+        max_tokens=MAX_TOKENS * len(language_fields),
+        response_format={"type": "json_object"}
+    )
+    
+    translations = parse_translations(response.choices[0].message.content, language_fields)
+    return translations, response.usage.prompt_tokens, response.usage.completion_tokens
+
+
+def count_missing_translations(quotes):
+    """Count missing translations per language field."""
+    missing_counts = {"text_ko": 0, "text_zh": 0, "text_es": 0}
+    for quote in quotes:
+        for field in ["text_ko", "text_zh", "text_es"]:
+            if is_missing_translation(quote, field):
+                missing_counts[field] += 1
+    return missing_counts
+
+
+def process_quote_file(filepath, quotes, missing_counts):
+    """
+    Fill missing translations in an already-loaded quote file and save it.
     
+    `missing_counts` comes from count_missing_translations during the scan,
+    so the file is neither re-read nor re-scanned here.
+    """
     # Track statistics
     stats = {
         "quotes_checked": len(quotes),
@@ -102,48 +173,61 @@ def process_quote_file(filepath):
         "api_calls": 0,
         "input_tokens": 0,
         "output_tokens": 0,
-        "translations_needed": 0
+        "cache_hits": 0,
+        "translations_needed": sum(missing_counts.values())
     }
     
-    # Count missing translations first
-    missing_counts = {"text_ko": 0, "text_zh": 0, "text_es": 0}
-    for quote in quotes:
-        for field in ["text_ko", "text_zh", "text_es"]:
-            if is_missing_translation(quote, field):
-                missing_counts[field] += 1
-                stats["translations_needed"] += 1
-    
     # Process each quote
     for quote_idx, quote in enumerate(quotes):
-        english_text = quote.get("text", "")
+        english_text = quote.get("text", "").strip()
         
         if not english_text:
             continue
         
-        for field in ["text_ko", "text_zh", "text_es"]:
-            if is_missing_translation(quote, field):
-                try:
-                    # Translate
+        missing_fields = [f for f in ["text_ko", "text_zh", "text_es"] if is_missing_translation(quote, f)]
+        if not missing_fields:
+            continue
+        
+        # Reuse translations of identical text from earlier in the run
+        translations = {}
+        for field in missing_fields:
+            if (english_text, field) in translation_cache:
+                translations[field] = translation_cache[(english_text, field)]
+                stats["cache_hits"] += 1
+        uncached_fields = [f for f in missing_fields if f not in translations]
+        
+        # All remaining languages in one call
+        if uncached_fields:
+            try:
+                new_translations, input_tokens, output_tokens = translate_all(english_text, uncached_fields)
+                translations.update(new_translations)
+                stats["api_calls"] += 1
+                stats["input_tokens"] += input_tokens
+                stats["output_tokens"] += output_tokens
+            except Exception as e:
+                print(f"    Error translating quote {quote_idx}: {e}")
+        
+        for field in missing_fields:
+            try:
+                if field in translations:
+                    translation = translations[field]
+                else:
+                    # Per-language fallback when the combined reply is unusable
                     translation, input_tokens, output_tokens = translate_text(english_text, field)
-                    
-                    # Update quote
-                    quote[field] = translation
-                    
-                    # Update stats
-                    stats[f"{field}_added"] += 1
                     stats["api_calls"] += 1
                     stats["input_tokens"] += input_tokens
                     stats["output_tokens"] += output_tokens
-                    
-                    # Rate limit delay
-                    time.sleep(RATE_LIMIT_DELAY)
-                    
-                except Exception as e:
-                    print(f"    Error translating to {LANGUAGE_NAMES[field]}: {e}")
+                
+                # Update quote
+                quote[field] = translation
+                translation_cache[(english_text, field)] = translation
+                stats[f"{field}_added"] += 1
+                
+            except Exception as e:
+                print(f"    Error translating to {LANGUAGE_NAMES[field]}: {e}")
     
     # Save updated quotes
-    with open(filepath, 'w', encoding='utf-8') as f:
-        json.dump(quotes, f, indent=2, ensure_ascii=False)
+    Path(filepath).write_bytes(orjson.dumps(quotes, option=orjson.OPT_INDENT_2))
     
     return stats, missing_counts
 
@@ -174,7 +258,8 @@ def main():
         "text_es_added": 0,
         "api_calls": 0,
         "input_tokens": 0,
-        "output_tokens": 0
+        "output_tokens": 0,
+        "cache_hits": 0
     }
     
     files_with_missing = []
@@ -184,17 +269,13 @@ def main():
     for filepath in quote_files:
         filename = os.path.basename(filepath)
         
-        with open(filepath, 'r', encoding='utf-8') as f:
-            quotes = json.load(f)
-        
-        missing = 0
-        for quote in quotes:
-            for field in ["text_ko", "text_zh", "text_es"]:
-                if is_missing_translation(quote, field):
-                    missing += 1
+        with open(filepath, 'rb') as f:
+            quotes = orjson.loads(f.read())
         
-        if missing > 0:
-            files_with_missing.append((filepath, filename, len(quotes), missing))
+        # Keep the parsed quotes so each file is read only once
+        missing_counts = count_missing_translations(quotes)
+        if sum(missing_counts.values()) > 0:
+            files_with_missing.append((filepath, filename, quotes, missing_counts))
     
     if not files_with_missing:
         print("All translations are complete! Nothing to do.")
@@ -204,11 +285,12 @@ def main():
     print("-" * 70)
     
     # Process files with missing translations
-    for filepath, filename, quote_count, missing_count in files_with_missing:
-        print(f"\n{filename}: {missing_count // 3 if missing_count % 3 == 0 else missing_count}/{quote_count} quotes need translations ({missing_count} total)")
+    for filepath, filename, quotes, missing_counts in files_with_missing:
+        missing_count = sum(missing_counts.values())
+        print(f"\n{filename}: {missing_count // 3 if missing_count % 3 == 0 else missing_count}/{len(quotes)} quotes need translations ({missing_count} total)")
         
         try:
-            stats, missing_counts = process_quote_file(filepath)
+            stats, missing_counts = process_quote_file(filepath, quotes, missing_counts)
             
             # Update totals
             total_stats["files_processed"] += 1
@@ -219,6 +301,7 @@ def main():
             total_stats["api_calls"] += stats["api_calls"]
             total_stats["input_tokens"] += stats["input_tokens"]
             total_stats["output_tokens"] += stats["output_tokens"]
+            total_stats["cache_hits"] += stats["cache_hits"]
             
             # Show what was added
             added = []
@@ -257,6 +340,7 @@ def main():
     print(f"Chinese translations:     {total_stats['text_zh_added']}")
     print(f"Spanish translations:     {total_stats['text_es_added']}")
     print(f"Total API calls:          {total_stats['api_calls']}")
+    print(f"Cache hits:               {total_stats['cache_hits']}")
     print(f"Input tokens:             {total_stats['input_tokens']:,}")
     print(f"Output tokens:            {total_stats['output_tokens']:,}")
     print(f"Approximate cost:         ${total_cost:.4f}")
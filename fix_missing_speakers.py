@@ -2,22 +2,24 @@
 Fix missing speakers: generate profiles and update quote files
 """
 
+import asyncio
+import functools
 import os
-import json
 import glob
-import time
 import re
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+from pathlib import Path
+import orjson
 from dotenv import load_dotenv
 
-from openai import OpenAI
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+from rate_limiter import AsyncLimiter, estimate_tokens, retry_openai
 
 # Load environment variables
 load_dotenv('.env.local')
 
-# Initialize OpenAI client
-client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
-
 # Model configuration
 MODEL = "gpt-4o-mini"
 
@@ -26,8 +28,32 @@ PROFILES_FILE = "speaker_profiles.json"
 TRANSCRIPTS_DIR = "transcripts"
 OUTPUT_DIR = "output"
 
-# Rate limit delay (seconds)
-RATE_LIMIT_DELAY = 1
+# OpenAI account limits for gpt-4o-mini
+RPM_LIMIT = 500
+TPM_LIMIT = 200_000
+MAX_CONCURRENT = 8
+MAX_TOKENS = 256  # Per speaker
+SPEAKERS_PER_REQUEST = 5
+
+# Initialize OpenAI client; concurrent requests share HTTP/2 connections
+# instead of each opening its own TCP+TLS session
+client = AsyncOpenAI(
+    api_key=os.environ.get("OPENAI_API_KEY"),
+    max_retries=0,  # retry_openai() retries instead of the SDK
+    http_client=DefaultAsyncHttpxClient(
+        http2=True,
+        limits=httpx.Limits(max_connections=MAX_CONCURRENT, max_keepalive_connections=MAX_CONCURRENT)
+    )
+)
+limiter = AsyncLimiter(rpm=RPM_LIMIT, tpm=TPM_LIMIT)
+semaphore = asyncio.Semaphore(MAX_CONCURRENT)
+
+# Characters dropped from speaker names when guessing transcript filenames
+SPECIAL_CHARS_PATTERN = re.compile(r"['\"\(\)]")
+
+# Markdown code fences around a JSON response
+CODE_FENCE_START = re.compile(r'^```(?:json)?\s*\n?')
+CODE_FENCE_END = re.compile(r'\n?```\s*$')
 
 # How many characters to read from transcript
 TRANSCRIPT_CHARS = 3000
@@ -86,17 +112,19 @@ TRANSCRIPT_MAPPING = {
     "Yuhki Yamashita": "Yuhki_Yamashata.txt",
 }
 
-# Analysis prompt (same as generate_speaker_profiles.py)
-ANALYSIS_PROMPT = """Analyze this podcast transcript excerpt and identify the guest speaker's professional background.
+# Analysis prompt (same guidelines as generate_speaker_profiles.py, several speakers per call)
+ANALYSIS_PROMPT = """Analyze these podcast transcript excerpts and identify each guest speaker's professional background.
 
-Based on the content, determine:
+Based on the content, determine for each speaker:
 1. Their primary function/role category
 2. Their areas of expertise (3 items max)
 
-Return ONLY a JSON object in this exact format:
+Return ONLY a JSON object mapping each speaker's name, exactly as given, to their profile, for ALL speakers below:
 {
-  "function": "<one of: Product|Engineering|Design|Marketing|Sales|Growth|Operations|Leadership|Finance|Data|HR|Legal|Consulting>",
-  "expertise": ["expertise1", "expertise2", "expertise3"]
+  "<speaker name>": {
+    "function": "<one of: Product|Engineering|Design|Marketing|Sales|Growth|Operations|Leadership|Finance|Data|HR|Legal|Consulting>",
+    "expertise": ["expertise1", "expertise2", "expertise3"]
+  }
 }
 
 Guidelines for function:
@@ -128,57 +156,59 @@ Return ONLY the JSON object, no other text."""
 def load_speaker_profiles():
     """Load existing speaker profiles."""
     if os.path.exists(PROFILES_FILE):
-        with open(PROFILES_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        return orjson.loads(Path(PROFILES_FILE).read_bytes())
     return {}
 
 
 def save_speaker_profiles(profiles):
     """Save speaker profiles to file."""
-    with open(PROFILES_FILE, 'w', encoding='utf-8') as f:
-        json.dump(profiles, f, indent=2, ensure_ascii=False)
+    Path(PROFILES_FILE).write_bytes(orjson.dumps(profiles, option=orjson.OPT_INDENT_2))
+
+
+@functools.lru_cache(maxsize=None)
+def list_transcripts():
+    """List TRANSCRIPTS_DIR once: (set of filenames, [(lowercased, filename)])."""
+    files = os.listdir(TRANSCRIPTS_DIR)
+    return set(files), [(file.lower(), file) for file in files]
 
 
 def find_transcript_file(speaker_name):
     """Find the transcript file for a given speaker name."""
+    transcript_files, transcript_files_lower = list_transcripts()
+    
     # Check manual mapping first
     if speaker_name in TRANSCRIPT_MAPPING:
         filename = TRANSCRIPT_MAPPING[speaker_name]
-        filepath = os.path.join(TRANSCRIPTS_DIR, filename)
-        if os.path.exists(filepath):
-            return filepath
+        if filename in transcript_files:
+            return os.path.join(TRANSCRIPTS_DIR, filename)
     
     # Try standard conversion: "Speaker Name" -> "Speaker_Name.txt"
     filename = speaker_name.replace(" ", "_") + ".txt"
-    filepath = os.path.join(TRANSCRIPTS_DIR, filename)
-    if os.path.exists(filepath):
-        return filepath
+    if filename in transcript_files:
+        return os.path.join(TRANSCRIPTS_DIR, filename)
     
     # Try without special characters
-    clean_name = re.sub(r"['\"\(\)]", "", speaker_name)
+    clean_name = SPECIAL_CHARS_PATTERN.sub("", speaker_name)
     filename = clean_name.replace(" ", "_") + ".txt"
-    filepath = os.path.join(TRANSCRIPTS_DIR, filename)
-    if os.path.exists(filepath):
-        return filepath
+    if filename in transcript_files:
+        return os.path.join(TRANSCRIPTS_DIR, filename)
     
     # Try with special character normalization (ö -> o, ü -> u, etc.)
     normalized_name = speaker_name
     for old, new in [("ö", "o"), ("ü", "u"), ("ä", "a"), ("é", "e"), ("'", "")]:
         normalized_name = normalized_name.replace(old, new)
     filename = normalized_name.replace(" ", "_") + ".txt"
-    filepath = os.path.join(TRANSCRIPTS_DIR, filename)
-    if os.path.exists(filepath):
-        return filepath
+    if filename in transcript_files:
+        return os.path.join(TRANSCRIPTS_DIR, filename)
     
     # Try fuzzy matching: search by first and last name parts
     name_parts = speaker_name.replace("'", "").split()
     if len(name_parts) >= 2:
-        first_name = name_parts[0]
-        last_name = name_parts[-1].rstrip(")")
+        first_name = name_parts[0].lower()
+        last_name = name_parts[-1].rstrip(")").lower()[:4]
         
-        for file in os.listdir(TRANSCRIPTS_DIR):
-            file_lower = file.lower()
-            if first_name.lower() in file_lower and last_name.lower()[:4] in file_lower:
+        for file_lower, file in transcript_files_lower:
+            if first_name in file_lower and last_name in file_lower:
                 return os.path.join(TRANSCRIPTS_DIR, file)
     
     return None
@@ -190,30 +220,46 @@ def read_transcript_excerpt(filepath, max_chars=TRANSCRIPT_CHARS):
         return f.read(max_chars)
 
 
-def analyze_speaker(speaker_name, transcript_excerpt):
-    """Use GPT-4o-mini to analyze speaker profile."""
-    response = client.chat.completions.create(
-        model=MODEL,
-        messages=[
-            {
-                "role": "system",
-                "content": ANALYSIS_PROMPT
-            },
-            {
-                "role": "user",
-                "content": f"Speaker: {speaker_name}\n\nTranscript excerpt:\n{transcript_excerpt}"
-            }
-        ],
-        temperature=0.3,
-        max_tokens=256
-    )
-    
-    response_text = response.choices[0].message.content.strip()
+@retry_openai()
+async def create_completion(messages, max_tokens):
+    """Rate-limited chat completion, retried on transient API errors."""
+    async with semaphore:
+        await limiter.acquire(estimate_tokens(messages, max_tokens))
+        return await client.chat.completions.create(
+            model=MODEL,
+            messages=messages,
+            temperature=0.3,
+            max_tokens=max_tokens,
+            response_format={"type": "json_object"}
+        )
+
+
+def build_analysis_messages(speakers):
+    """Chat messages asking for the function and expertise of each (speaker, excerpt) pair."""
+    sections = [
+        f"### Speaker {i}: {speaker_name}\n{transcript_excerpt}"
+        for i, (speaker_name, transcript_excerpt) in enumerate(speakers, 1)
+    ]
+    return [
+        {
+            "role": "system",
+            "content": ANALYSIS_PROMPT
+        },
+        {
+            "role": "user",
+            "content": "\n\n".join(sections)
+        }
+    ]
+
+
+def parse_profile_response(response_text):
+    """Extract the JSON object from a model response."""
+    response_text = response_text.strip()
     
     # Extract JSON from response
     if response_text.startswith("```"):
-        response_text = re.sub(r'^```(?:json)?\s*\n?', '', response_text)
-        response_text = re.sub(r'\n?```\s*$', '', response_text)
+        response_text = CODE_FENCE_START.sub('', response_text)
+        response_text = CODE_FENCE_END.sub('', response_text)
     
     # Find JSON object
     start_idx = response_text.find('{')
@@ -221,9 +267,45 @@ def analyze_speaker(speaker_name, transcript_excerpt):
     
     if start_idx != -1 and end_idx != -1:
         json_str = response_text[start_idx:end_idx + 1]
-        return json.loads(json_str)
+        return orjson.loads(json_str)
+    
+    return orjson.loads(response_text)
+
+
+async def analyze_speakers(speakers):
+    """Use GPT-4o-mini to analyze a batch of speakers. Returns {speaker_name: profile}."""
+    response = await create_completion(build_analysis_messages(speakers), MAX_TOKENS * len(speakers))
+    return parse_profile_response(response.choices[0].message.content)
+
+
+def update_quote_file(filepath, profiles, speakers_re):
+    """Update one quote file from profiles. Returns (files_updated, quotes_updated) deltas."""
+    raw = Path(filepath).read_bytes()
+    
+    # No profiled speaker in this file: nothing to update
+    if not speakers_re.search(raw):
+        return 0, 0
+    
+    quotes = orjson.loads(raw)
+    
+    quotes_updated = 0
+    for quote in quotes:
+        speaker = quote.get('speaker', '')
+        if speaker in profiles:
+            profile = profiles[speaker]
+            new_function = profile.get('function', '')
+            new_expertise = profile.get('expertise', [])
+            
+            if quote.get('speaker_function') != new_function or quote.get('speaker_expertise') != new_expertise:
+                quote['speaker_function'] = new_function
+                quote['speaker_expertise'] = new_expertise
+                quotes_updated += 1
+    
+    if not quotes_updated:
+        return 0, 0
     
-    return json.loads(response_text)
+    Path(filepath).write_bytes(orjson.dumps(quotes, option=orjson.OPT_INDENT_2))
+    return 1, quotes_updated
 
 
 def update_quote_files(profiles):
@@ -232,34 +314,25 @@ def update_quote_files(profiles):
     
     files_updated = 0
     quotes_updated = 0
+    if not profiles:
+        return files_updated, quotes_updated
     
-    for filepath in quote_files:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            quotes = json.load(f)
-        
-        modified = False
-        for quote in quotes:
-            speaker = quote.get('speaker', '')
-            if speaker in profiles:
-                profile = profiles[speaker]
-                new_function = profile.get('function', '')
-                new_expertise = profile.get('expertise', [])
-                
-                if quote.get('speaker_function') != new_function or quote.get('speaker_expertise') != new_expertise:
-                    quote['speaker_function'] = new_function
-                    quote['speaker_expertise'] = new_expertise
-                    quotes_updated += 1
-                    modified = True
-        
-        if modified:
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(quotes, f, indent=2, ensure_ascii=False)
-            files_updated += 1
+    # Matches a "speaker" field naming any profiled speaker, in its JSON-encoded form
+    speakers_re = re.compile(
+        rb'"speaker": (?:' + b'|'.join(re.escape(orjson.dumps(s)) for s in profiles) + rb')'
+    )
+    update = functools.partial(update_quote_file, profiles=profiles, speakers_re=speakers_re)
+    
+    # Files are independent; parse and rewrite them across all cores
+    with ProcessPoolExecutor() as executor:
+        for files_delta, quotes_delta in executor.map(update, quote_files, chunksize=8):
+            files_updated += files_delta
+            quotes_updated += quotes_delta
     
     return files_updated, quotes_updated
 
 
-def main():
+async def amain():
     """Main function to fix missing speakers."""
     print("=" * 60)
     print("Fixing Missing Speaker Profiles")
@@ -276,17 +349,16 @@ def main():
     profiles_generated = 0
     not_found = []
     already_exists = []
+    pending = []
     
     print("\n" + "-" * 60)
     print("STEP 1: Generating profiles for missing speakers")
     print("-" * 60 + "\n")
     
     for speaker in MISSING_SPEAKERS:
-        print(f"Processing: {speaker}...", end=" ", flush=True)
-        
         # Check if profile already exists
         if speaker in profiles:
-            print("SKIPPED - Profile already exists")
+            print(f"Processing: {speaker}... SKIPPED - Profile already exists")
             already_exists.append(speaker)
             continue
         
@@ -294,7 +366,7 @@ def main():
         transcript_path = find_transcript_file(speaker)
         
         if not transcript_path:
-            print("NOT FOUND - No transcript file")
+            print(f"Processing: {speaker}... NOT FOUND - No transcript file")
             not_found.append(speaker)
             continue
         
@@ -302,24 +374,30 @@ def main():
         
         try:
             # Read transcript excerpt
-            excerpt = read_transcript_excerpt(transcript_path)
+            pending.append((speaker, read_transcript_excerpt(transcript_path)))
+        except Exception as e:
+            print(f"Processing: {speaker}... FAILED - {e}")
+    
+    # Several speakers share each call; the limiter paces calls to the account's RPM/TPM
+    batches = [pending[i:i + SPEAKERS_PER_REQUEST] for i in range(0, len(pending), SPEAKERS_PER_REQUEST)]
+    results = await asyncio.gather(*(analyze_speakers(batch) for batch in batches), return_exceptions=True)
+    
+    for batch, batch_profiles in zip(batches, results):
+        for speaker, _ in batch:
+            print(f"Processing: {speaker}...", end=" ")
             
-            # Analyze with GPT
-            profile = analyze_speaker(speaker, excerpt)
+            if isinstance(batch_profiles, Exception):
+                print(f"FAILED - {batch_profiles}")
+                continue
             
-            # Add to profiles
-            if 'function' in profile and 'expertise' in profile:
+            profile = batch_profiles.get(speaker)
+            if isinstance(profile, dict) and 'function' in profile and 'expertise' in profile:
+                # Add to profiles
                 profiles[speaker] = profile
                 profiles_generated += 1
                 print(f"OK - {profile['function']}")
             else:
                 print("FAILED - Invalid response format")
-            
-            # Rate limit delay
-            time.sleep(RATE_LIMIT_DELAY)
-            
-        except Exception as e:
-            print(f"FAILED - {e}")
     
     # Save updated profiles
     save_speaker_profiles(profiles)
@@ -364,5 +442,9 @@ def main():
     print("\nDone!")
 
 
+def main():
+    asyncio.run(amain())
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,193 @@
+"""
+Fix missing speakers via the OpenAI Batch API
+
+Same profile generation as fix_missing_speakers.py, but all missing
+speakers go into a single Batch API job, grouped into requests the same way
+as the async script. This is a one-shot maintenance run, so the 24h
+completion window is fine in exchange for 50% lower cost and no per-minute
+rate limits. Quote files are updated once all profiles are in.
+
+Usage:
+    python fix_missing_speakers_batch_api.py                  # submit, wait, apply
+    python fix_missing_speakers_batch_api.py --resume BATCH_ID  # wait for an existing job
+"""
+
+import argparse
+import os
+import time
+
+import orjson
+from openai import OpenAI
+from dotenv import load_dotenv
+
+from fix_missing_speakers import (
+    MAX_TOKENS,
+    MISSING_SPEAKERS,
+    MODEL,
+    PROFILES_FILE,
+    SPEAKERS_PER_REQUEST,
+    build_analysis_messages,
+    find_transcript_file,
+    load_speaker_profiles,
+    parse_profile_response,
+    read_transcript_excerpt,
+    save_speaker_profiles,
+    update_quote_files,
+)
+
+load_dotenv('.env.local')
+
+BATCH_INPUT_FILE = "speaker_batch_input.jsonl"
+POLL_INTERVAL_SECONDS = 60
+TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+
+
+def collect_requests(profiles):
+    """Build Batch API requests for missing speakers with a transcript, several per request."""
+    pending = []
+
+    for speaker in MISSING_SPEAKERS:
+        if speaker in profiles:
+            print(f"  SKIPPED - {speaker} already has a profile")
+            continue
+
+        transcript_path = find_transcript_file(speaker)
+        if not transcript_path:
+            print(f"  NOT FOUND - No transcript file for {speaker}")
+            continue
+
+        pending.append((speaker, read_transcript_excerpt(transcript_path)))
+
+    requests = []
+    for i in range(0, len(pending), SPEAKERS_PER_REQUEST):
+        batch = pending[i:i + SPEAKERS_PER_REQUEST]
+        requests.append({
+            "custom_id": f"speakers-{i}",
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": {
+                "model": MODEL,
+                "messages": build_analysis_messages(batch),
+                "temperature": 0.3,
+                "max_tokens": MAX_TOKENS * len(batch),
+                "response_format": {"type": "json_object"}
+            }
+        })
+
+    return requests
+
+
+def submit_batch(requests):
+    """Write requests to JSONL, upload, and create the batch job. Returns the batch ID."""
+    with open(BATCH_INPUT_FILE, 'wb') as f:
+        for request in requests:
+            f.write(orjson.dumps(request) + b"\n")
+
+    with open(BATCH_INPUT_FILE, 'rb') as f:
+        input_file = client.files.create(file=f, purpose="batch")
+
+    batch = client.batches.create(
+        input_file_id=input_file.id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h"
+    )
+    return batch.id
+
+
+def wait_for_batch(batch_id):
+    """Poll until the batch reaches a terminal status."""
+    while True:
+        batch = client.batches.retrieve(batch_id)
+        counts = batch.request_counts
+        print(f"  Status: {batch.status} "
+              f"({counts.completed}/{counts.total} done, {counts.failed} failed)")
+
+        if batch.status in TERMINAL_STATUSES:
+            return batch
+
+        time.sleep(POLL_INTERVAL_SECONDS)
+
+
+def download_results(batch):
+    """Download the output file and return {speaker: profile}."""
+    results = {}
+    if not batch.output_file_id:
+        return results
+
+    content = client.files.content(batch.output_file_id).text
+    for line in content.splitlines():
+        if not line.strip():
+            continue
+
+        record = orjson.loads(line)
+        custom_id = record["custom_id"]
+        response = record.get("response") or {}
+
+        if response.get("status_code") != 200:
+            print(f"  FAILED - {custom_id}: status {response.get('status_code')}")
+            continue
+
+        try:
+            body = response["body"]
+            batch_profiles = parse_profile_response(body["choices"][0]["message"]["content"])
+        except (KeyError, IndexError, orjson.JSONDecodeError) as e:
+            print(f"  FAILED - {custom_id}: {e}")
+            continue
+
+        # Only keep profiles keyed by a speaker we asked about
+        for speaker, profile in batch_profiles.items():
+            if (speaker in MISSING_SPEAKERS and isinstance(profile, dict)
+                    and 'function' in profile and 'expertise' in profile):
+                results[speaker] = profile
+                print(f"  OK - {speaker}: {profile['function']}")
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate missing speaker profiles via the OpenAI Batch API")
+    parser.add_argument("--resume", metavar="BATCH_ID", help="Wait for and apply an existing batch")
+    args = parser.parse_args()
+
+    profiles = load_speaker_profiles()
+
+    print("=" * 60)
+    if args.resume:
+        batch_id = args.resume
+        print(f"Resuming batch {batch_id}")
+    else:
+        requests = collect_requests(profiles)
+        if not requests:
+            print("No missing speakers to analyze! Nothing to do.")
+            return
+
+        print(f"Submitting {len(requests)} requests to the Batch API...")
+        batch_id = submit_batch(requests)
+        print(f"Batch created: {batch_id}")
+        print(f"(Resume later with: python fix_missing_speakers_batch_api.py --resume {batch_id})")
+
+    print("=" * 60)
+    batch = wait_for_batch(batch_id)
+
+    if batch.status != "completed":
+        print(f"\nBatch ended with status '{batch.status}'. No files were changed.")
+        return
+
+    generated = download_results(batch)
+    profiles.update(generated)
+    save_speaker_profiles(profiles)
+    print(f"\n✓ Saved {len(profiles)} profiles to {PROFILES_FILE}")
+
+    files_updated, quotes_updated = update_quote_files(profiles)
+    print(f"✓ Updated {files_updated} files, {quotes_updated} quotes")
+
+    print("\n" + "=" * 60)
+    print(f"Profiles generated:       {len(generated)}")
+    print("\nRun fix_missing_speakers.py to retry anything the batch missed.")
+    print("\nDone!")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,25 +3,58 @@ Fix timestamps by mechanically extracting correct timestamps from transcripts
 
 PRECISE ALGORITHM:
 1. Find quote text position in transcript → quote_start_pos
-2. Define search window (BEFORE quote only!):
-   search_start = max(0, quote_start_pos - 200)
-   search_end = quote_start_pos  # NOT quote_start_pos + anything!
-3. Find ALL timestamps in search window
+2. Index ALL timestamps in the transcript once, by position
+3. Consider only timestamps ending at or before quote_start_pos
+   (BEFORE quote only!)
 4. Choose the LAST one (closest to quote, but still before it)
-5. If none found, expand to 500/1000 chars and retry
 
 CRITICAL: Never search beyond quote_start_pos!
 """
 
+import argparse
+import bisect
+import functools
+import hashlib
+import mmap
 import os
-import json
 import glob
+import pickle
 import re
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import ahocorasick
+import orjson
 
 
 # File paths
 OUTPUT_DIR = "output"
 TRANSCRIPTS_DIR = "transcripts"
+MAX_WORKERS = 16  # Files processed at once
+STATE_FILE = ".fix_timestamps.state.json"
+INDEX_CACHE_DIR = os.path.join(".cache", "transcripts")
+
+# Bump when clean_text_for_search or the timestamp pattern changes,
+# so cached transcript indexes are rebuilt
+INDEX_CACHE_VERSION = 2
+
+# Quote prefix length located in the single multi-pattern pass
+PREFIX_CHARS = 50
+
+# Search normalization: curly quotes -> straight quotes, whitespace runs -> one space
+QUOTE_TRANSLATION = str.maketrans({
+    '\u201c': '"',
+    '\u201d': '"',
+    '\u2018': "'",
+    '\u2019': "'",
+})
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
+# Timestamp pattern: matches (HH:MM:SS)
+TIMESTAMP_PATTERN = re.compile(r'\((\d{1,2}:\d{2}:\d{2})\)')
+
+# Characters dropped from speaker names when guessing transcript filenames
+SPECIAL_CHARS_PATTERN = re.compile(r"['\"\(\)]")
 
 
 def normalize_timestamp(ts):
@@ -36,141 +69,175 @@ def normalize_timestamp(ts):
     return ts
 
 
+@functools.lru_cache(maxsize=None)
+def list_transcripts():
+    """List TRANSCRIPTS_DIR once as a set of filenames."""
+    return frozenset(os.listdir(TRANSCRIPTS_DIR))
+
+
 def find_transcript_file(speaker_name, quote_filename):
     """Find the transcript file for a given speaker or quote file."""
+    transcript_files = list_transcripts()
+    
     # First try to derive from quote filename
     # Ada_Chen_Rekhi_quotes.json -> Ada_Chen_Rekhi.txt
     base_name = quote_filename.replace("_quotes.json", "")
-    filepath = os.path.join(TRANSCRIPTS_DIR, f"{base_name}.txt")
-    if os.path.exists(filepath):
-        return filepath
-    
-    # Try speaker name
-    filename = speaker_name.replace(" ", "_") + ".txt"
-    filepath = os.path.join(TRANSCRIPTS_DIR, filename)
-    if os.path.exists(filepath):
-        return filepath
-    
-    # Try without special characters
-    clean_name = re.sub(r"['\"\(\)]", "", speaker_name)
-    filename = clean_name.replace(" ", "_") + ".txt"
-    filepath = os.path.join(TRANSCRIPTS_DIR, filename)
-    if os.path.exists(filepath):
-        return filepath
+    candidates = [
+        f"{base_name}.txt",
+        # Try speaker name
+        speaker_name.replace(" ", "_") + ".txt",
+        # Try without special characters
+        SPECIAL_CHARS_PATTERN.sub("", speaker_name).replace(" ", "_") + ".txt",
+    ]
+    
+    for filename in candidates:
+        if filename in transcript_files:
+            return os.path.join(TRANSCRIPTS_DIR, filename)
     
     return None
 
 
 def clean_text_for_search(text):
     """Clean text for fuzzy matching."""
-    # Remove extra whitespace, normalize quotes
-    text = re.sub(r'\s+', ' ', text)
-    text = text.replace('"', '"').replace('"', '"')
-    text = text.replace("'", "'").replace("'", "'")
-    text = text.strip()
-    return text
-
-
-def find_quote_position(transcript, quote_text):
-    """Find the position of a quote in the transcript."""
-    # Clean both texts
-    clean_quote = clean_text_for_search(quote_text)
-    clean_transcript = clean_text_for_search(transcript)
+    # Normalize quotes in one pass, then collapse whitespace
+    return WHITESPACE_PATTERN.sub(' ', text.translate(QUOTE_TRANSLATION)).strip()
+
+
+def find_quote_position(clean_transcript, clean_quote, lower_transcript=None):
+    """
+    Find the position of a quote in the transcript; both already cleaned for search.
     
-    # Try exact match first
-    pos = clean_transcript.find(clean_quote)
-    if pos != -1:
-        return pos
-    
-    # Try first 100 characters
-    if len(clean_quote) > 100:
-        first_part = clean_quote[:100]
-        pos = clean_transcript.find(first_part)
-        if pos != -1:
-            return pos
-    
-    # Try first 50 characters
-    if len(clean_quote) > 50:
-        first_part = clean_quote[:50]
-        pos = clean_transcript.find(first_part)
-        if pos != -1:
-            return pos
-    
-    # Try first 30 characters (more lenient)
-    if len(clean_quote) > 30:
-        first_part = clean_quote[:30]
-        pos = clean_transcript.find(first_part)
-        if pos != -1:
-            return pos
+    Preference order: exact match, then the first 100, 50 and 30 characters,
+    then a case-insensitive match of the first 50. Pass `lower_transcript`
+    to reuse one lowercased transcript across quotes.
+    """
+    # Any longer prefix match is also a match of the first 30 characters, so
+    # locate that anchor once and search for longer matches only from there
+    anchor_pos = clean_transcript.find(clean_quote[:30])
+    if anchor_pos != -1:
+        candidates = [clean_quote]
+        if len(clean_quote) > 100:
+            candidates.append(clean_quote[:100])
+        if len(clean_quote) > 50:
+            candidates.append(clean_quote[:50])
+        
+        for first_part in candidates:
+            pos = clean_transcript.find(first_part, anchor_pos)
+            if pos != -1:
+                return pos
+        
+        # First 30 characters (more lenient)
+        return anchor_pos
     
     # Try case-insensitive match
-    pos = clean_transcript.lower().find(clean_quote.lower()[:50])
-    if pos != -1:
-        return pos
+    if lower_transcript is None:
+        lower_transcript = clean_transcript.lower()
+    return lower_transcript.find(clean_quote.lower()[:50])
+
+
+def find_prefix_positions(clean_transcript, prefixes):
+    """Find the first position of every prefix in one Aho-Corasick pass over the transcript."""
+    automaton = ahocorasick.Automaton()
+    for prefix in prefixes:
+        if prefix:
+            automaton.add_word(prefix, prefix)
+    
+    positions = {}
+    if not len(automaton):
+        return positions
+    
+    automaton.make_automaton()
+    for end_idx, prefix in automaton.iter(clean_transcript):
+        if prefix not in positions:
+            positions[prefix] = end_idx - len(prefix) + 1
+    
+    return positions
+
+
+def build_timestamp_index(transcript):
+    """
+    Find every (HH:MM:SS) timestamp in the transcript once.
     
-    return -1
+    Returns (end_positions, timestamps), both sorted by position.
+    """
+    end_positions = []
+    timestamps = []
+    for match in TIMESTAMP_PATTERN.finditer(transcript):
+        end_positions.append(match.end())
+        timestamps.append(match.group(1))
+    return end_positions, timestamps
 
 
-def find_timestamp_before_position(transcript, quote_start_pos):
+def find_timestamp_before_position(timestamp_index, quote_start_pos):
     """
     Find the closest timestamp that appears IMMEDIATELY BEFORE the quote.
     
-    CRITICAL: Only searches BEFORE quote_start_pos, never after!
+    CRITICAL: Only considers timestamps that end at or before quote_start_pos,
+    never after!
     
-    Algorithm:
-    1. Define search window: [quote_start_pos - 200, quote_start_pos]
-    2. Find ALL timestamps in this window
-    3. Choose the LAST one (closest to quote, but still before it)
-    4. If none found, expand to 500 chars and retry
+    The LAST such timestamp is the closest to the quote, so a binary search
+    over the transcript's timestamp index finds it directly.
     """
-    # Timestamp pattern: matches (HH:MM:SS), (MM:SS), or standalone
-    timestamp_pattern = re.compile(r'\((\d{1,2}:\d{2}:\d{2})\)')
-    
-    def search_in_window(window_size):
-        """Search for timestamps in a window before the quote."""
-        # Define search window (BEFORE quote only!)
-        search_start = max(0, quote_start_pos - window_size)
-        search_end = quote_start_pos  # NOT quote_start_pos + anything!
-        
-        # Extract search text
-        search_text = transcript[search_start:search_end]
-        
-        # Find ALL timestamps in this search_text
-        timestamps = []
-        for match in timestamp_pattern.finditer(search_text):
-            ts = match.group(1)
-            ts_pos = match.start()  # Position relative to search_start
-            timestamps.append((ts_pos, ts))
-        
-        if timestamps:
-            # Sort by position (ascending)
-            timestamps.sort(key=lambda x: x[0])
-            # Choose the LAST one (closest to quote, but still before it)
-            return timestamps[-1][1]
-        
-        return None
-    
-    # First try: search in 200 chars before quote
-    result = search_in_window(200)
-    if result:
-        return normalize_timestamp(result)
+    end_positions, timestamps = timestamp_index
+    idx = bisect.bisect_right(end_positions, quote_start_pos) - 1
+    if idx >= 0:
+        return normalize_timestamp(timestamps[idx])
+    return None
+
+
+def read_transcript(transcript_path):
+    """Read a transcript by decoding straight from its mapped pages."""
+    with open(transcript_path, 'rb') as f:
+        # mmap can't map an empty file
+        if os.fstat(f.fileno()).st_size == 0:
+            return ""
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            transcript = str(mm, 'utf-8')
+    
+    # Match text-mode reads: positions index universal-newline text
+    if '\r' in transcript:
+        transcript = transcript.replace('\r\n', '\n').replace('\r', '\n')
+    return transcript
+
+
+def load_or_build_index(transcript_path):
+    """
+    Return (clean_transcript, timestamp_index) for a transcript.
     
-    # Second try: expand to 500 chars
-    result = search_in_window(500)
-    if result:
-        return normalize_timestamp(result)
+    Cached on disk and reused until the transcript's mtime changes.
+    """
+    mtime = os.path.getmtime(transcript_path)
+    key = hashlib.sha1(os.path.abspath(transcript_path).encode('utf-8')).hexdigest()
+    cache_path = os.path.join(INDEX_CACHE_DIR, f"{key}.pkl")
     
-    # Third try: expand to 1000 chars (for quotes far from timestamp)
-    result = search_in_window(1000)
-    if result:
-        return normalize_timestamp(result)
+    try:
+        with open(cache_path, 'rb') as f:
+            cached = pickle.load(f)
+        if cached['version'] == INDEX_CACHE_VERSION and cached['mtime'] == mtime:
+            return cached['clean'], (cached['ts_pos'], cached['ts_val'])
+    except (OSError, pickle.UnpicklingError, EOFError, KeyError):
+        pass
     
-    # Last try: search entire text before quote
-    result = search_in_window(quote_start_pos)
-    if result:
-        return normalize_timestamp(result)
+    transcript = read_transcript(transcript_path)
     
-    return None
+    # Also create a cleaned version for searching
+    clean_transcript = clean_text_for_search(transcript)
+    ts_pos, ts_val = build_timestamp_index(transcript)
+    
+    # Unique temp file: files sharing a transcript may be processed concurrently
+    os.makedirs(INDEX_CACHE_DIR, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=INDEX_CACHE_DIR, suffix=".tmp")
+    with os.fdopen(fd, 'wb') as f:
+        pickle.dump({
+            'version': INDEX_CACHE_VERSION,
+            'mtime': mtime,
+            'clean': clean_transcript,
+            'ts_pos': ts_pos,
+            'ts_val': ts_val,
+        }, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, cache_path)
+    
+    return clean_transcript, (ts_pos, ts_val)
 
 
 def process_quote_file(filepath):
@@ -178,8 +245,8 @@ def process_quote_file(filepath):
     filename = os.path.basename(filepath)
     
     # Load quotes
-    with open(filepath, 'r', encoding='utf-8') as f:
-        quotes = json.load(f)
+    with open(filepath, 'rb') as f:
+        quotes = orjson.loads(f.read())
     
     if not quotes:
         return {
@@ -201,31 +268,40 @@ def process_quote_file(filepath):
             'warnings': [f"Transcript not found for {filename}"]
         }
     
-    # Load transcript
-    with open(transcript_path, 'r', encoding='utf-8') as f:
-        transcript = f.read()
+    clean_transcript, timestamp_index = load_or_build_index(transcript_path)
     
-    # Also create a cleaned version for searching
-    clean_transcript = clean_text_for_search(transcript)
+    # Locate every quote's opening in one pass instead of one scan per quote
+    clean_quotes = [clean_text_for_search(quote.get('text', '')) for quote in quotes]
+    prefix_positions = find_prefix_positions(
+        clean_transcript, {clean_quote[:PREFIX_CHARS] for clean_quote in clean_quotes}
+    )
+    
+    lower_transcript = None
     
     # Statistics
     stats = {
         'quotes_checked': len(quotes),
         'timestamps_updated': 0,
         'timestamps_unchanged': 0,
-        'warnings': []
+        'warnings': [],
+        'transcript_path': transcript_path
     }
     
     # Process each quote
-    for quote in quotes:
+    for quote, clean_quote in zip(quotes, clean_quotes):
         quote_text = quote.get('text', '')
         old_timestamp = quote.get('timestamp', '')
         
         if not quote_text:
             continue
         
-        # Find quote position in transcript
-        pos = find_quote_position(transcript, quote_text)
+        # Find quote position in transcript: the first prefix hit is the exact
+        # match when the whole quote starts there, otherwise use the fallbacks
+        pos = prefix_positions.get(clean_quote[:PREFIX_CHARS], -1)
+        if pos == -1 or not clean_transcript.startswith(clean_quote, pos):
+            if lower_transcript is None:
+                lower_transcript = clean_transcript.lower()
+            pos = find_quote_position(clean_transcript, clean_quote, lower_transcript)
         
         if pos == -1:
             # Quote text not found
@@ -234,7 +310,7 @@ def process_quote_file(filepath):
             continue
         
         # Find timestamp before this position
-        new_timestamp = find_timestamp_before_position(transcript, pos)
+        new_timestamp = find_timestamp_before_position(timestamp_index, pos)
         
         if new_timestamp is None:
             # No timestamp found
@@ -254,12 +330,39 @@ def process_quote_file(filepath):
             stats['timestamps_unchanged'] += 1
     
     # Save updated quotes
-    with open(filepath, 'w', encoding='utf-8') as f:
-        json.dump(quotes, f, indent=2, ensure_ascii=False)
+    with open(filepath, 'wb') as f:
+        f.write(orjson.dumps(quotes, option=orjson.OPT_INDENT_2))
     
     return stats
 
 
+def load_state():
+    """Load {quote filepath: [quote mtime, transcript path, transcript mtime]} from the last run."""
+    if os.path.exists(STATE_FILE):
+        with open(STATE_FILE, 'rb') as f:
+            return orjson.loads(f.read())
+    return {}
+
+
+def save_state(state):
+    """Save the per-file state for the next incremental run."""
+    with open(STATE_FILE, 'wb') as f:
+        f.write(orjson.dumps(state, option=orjson.OPT_INDENT_2))
+
+
+def is_unchanged(filepath, state):
+    """True if neither the quote file nor its transcript changed since the last run."""
+    entry = state.get(filepath)
+    if not entry:
+        return False
+    quote_mtime, transcript_path, transcript_mtime = entry
+    try:
+        return (os.stat(filepath).st_mtime_ns == quote_mtime
+                and os.stat(transcript_path).st_mtime_ns == transcript_mtime)
+    except OSError:
+        return False
+
+
 def get_quote_files():
     """Get all quote JSON files from output directory."""
     pattern = os.path.join(OUTPUT_DIR, "*_quotes.json")
@@ -268,6 +371,11 @@ def get_quote_files():
 
 def main():
     """Main function to fix timestamps."""
+    parser = argparse.ArgumentParser(description="Fix quote timestamps from transcripts")
+    parser.add_argument("--force", action="store_true",
+                        help="Reprocess every file, even if it and its transcript are unchanged")
+    args = parser.parse_args()
+    
     print("=" * 60)
     print("Fixing Timestamps from Transcripts")
     print("=" * 60)
@@ -276,8 +384,13 @@ def main():
     quote_files = get_quote_files()
     print(f"\nFound {len(quote_files)} quote files in {OUTPUT_DIR}/\n")
     
+    # Skip files that neither changed nor had their transcript change since the last run
+    state = {} if args.force else load_state()
+    pending_files = [fp for fp in quote_files if not is_unchanged(fp, state)]
+    
     # Statistics
     total_stats = {
+        'files_skipped': len(quote_files) - len(pending_files),
         'files_processed': 0,
         'quotes_checked': 0,
         'timestamps_updated': 0,
@@ -287,12 +400,15 @@ def main():
     
     all_warnings = []
     
-    # Process each file
-    for filepath in quote_files:
+    # Files are independent; overlap their reads and writes, report in file order
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        futures = [executor.submit(process_quote_file, filepath) for filepath in pending_files]
+    
+    for filepath, future in zip(pending_files, futures):
         filename = os.path.basename(filepath)
         
         try:
-            stats = process_quote_file(filepath)
+            stats = future.result()
             
             total_stats['files_processed'] += 1
             total_stats['quotes_checked'] += stats['quotes_checked']
@@ -300,6 +416,13 @@ def main():
             total_stats['timestamps_unchanged'] += stats['timestamps_unchanged']
             total_stats['warnings'] += len(stats['warnings'])
             
+            if stats.get('transcript_path'):
+                state[filepath] = [
+                    os.stat(filepath).st_mtime_ns,
+                    stats['transcript_path'],
+                    os.stat(stats['transcript_path']).st_mtime_ns
+                ]
+            
             # Show progress
             if stats['warnings']:
                 all_warnings.extend([(filename, w) for w in stats['warnings']])
@@ -310,10 +433,13 @@ def main():
         except Exception as e:
             print(f"Processing {filename}: ERROR - {e}")
     
+    save_state(state)
+    
     # Print summary
     print("\n" + "=" * 60)
     print("SUMMARY")
     print("=" * 60)
+    print(f"Files skipped (unchanged):    {total_stats['files_skipped']}")
     print(f"Files processed:              {total_stats['files_processed']}")
     print(f"Quotes checked:               {total_stats['quotes_checked']}")
     print(f"Timestamps updated:           {total_stats['timestamps_updated']}")
@@ -2,22 +2,24 @@
 Generate speaker profiles from transcripts using GPT-4o-mini
 """
 
+import asyncio
+import functools
 import os
-import json
-import time
 import re
 import glob
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+import httpx
+import orjson
 from dotenv import load_dotenv
 
-from openai import OpenAI
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+from rate_limiter import AsyncLimiter, estimate_tokens, retry_openai
+from response_cache import ResponseCache
 
 # Load environment variables
 load_dotenv('.env.local')
 
-# Initialize OpenAI client
-client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
-
 # Model configuration
 MODEL = "gpt-4o-mini"
 
@@ -26,24 +28,53 @@ OUTPUT_DIR = "output"
 TRANSCRIPTS_DIR = "transcripts"
 EXISTING_PROFILES_FILE = "speaker_profiles.json"
 GENERATED_PROFILES_FILE = "speaker_profiles_generated.json"
+RESPONSE_CACHE_FILE = os.path.join(".llm_cache", "profiles.sqlite")
+
+# OpenAI account limits for gpt-4o-mini
+RPM_LIMIT = 500
+TPM_LIMIT = 200_000
+MAX_CONCURRENT = 50
+MAX_TOKENS = 80  # Per speaker; one profile is ~50 tokens of JSON
+SPEAKERS_PER_REQUEST = 10  # Speakers analyzed in one API call
+
+# Initialize OpenAI client; concurrent requests share HTTP/2 connections
+# instead of each opening its own TCP+TLS session
+client = AsyncOpenAI(
+    api_key=os.environ.get("OPENAI_API_KEY"),
+    max_retries=0,  # retry_openai() retries instead of the SDK
+    http_client=DefaultAsyncHttpxClient(
+        http2=True,
+        limits=httpx.Limits(max_connections=MAX_CONCURRENT, max_keepalive_connections=MAX_CONCURRENT)
+    )
+)
+limiter = AsyncLimiter(rpm=RPM_LIMIT, tpm=TPM_LIMIT)
+semaphore = asyncio.Semaphore(MAX_CONCURRENT)
 
-# Rate limit delay (seconds)
-RATE_LIMIT_DELAY = 1
+# Profiles from earlier runs, keyed by the exact request
+response_cache = ResponseCache(RESPONSE_CACHE_FILE)
 
 # How many characters to read from transcript
 TRANSCRIPT_CHARS = 3000
 
+# Quote files read at once
+MAX_WORKERS = 16
+
+# Characters dropped from speaker names when guessing transcript filenames
+SPECIAL_CHARS_PATTERN = re.compile(r'[^\w\s]')
+
 # Analysis prompt
-ANALYSIS_PROMPT = """Analyze this podcast transcript excerpt and identify the guest speaker's professional background.
+ANALYSIS_PROMPT = """Analyze these podcast transcript excerpts and identify each guest speaker's professional background.
 
-Based on the content, determine:
+Based on the content, determine for each speaker:
 1. Their primary function/role category
 2. Their areas of expertise (3 items max)
 
-Return ONLY a JSON object in this exact format:
+Return ONLY a JSON object mapping each speaker's name, exactly as given, to their profile, for ALL speakers below:
 {
-  "function": "<one of: Product|Engineering|Design|Marketing|Sales|Growth|Operations|Leadership|Finance|Data|HR|Legal|Consulting>",
-  "expertise": ["expertise1", "expertise2", "expertise3"]
+  "<speaker name>": {
+    "function": "<one of: Product|Engineering|Design|Marketing|Sales|Growth|Operations|Leadership|Finance|Data|HR|Legal|Consulting>",
+    "expertise": ["expertise1", "expertise2", "expertise3"]
+  }
 }
 
 Guidelines for function:
@@ -71,52 +102,65 @@ Return ONLY the JSON object, no other text."""
 def load_existing_profiles():
     """Load existing speaker profiles."""
     if os.path.exists(EXISTING_PROFILES_FILE):
-        with open(EXISTING_PROFILES_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        with open(EXISTING_PROFILES_FILE, 'rb') as f:
+            return orjson.loads(f.read())
     return {}
 
 
+def save_generated_profiles(profiles):
+    """Save existing + generated profiles to the generated profiles file."""
+    with open(GENERATED_PROFILES_FILE, 'wb') as f:
+        f.write(orjson.dumps(profiles, option=orjson.OPT_INDENT_2))
+
+
+def load_speakers(filepath):
+    """Return the set of speaker names in one quote file."""
+    try:
+        with open(filepath, 'rb') as f:
+            quotes = orjson.loads(f.read())
+        return {quote['speaker'] for quote in quotes if 'speaker' in quote}
+    except Exception as e:
+        print(f"Warning: Could not read {filepath}: {e}")
+        return set()
+
+
 def get_speakers_from_quotes():
     """Extract all unique speaker names from quote files."""
-    speakers = set()
     quote_files = glob.glob(os.path.join(OUTPUT_DIR, "*_quotes.json"))
     
-    for filepath in quote_files:
-        try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                quotes = json.load(f)
-                for quote in quotes:
-                    if 'speaker' in quote:
-                        speakers.add(quote['speaker'])
-        except Exception as e:
-            print(f"Warning: Could not read {filepath}: {e}")
-    
-    return speakers
+    # Read files in parallel; file reads and parsing are independent
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        return set().union(*executor.map(load_speakers, quote_files))
+
+
+@functools.lru_cache(maxsize=None)
+def list_transcripts():
+    """List TRANSCRIPTS_DIR once: (set of filenames, [(lowercased, filename)])."""
+    files = os.listdir(TRANSCRIPTS_DIR)
+    return set(files), [(file.lower(), file) for file in files]
 
 
 def find_transcript_file(speaker_name):
     """Find the transcript file for a given speaker name."""
+    transcript_files, transcript_files_lower = list_transcripts()
+    
     # Convert speaker name to potential filename
     # "Brian Balfour" -> "Brian_Balfour.txt"
     filename = speaker_name.replace(" ", "_") + ".txt"
-    filepath = os.path.join(TRANSCRIPTS_DIR, filename)
-    
-    if os.path.exists(filepath):
-        return filepath
+    if filename in transcript_files:
+        return os.path.join(TRANSCRIPTS_DIR, filename)
     
     # Try variations
     # Handle special characters
-    clean_name = re.sub(r'[^\w\s]', '', speaker_name)
+    clean_name = SPECIAL_CHARS_PATTERN.sub('', speaker_name)
     filename = clean_name.replace(" ", "_") + ".txt"
-    filepath = os.path.join(TRANSCRIPTS_DIR, filename)
-    
-    if os.path.exists(filepath):
-        return filepath
+    if filename in transcript_files:
+        return os.path.join(TRANSCRIPTS_DIR, filename)
     
     # Search for partial matches
-    search_pattern = speaker_name.split()[0] + "_" + speaker_name.split()[-1]
-    for file in os.listdir(TRANSCRIPTS_DIR):
-        if search_pattern.lower() in file.lower():
+    search_pattern = (speaker_name.split()[0] + "_" + speaker_name.split()[-1]).lower()
+    for file_lower, file in transcript_files_lower:
+        if search_pattern in file_lower:
             return os.path.join(TRANSCRIPTS_DIR, file)
     
     return None
@@ -124,47 +168,64 @@ def find_transcript_file(speaker_name):
 
 def read_transcript_excerpt(filepath, max_chars=TRANSCRIPT_CHARS):
     """Read the first N characters of a transcript."""
-    with open(filepath, 'r', encoding='utf-8') as f:
-        return f.read(max_chars)
-
-
-def analyze_speaker(speaker_name, transcript_excerpt):
-    """Use GPT-4o-mini to analyze speaker profile."""
-    response = client.chat.completions.create(
-        model=MODEL,
-        messages=[
-            {
-                "role": "system",
-                "content": ANALYSIS_PROMPT
-            },
-            {
-                "role": "user",
-                "content": f"Speaker: {speaker_name}\n\nTranscript excerpt:\n{transcript_excerpt}"
-            }
-        ],
-        temperature=0.3,
-        max_tokens=256
-    )
-    
-    response_text = response.choices[0].message.content.strip()
-    
-    # Extract JSON from response
-    if response_text.startswith("```"):
-        response_text = re.sub(r'^```(?:json)?\s*\n?', '', response_text)
-        response_text = re.sub(r'\n?```\s*$', '', response_text)
-    
-    # Find JSON object
-    start_idx = response_text.find('{')
-    end_idx = response_text.rfind('}')
-    
-    if start_idx != -1 and end_idx != -1:
-        json_str = response_text[start_idx:end_idx + 1]
-        return json.loads(json_str)
-    
-    return json.loads(response_text)
+    # One raw read covers max_chars even if every character is 4 UTF-8 bytes
+    fd = os.open(filepath, os.O_RDONLY)
+    try:
+        data = os.read(fd, max_chars * 4)
+    finally:
+        os.close(fd)
+    text = data.decode('utf-8', errors='ignore')
+    if '\r' in text:
+        # Match text-mode reads, which translate Windows and old Mac newlines
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+    return text[:max_chars]
 
 
-def main():
+def build_analysis_messages(speakers):
+    """Chat messages asking for the function and expertise of each (speaker, excerpt) pair."""
+    sections = [
+        f"### Speaker {i}: {speaker_name}\n{transcript_excerpt}"
+        for i, (speaker_name, transcript_excerpt) in enumerate(speakers, 1)
+    ]
+    return [
+        {
+            "role": "system",
+            "content": ANALYSIS_PROMPT
+        },
+        {
+            "role": "user",
+            "content": "\n\n".join(sections)
+        }
+    ]
+
+
+def profile_cache_key(speaker_name, transcript_excerpt):
+    """Response cache key for one speaker, independent of how speakers are batched."""
+    return response_cache.key(MODEL, build_analysis_messages([(speaker_name, transcript_excerpt)]))
+
+
+@retry_openai()
+async def create_completion(messages, max_tokens):
+    """Rate-limited chat completion, retried on transient API errors."""
+    async with semaphore:
+        await limiter.acquire(estimate_tokens(messages, max_tokens))
+        return await client.chat.completions.create(
+            model=MODEL,
+            messages=messages,
+            temperature=0.3,
+            max_tokens=max_tokens,
+            response_format={"type": "json_object"}
+        )
+
+
+async def analyze_speakers(speakers):
+    """Use GPT-4o-mini to analyze a batch of speakers. Returns {speaker_name: profile}."""
+    response = await create_completion(build_analysis_messages(speakers), MAX_TOKENS * len(speakers))
+    # JSON mode guarantees a bare JSON object, no fences or prose to strip
+    return orjson.loads(response.choices[0].message.content)
+
+
+async def amain():
     """Main function to generate speaker profiles."""
     print("=" * 60)
     print("Generating Speaker Profiles with GPT-4o-mini")
@@ -195,44 +256,61 @@ def main():
     
     print(f"\nProcessing {len(new_speakers)} speakers...\n")
     
-    for idx, speaker in enumerate(sorted(new_speakers), 1):
-        print(f"[{idx}/{len(new_speakers)}] {speaker}...", end=" ", flush=True)
-        
+    results = {}
+    pending = []
+    for speaker in sorted(new_speakers):
         # Find transcript file
         transcript_path = find_transcript_file(speaker)
-        
         if not transcript_path:
-            print("SKIPPED - No transcript found")
-            skipped.append(speaker)
+            results[speaker] = None
             continue
         
-        try:
-            # Read transcript excerpt
-            excerpt = read_transcript_excerpt(transcript_path)
-            
-            # Analyze with GPT
-            profile = analyze_speaker(speaker, excerpt)
-            
-            # Validate profile
-            if 'function' in profile and 'expertise' in profile:
-                generated_profiles[speaker] = profile
-                processed += 1
-                print(f"OK - {profile['function']}")
-            else:
-                print("FAILED - Invalid response format")
-                failed.append((speaker, "Invalid response format"))
-                
-        except json.JSONDecodeError as e:
-            print(f"FAILED - JSON error: {e}")
-            failed.append((speaker, f"JSON error: {e}"))
+        # Same excerpt as an earlier run: reuse its profile
+        excerpt = read_transcript_excerpt(transcript_path)
+        cached = response_cache.get(profile_cache_key(speaker, excerpt))
+        if cached is not None:
+            results[speaker] = cached
+        else:
+            pending.append((speaker, excerpt))
+    
+    # Several speakers share each call; the semaphore and limiter bound the API load
+    batches = [pending[i:i + SPEAKERS_PER_REQUEST] for i in range(0, len(pending), SPEAKERS_PER_REQUEST)]
+    batch_results = await asyncio.gather(*(analyze_speakers(batch) for batch in batches), return_exceptions=True)
+    
+    for batch, batch_profiles in zip(batches, batch_results):
+        for speaker, excerpt in batch:
+            if isinstance(batch_profiles, Exception):
+                results[speaker] = batch_profiles
+                continue
             
-        except Exception as e:
-            print(f"FAILED - {e}")
-            failed.append((speaker, str(e)))
+            profile = batch_profiles.get(speaker)
+            if not isinstance(profile, dict):
+                profile = {}
+            elif 'function' in profile and 'expertise' in profile:
+                response_cache.set(profile_cache_key(speaker, excerpt), profile)
+            results[speaker] = profile
+    
+    for idx, speaker in enumerate(sorted(new_speakers), 1):
+        profile = results[speaker]
+        print(f"[{idx}/{len(new_speakers)}] {speaker}...", end=" ")
         
-        # Rate limit delay
-        if idx < len(new_speakers):
-            time.sleep(RATE_LIMIT_DELAY)
+        if isinstance(profile, orjson.JSONDecodeError):
+            print(f"FAILED - JSON error: {profile}")
+            failed.append((speaker, f"JSON error: {profile}"))
+        elif isinstance(profile, Exception):
+            print(f"FAILED - {profile}")
+            failed.append((speaker, str(profile)))
+        elif profile is None:
+            print("SKIPPED - No transcript found")
+            skipped.append(speaker)
+        elif 'function' in profile and 'expertise' in profile:
+            # Validate profile
+            generated_profiles[speaker] = profile
+            processed += 1
+            print(f"OK - {profile['function']}")
+        else:
+            print("FAILED - Invalid response format")
+            failed.append((speaker, "Invalid response format"))
     
     # Calculate elapsed time
     end_time = datetime.now()
@@ -243,8 +321,7 @@ def main():
     all_profiles = {**existing_profiles, **generated_profiles}
     
     # Save generated profiles
-    with open(GENERATED_PROFILES_FILE, 'w', encoding='utf-8') as f:
-        json.dump(all_profiles, f, indent=2, ensure_ascii=False)
+    save_generated_profiles(all_profiles)
     
     # Print summary
     print("\n" + "=" * 60)
@@ -284,5 +361,9 @@ def main():
     print("\nDone!")
 
 
+def main():
+    asyncio.run(amain())
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,210 @@
+"""
+Generate speaker profiles via the OpenAI Batch API
+
+Same profile generation as generate_speaker_profiles.py, but all new
+speakers go into a single Batch API job, grouped into requests the same way
+as the async script. Profiling is offline
+ETL that nobody waits on, so the 24h completion window is fine in exchange
+for 50% lower cost and no per-minute rate limits.
+
+Usage:
+    python generate_speaker_profiles_batch_api.py                  # submit, wait, apply
+    python generate_speaker_profiles_batch_api.py --resume BATCH_ID  # wait for an existing job
+"""
+
+import argparse
+import os
+import time
+
+import orjson
+from openai import OpenAI
+from dotenv import load_dotenv
+
+from generate_speaker_profiles import (
+    GENERATED_PROFILES_FILE,
+    MAX_TOKENS,
+    MODEL,
+    SPEAKERS_PER_REQUEST,
+    build_analysis_messages,
+    find_transcript_file,
+    get_speakers_from_quotes,
+    load_existing_profiles,
+    read_transcript_excerpt,
+    save_generated_profiles,
+)
+
+load_dotenv('.env.local')
+
+BATCH_INPUT_FILE = "profiles_batch_input.jsonl"
+POLL_INTERVAL_SECONDS = 60
+TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+
+
+def collect_pending(existing_profiles):
+    """Read excerpts for speakers without a profile. Returns ([(speaker, excerpt)], skipped)."""
+    pending = []
+    skipped = []
+
+    new_speakers = [s for s in get_speakers_from_quotes() if s not in existing_profiles]
+    for speaker in sorted(new_speakers):
+        transcript_path = find_transcript_file(speaker)
+        if not transcript_path:
+            skipped.append(speaker)
+            continue
+
+        pending.append((speaker, read_transcript_excerpt(transcript_path)))
+
+    return pending, skipped
+
+
+def collect_requests(pending):
+    """Build Batch API requests for the pending speakers, several per request."""
+    requests = []
+    for i in range(0, len(pending), SPEAKERS_PER_REQUEST):
+        batch = pending[i:i + SPEAKERS_PER_REQUEST]
+        requests.append({
+            "custom_id": f"speakers-{i}",
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": {
+                "model": MODEL,
+                "messages": build_analysis_messages(batch),
+                "temperature": 0.3,
+                "max_tokens": MAX_TOKENS * len(batch),
+                "response_format": {"type": "json_object"}
+            }
+        })
+
+    return requests
+
+
+def submit_batch(requests):
+    """Write requests to JSONL, upload, and create the batch job. Returns the batch ID."""
+    with open(BATCH_INPUT_FILE, 'wb') as f:
+        for request in requests:
+            f.write(orjson.dumps(request) + b"\n")
+
+    with open(BATCH_INPUT_FILE, 'rb') as f:
+        input_file = client.files.create(file=f, purpose="batch")
+
+    batch = client.batches.create(
+        input_file_id=input_file.id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h"
+    )
+    return batch.id
+
+
+def wait_for_batch(batch_id):
+    """Poll until the batch reaches a terminal status."""
+    while True:
+        batch = client.batches.retrieve(batch_id)
+        counts = batch.request_counts
+        print(f"  Status: {batch.status} "
+              f"({counts.completed}/{counts.total} done, {counts.failed} failed)")
+
+        if batch.status in TERMINAL_STATUSES:
+            return batch
+
+        time.sleep(POLL_INTERVAL_SECONDS)
+
+
+def download_results(batch, speakers):
+    """Download the output file. Returns ({speaker: profile}, [(speaker, error)])."""
+    profiles = {}
+    if batch.output_file_id:
+        profiles = parse_output(client.files.content(batch.output_file_id).text, speakers)
+
+    failed = [(speaker, "No valid profile in response") for speaker in sorted(speakers) if speaker not in profiles]
+    return profiles, failed
+
+
+def parse_output(content, speakers):
+    """Collect valid profiles for the requested speakers from batch output JSONL."""
+    profiles = {}
+    for line in content.splitlines():
+        if not line.strip():
+            continue
+
+        record = orjson.loads(line)
+        custom_id = record["custom_id"]
+        response = record.get("response") or {}
+
+        if response.get("status_code") != 200:
+            print(f"  FAILED - {custom_id}: HTTP {response.get('status_code')}")
+            continue
+
+        try:
+            body = response["body"]
+            batch_profiles = orjson.loads(body["choices"][0]["message"]["content"])
+        except (KeyError, IndexError, orjson.JSONDecodeError) as e:
+            print(f"  FAILED - {custom_id}: {e}")
+            continue
+
+        # Only keep profiles keyed by a speaker we asked about
+        for speaker, profile in batch_profiles.items():
+            if (speaker in speakers and isinstance(profile, dict)
+                    and 'function' in profile and 'expertise' in profile):
+                profiles[speaker] = profile
+
+    return profiles
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate speaker profiles via the OpenAI Batch API")
+    parser.add_argument("--resume", metavar="BATCH_ID", help="Wait for and apply an existing batch")
+    args = parser.parse_args()
+
+    existing_profiles = load_existing_profiles()
+    pending, skipped = collect_pending(existing_profiles)
+
+    print("=" * 60)
+    if args.resume:
+        batch_id = args.resume
+        print(f"Resuming batch {batch_id}")
+    else:
+        if skipped:
+            print(f"Skipping {len(skipped)} speakers with no transcript")
+        requests = collect_requests(pending)
+        if not requests:
+            print("No new speakers to analyze. Done!")
+            return
+
+        print(f"Submitting {len(pending)} speakers in {len(requests)} requests to the Batch API...")
+        batch_id = submit_batch(requests)
+        print(f"Batch created: {batch_id}")
+        print(f"(Resume later with: python generate_speaker_profiles_batch_api.py --resume {batch_id})")
+
+    print("=" * 60)
+    batch = wait_for_batch(batch_id)
+
+    if batch.status != "completed":
+        print(f"\nBatch ended with status '{batch.status}'. No files were changed.")
+        return
+
+    generated_profiles, failed = download_results(batch, {speaker for speaker, _ in pending})
+    all_profiles = {**existing_profiles, **generated_profiles}
+    save_generated_profiles(all_profiles)
+
+    print("\n" + "=" * 60)
+    print("SUMMARY")
+    print("=" * 60)
+    print(f"Speakers processed:  {len(generated_profiles)}")
+    print(f"Speakers failed:     {len(failed)}")
+    print(f"Total profiles:      {len(all_profiles)}")
+    print(f"Output file:         {GENERATED_PROFILES_FILE}")
+
+    if failed:
+        print(f"\nFailed speakers:")
+        for speaker, error in failed[:10]:
+            print(f"  - {speaker}: {error}")
+        if len(failed) > 10:
+            print(f"  ... and {len(failed) - 10} more")
+
+    print("\nDone!")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,106 +5,163 @@ For each enriched vocabulary item in the quote files, generates an insight
 object with: nuance, synonyms, and antonyms.
 
 Uses OpenAI API with structured JSON output.
-Batches by speaker file with checkpoint/resume capability.
+Batches by speaker file with checkpoint/resume capability. Insights are
+cached per word in insights_by_word.json, so only words never seen before
+are sent to the API.
 Stores insights nested inside each vocabulary object.
 """
 
-import json
+import asyncio
 import os
-import time
-from pathlib import Path
-from openai import OpenAI
+import httpx
+import orjson
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
 from dotenv import load_dotenv
+from checkpoint import Checkpoint
+from rate_limiter import AsyncLimiter, estimate_tokens, retry_openai
+from response_cache import ResponseCache
 
 load_dotenv(".env.local")
 
 OUTPUT_DIR = "output"
-CHECKPOINT_FILE = "insights_generation_checkpoint.json"
-
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-
-
-def load_checkpoint() -> set:
-    """Load set of already-processed files."""
-    if os.path.exists(CHECKPOINT_FILE):
-        with open(CHECKPOINT_FILE, "r") as f:
-            return set(json.load(f))
-    return set()
-
-
-def save_checkpoint(processed: set):
-    """Save checkpoint of processed files."""
-    with open(CHECKPOINT_FILE, "w") as f:
-        json.dump(list(processed), f)
-
-
-def generate_insights_batch(vocab_items: list[dict], quote_context: str) -> list[dict]:
-    """
-    Generate AI insights for a batch of vocabulary items.
-    Returns list of insight objects with nuance, synonyms, antonyms.
-    """
-    words_desc = "\n".join(
-        f"- \"{item['word']}\": {item.get('definition', 'N/A')}"
-        for item in vocab_items
+CHECKPOINT_FILE = "insights_generation_checkpoint.ndjson"
+LEGACY_CHECKPOINT_FILE = "insights_generation_checkpoint.json"  # JSON list written by earlier versions
+INSIGHT_CACHE_FILE = "insights_by_word.json"
+RESPONSE_CACHE_FILE = os.path.join(".llm_cache", "insights.sqlite")
+MODEL = "gpt-4o-mini"
+MAX_TOKENS = 2000
+
+# OpenAI account limits for gpt-4o-mini
+RPM_LIMIT = 500
+TPM_LIMIT = 200_000
+MAX_CONCURRENT = 50
+MAX_CONCURRENT_FILES = 8  # Quote files in flight at once
+CACHE_SAVE_EVERY = 10  # Finished files between insight cache rewrites
+
+# Concurrent requests share HTTP/2 connections instead of each opening
+# its own TCP+TLS session
+client = AsyncOpenAI(
+    api_key=os.getenv("OPENAI_API_KEY"),
+    max_retries=0,  # retry_openai() retries instead of the SDK
+    http_client=DefaultAsyncHttpxClient(
+        http2=True,
+        limits=httpx.Limits(max_connections=MAX_CONCURRENT, max_keepalive_connections=MAX_CONCURRENT)
     )
+)
+limiter = AsyncLimiter(rpm=RPM_LIMIT, tpm=TPM_LIMIT)
+semaphore = asyncio.Semaphore(MAX_CONCURRENT)
+file_semaphore = asyncio.Semaphore(MAX_CONCURRENT_FILES)
 
-    try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {
-                    "role": "system",
-                    "content": """You are an expert business English coach for non-native speakers.
-Generate vocabulary insights that help learners understand the nuances of business language.
-Return ONLY valid JSON."""
-                },
-                {
-                    "role": "user",
-                    "content": f"""For each word/phrase below, generate an insight object:
+# Insights from earlier runs, keyed by the exact request
+response_cache = ResponseCache(RESPONSE_CACHE_FILE)
 
-Words:
-{words_desc}
+# The same business words recur across speakers, so each word's insight is
+# requested once and reused: casefolded word -> {nuance, synonyms, antonyms}
+insight_cache: dict[str, dict] = {}
 
-Context from the quote:
-"{quote_context[:500]}"
+# Fixed instructions sent ahead of every request. Keeping them byte-identical
+# and before the per-quote data lets OpenAI's prompt caching reuse the prefix.
+INSIGHTS_PROMPT = """You are an expert business English coach for non-native speakers.
+Generate vocabulary insights that help learners understand the nuances of business language.
 
-For each word, provide:
+For each word/phrase you are given, generate an insight object with:
 1. nuance: Why this specific word/phrase is used instead of simpler alternatives. What subtle meaning does it convey in a business setting? (2-3 sentences)
 2. synonyms: 3 formal/professional synonyms or alternative phrases
 3. antonyms: 3 antonyms or opposite concepts
 
-Return a JSON object with key "insights" containing an array of objects, each with:
+Return ONLY valid JSON: an object with key "insights" containing an array of objects, each with:
 - word (string)
 - nuance (string)
 - synonyms (array of 3 strings)
 - antonyms (array of 3 strings)"""
-                }
-            ],
+
+
+def load_insight_cache() -> dict:
+    """Load cached word insights from previous runs."""
+    if os.path.exists(INSIGHT_CACHE_FILE):
+        with open(INSIGHT_CACHE_FILE, "rb") as f:
+            return orjson.loads(f.read())
+    return {}
+
+
+def save_insight_cache():
+    """Persist cached word insights."""
+    with open(INSIGHT_CACHE_FILE, "wb") as f:
+        f.write(orjson.dumps(insight_cache, option=orjson.OPT_INDENT_2))
+
+
+def build_insight_messages(vocab_items: list[dict], quote_context: str) -> list[dict]:
+    """Chat messages asking for insights on each vocabulary item in a quote."""
+    words_desc = "\n".join(
+        f"- \"{item['word']}\": {item.get('definition', 'N/A')}"
+        for item in vocab_items
+    )
+
+    return [
+        {"role": "system", "content": INSIGHTS_PROMPT},
+        {
+            "role": "user",
+            "content": f'Words:\n{words_desc}\n\nContext from the quote:\n"{quote_context[:500]}"'
+        }
+    ]
+
+
+def parse_insights_response(content: str) -> dict:
+    """Parse a model response into {casefolded word: insight}."""
+    result = orjson.loads(content)
+
+    # Handle various response formats
+    insights_list = result.get("insights", [])
+    if not isinstance(insights_list, list):
+        for v in result.values():
+            if isinstance(v, list):
+                insights_list = v
+                break
+
+    # Build a lookup by word
+    return {
+        insight["word"].casefold(): {
+            "nuance": insight.get("nuance", ""),
+            "synonyms": (insight.get("synonyms") or [])[:3],
+            "antonyms": (insight.get("antonyms") or [])[:3]
+        }
+        for insight in insights_list
+        if isinstance(insight, dict) and "word" in insight
+    }
+
+
+@retry_openai()
+async def create_completion(messages: list[dict], max_tokens: int = MAX_TOKENS):
+    """Rate-limited chat completion, retried on transient API errors."""
+    async with semaphore:
+        await limiter.acquire(estimate_tokens(messages, max_tokens))
+        return await client.chat.completions.create(
+            model=MODEL,
+            messages=messages,
             temperature=0.3,
-            max_tokens=2000,
+            max_tokens=max_tokens,
             response_format={"type": "json_object"}
         )
 
-        result = json.loads(response.choices[0].message.content)
 
-        # Handle various response formats
-        insights_list = result.get("insights", [])
-        if not isinstance(insights_list, list):
-            for v in result.values():
-                if isinstance(v, list):
-                    insights_list = v
-                    break
+async def generate_insights_batch(vocab_items: list[dict], quote_context: str) -> list[dict]:
+    """
+    Generate AI insights for a batch of vocabulary items.
+    Returns list of insight objects with nuance, synonyms, antonyms.
+    """
+    messages = build_insight_messages(vocab_items, quote_context)
 
-        # Build a lookup by word
-        insights_map = {}
-        for insight in insights_list:
-            if isinstance(insight, dict) and "word" in insight:
-                insights_map[insight["word"].lower()] = {
-                    "nuance": insight.get("nuance", ""),
-                    "synonyms": insight.get("synonyms", [])[:3],
-                    "antonyms": insight.get("antonyms", [])[:3]
-                }
+    # Same words and context as an earlier run: reuse its insights
+    cache_key = response_cache.key(MODEL, messages)
+    cached = response_cache.get(cache_key)
+    if cached is not None:
+        return cached
 
+    try:
+        response = await create_completion(messages)
+        insights_map = parse_insights_response(response.choices[0].message.content)
+        if insights_map:
+            response_cache.set(cache_key, insights_map)
         return insights_map
 
     except Exception as e:
@@ -112,14 +169,52 @@ Return a JSON object with key "insights" containing an array of objects, each wi
         return {}
 
 
-def process_file(filepath: str) -> bool:
-    """Process a single quote file, adding insights to vocabulary items."""
-    with open(filepath, "r", encoding="utf-8") as f:
-        quotes = json.load(f)
+async def get_insights(vocab_items: list[dict], quote_context: str) -> dict:
+    """Insights for a quote's vocab, only asking the API about words not cached yet."""
+    uncached = [item for item in vocab_items if item["word"].casefold() not in insight_cache]
+
+    insights_map = {}
+    if uncached:
+        insights_map = await generate_insights_batch(uncached, quote_context)
+        if not insights_map:
+            # Leave the quote for a later run rather than filling in blanks
+            return {}
+        insight_cache.update(insights_map)
+
+    for item in vocab_items:
+        word_key = item["word"].casefold()
+        if word_key in insight_cache:
+            insights_map.setdefault(word_key, insight_cache[word_key])
+    return insights_map
+
+
+def apply_insights(structured_vocab: list[dict], insights_map: dict):
+    """Attach each vocab item's insight, falling back to a partial word match or an empty insight."""
+    for v_item in structured_vocab:
+        word_key = v_item["word"].casefold()
+        if word_key in insights_map:
+            v_item["insight"] = insights_map[word_key]
+        else:
+            # Try partial match
+            matched = False
+            for key, val in insights_map.items():
+                if key in word_key or word_key in key:
+                    v_item["insight"] = val
+                    matched = True
+                    break
+            if not matched:
+                v_item["insight"] = {
+                    "nuance": "",
+                    "synonyms": [],
+                    "antonyms": []
+                }
 
-    modified = False
 
-    for quote in quotes:
+def pending_insight_quotes(quotes: list[dict]) -> list[tuple[int, list[dict], str]]:
+    """(quote index, structured vocab, context) for each quote still missing insights."""
+    pending = []
+
+    for qi, quote in enumerate(quotes):
         vocab = quote.get("vocabulary", [])
         if not vocab or not isinstance(vocab, list):
             continue
@@ -133,76 +228,109 @@ def process_file(filepath: str) -> bool:
         if not structured_vocab:
             continue
 
-        # Generate insights for all vocab in this quote
         context = quote.get("context", quote.get("text", ""))
-        insights_map = generate_insights_batch(structured_vocab, context)
+        pending.append((qi, structured_vocab, context))
+
+    return pending
+
+
+async def process_file(filepath: str) -> bool:
+    """Process a single quote file, adding insights to vocabulary items."""
+    with open(filepath, "rb") as f:
+        raw = f.read()
+
+    # Every structured vocab item already carries an insight: skip the parse.
+    # Escaped quotes inside text values cannot match these key patterns.
+    if raw.count(b'"insight":') >= raw.count(b'"word":'):
+        return False
+
+    quotes = orjson.loads(raw)
+
+    pending = pending_insight_quotes(quotes)
+
+    # Generate insights for every quote's vocab concurrently
+    results = await asyncio.gather(*(
+        get_insights(structured_vocab, context)
+        for _, structured_vocab, context in pending
+    ))
+
+    modified = False
 
+    for (_, structured_vocab, _), insights_map in zip(pending, results):
         if insights_map:
-            for v_item in structured_vocab:
-                word_lower = v_item["word"].lower()
-                if word_lower in insights_map:
-                    v_item["insight"] = insights_map[word_lower]
-                else:
-                    # Try partial match
-                    matched = False
-                    for key, val in insights_map.items():
-                        if key in word_lower or word_lower in key:
-                            v_item["insight"] = val
-                            matched = True
-                            break
-                    if not matched:
-                        v_item["insight"] = {
-                            "nuance": "",
-                            "synonyms": [],
-                            "antonyms": []
-                        }
+            apply_insights(structured_vocab, insights_map)
             modified = True
 
-        time.sleep(0.5)  # Rate limiting
-
     if modified:
-        with open(filepath, "w", encoding="utf-8") as f:
-            json.dump(quotes, f, indent=2, ensure_ascii=False)
+        with open(filepath, "wb") as f:
+            f.write(orjson.dumps(quotes, option=orjson.OPT_INDENT_2))
 
     return modified
 
 
-def main():
-    processed = load_checkpoint()
-    files = sorted(Path(OUTPUT_DIR).glob("*_quotes.json"))
+def list_quote_files() -> list[os.DirEntry]:
+    """Quote files in OUTPUT_DIR sorted by name, from a single directory scan."""
+    with os.scandir(OUTPUT_DIR) as entries:
+        return sorted(
+            (entry for entry in entries if entry.name.endswith("_quotes.json")),
+            key=lambda entry: entry.name
+        )
+
+
+async def run_file(filepath: os.DirEntry):
+    """Process one file under the file limit. Returns (filepath, modified, error)."""
+    async with file_semaphore:
+        try:
+            return filepath, await process_file(filepath.path), None
+        except Exception as e:
+            return filepath, False, e
+
+
+async def amain():
+    processed = Checkpoint(CHECKPOINT_FILE, legacy_path=LEGACY_CHECKPOINT_FILE)
+    insight_cache.update(load_insight_cache())
+    files = list_quote_files()
     total = len(files)
     enriched_count = 0
-    skipped_count = 0
     error_count = 0
 
     print(f"Generating AI insights for {total} quote files...")
     print(f"Already processed: {len(processed)} files")
+    print(f"Cached insights: {len(insight_cache)} words")
     print("=" * 60)
 
-    for i, filepath in enumerate(files, 1):
-        filename = filepath.name
+    pending = [filepath for filepath in files if filepath.name not in processed]
+    skipped_count = total - len(pending)
 
-        if filename in processed:
-            skipped_count += 1
-            continue
+    # Several files run at once so one file's slowest request does not
+    # idle the rest; checkpoint each file as soon as it finishes
+    tasks = [run_file(filepath) for filepath in pending]
+    try:
+        for i, task in enumerate(asyncio.as_completed(tasks), skipped_count + 1):
+            filepath, modified, error = await task
+            speaker = filepath.name.replace("_quotes.json", "").replace("_", " ")
+            print(f"[{i}/{total}] {speaker}...", end=" ")
 
-        speaker = filename.replace("_quotes.json", "").replace("_", " ")
-        print(f"[{i}/{total}] {speaker}...", end=" ")
+            if error is not None:
+                error_count += 1
+                print(f"ERROR: {error}")
+                continue
 
-        try:
-            modified = process_file(str(filepath))
             if modified:
                 enriched_count += 1
                 print("insights generated")
             else:
                 print("skipped (already has insights or no structured vocab)")
 
-            processed.add(filename)
-            save_checkpoint(processed)
+            processed.add(filepath.name)
 
-        except Exception as e:
-            error_count += 1
-            print(f"ERROR: {e}")
+            # The cache is rewritten whole, so only every few files; words
+            # lost to a crash in between are just requested again
+            if len(processed) % CACHE_SAVE_EVERY == 0:
+                save_insight_cache()
+    finally:
+        # Also runs on Ctrl-C, so a partial run keeps what it learned
+        save_insight_cache()
 
     print("\n" + "=" * 60)
     print(f"Done! AI insights generation complete.")
@@ -212,5 +340,9 @@ def main():
     print(f"  Total files:    {total}")
 
 
+def main():
+    asyncio.run(amain())
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,189 @@
+"""
+Phase 1C (Batch API): Pre-generate AI Vocabulary Insights
+
+Same insights as generate_vocabulary_insights.py, but every quote still
+missing insights becomes one request in a single OpenAI Batch API job.
+Batch jobs cost ~50% less and are not bound by the per-minute rate limits,
+which suits full-corpus offline runs. Results arrive within the 24h
+completion window; each file is written once after its results are applied.
+
+Usage:
+    python generate_vocabulary_insights_batch_api.py                  # submit, wait, apply
+    python generate_vocabulary_insights_batch_api.py --resume BATCH_ID  # wait for an existing job
+"""
+
+import argparse
+import os
+import time
+from pathlib import Path
+import orjson
+from openai import OpenAI
+from dotenv import load_dotenv
+
+from generate_vocabulary_insights import (
+    MAX_TOKENS,
+    MODEL,
+    OUTPUT_DIR,
+    apply_insights,
+    build_insight_messages,
+    parse_insights_response,
+    pending_insight_quotes,
+)
+
+load_dotenv(".env.local")
+
+BATCH_INPUT_FILE = "insights_batch_input.jsonl"
+POLL_INTERVAL_SECONDS = 60
+TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+
+def collect_requests() -> list[dict]:
+    """Build one Batch API request per quote whose vocabulary still lacks insights."""
+    requests = []
+
+    for filepath in sorted(Path(OUTPUT_DIR).glob("*_quotes.json")):
+        with open(filepath, "rb") as f:
+            quotes = orjson.loads(f.read())
+
+        for qi, structured_vocab, context in pending_insight_quotes(quotes):
+            requests.append({
+                "custom_id": f"{filepath.name}#{qi}",
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {
+                    "model": MODEL,
+                    "messages": build_insight_messages(structured_vocab, context),
+                    "temperature": 0.3,
+                    "max_tokens": MAX_TOKENS,
+                    "response_format": {"type": "json_object"}
+                }
+            })
+
+    return requests
+
+
+def submit_batch(requests: list[dict]) -> str:
+    """Write requests to JSONL, upload, and create the batch job. Returns the batch ID."""
+    with open(BATCH_INPUT_FILE, "wb") as f:
+        for request in requests:
+            f.write(orjson.dumps(request) + b"\n")
+
+    with open(BATCH_INPUT_FILE, "rb") as f:
+        input_file = client.files.create(file=f, purpose="batch")
+
+    batch = client.batches.create(
+        input_file_id=input_file.id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h"
+    )
+    return batch.id
+
+
+def wait_for_batch(batch_id: str):
+    """Poll until the batch reaches a terminal status."""
+    while True:
+        batch = client.batches.retrieve(batch_id)
+        counts = batch.request_counts
+        print(f"  Status: {batch.status} "
+              f"({counts.completed}/{counts.total} done, {counts.failed} failed)")
+
+        if batch.status in TERMINAL_STATUSES:
+            return batch
+
+        time.sleep(POLL_INTERVAL_SECONDS)
+
+
+def download_results(batch) -> dict:
+    """Download the output file and return {filename: {qi: insights_map}}."""
+    results = {}
+    if not batch.output_file_id:
+        return results
+
+    content = client.files.content(batch.output_file_id).text
+    for line in content.splitlines():
+        if not line.strip():
+            continue
+
+        record = orjson.loads(line)
+        filename, qi = record["custom_id"].rsplit("#", 1)
+        response = record.get("response") or {}
+
+        if response.get("status_code") != 200:
+            continue
+
+        try:
+            body = response["body"]
+            insights_map = parse_insights_response(body["choices"][0]["message"]["content"])
+        except (KeyError, IndexError, AttributeError, orjson.JSONDecodeError) as e:
+            print(f"    Bad response for {record['custom_id']}: {e}")
+            continue
+
+        if insights_map:
+            results.setdefault(filename, {})[int(qi)] = insights_map
+
+    return results
+
+
+def apply_results(results: dict) -> tuple[int, int]:
+    """Write batch results back into the quote files. Returns (files, quotes) updated."""
+    files_updated = 0
+    quotes_updated = 0
+
+    for filename, quote_results in results.items():
+        filepath = Path(OUTPUT_DIR) / filename
+        with open(filepath, "rb") as f:
+            quotes = orjson.loads(f.read())
+
+        # Only fill quotes that are still missing insights
+        for qi, structured_vocab, _ in pending_insight_quotes(quotes):
+            if qi in quote_results:
+                apply_insights(structured_vocab, quote_results[qi])
+                quotes_updated += 1
+
+        with open(filepath, "wb") as f:
+            f.write(orjson.dumps(quotes, option=orjson.OPT_INDENT_2))
+        files_updated += 1
+
+    return files_updated, quotes_updated
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate vocabulary insights via the OpenAI Batch API")
+    parser.add_argument("--resume", metavar="BATCH_ID", help="Wait for and apply an existing batch")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    if args.resume:
+        batch_id = args.resume
+        print(f"Resuming batch {batch_id}")
+    else:
+        requests = collect_requests()
+        if not requests:
+            print("All vocabulary already has insights! Nothing to do.")
+            return
+
+        print(f"Submitting {len(requests)} quotes to the Batch API...")
+        batch_id = submit_batch(requests)
+        print(f"Batch created: {batch_id}")
+        print(f"(Resume later with: python generate_vocabulary_insights_batch_api.py --resume {batch_id})")
+
+    print("=" * 60)
+    batch = wait_for_batch(batch_id)
+
+    if batch.status != "completed":
+        print(f"\nBatch ended with status '{batch.status}'. No files were changed.")
+        return
+
+    results = download_results(batch)
+    files_updated, quotes_updated = apply_results(results)
+
+    print("\n" + "=" * 60)
+    print(f"Done! AI insights generation complete.")
+    print(f"  Files updated:  {files_updated}")
+    print(f"  Quotes updated: {quotes_updated}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,29 +2,53 @@
 Normalize expertise values in speaker profiles to a standard list
 """
 
+import asyncio
 import os
+import re
 import json
-import time
+import orjson
 from datetime import datetime
+from heapq import nlargest
+import ahocorasick
+import httpx
+from tqdm import tqdm
 from dotenv import load_dotenv
 
-from openai import OpenAI
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+from rate_limiter import AsyncLimiter, estimate_tokens, retry_openai
 
 # Load environment variables
 load_dotenv('.env.local')
 
-# Initialize OpenAI client
-client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
-
 # Model configuration
 MODEL = "gpt-4o-mini"
 
 # File paths
 INPUT_FILE = "speaker_profiles_generated.json"
 OUTPUT_FILE = "speaker_profiles.json"
+GPT_CACHE_FILE = "gpt_mapping_cache.json"  # GPT classifications kept across runs
+
+# Unmapped expertise values classified per GPT request
+EXPERTISE_PER_REQUEST = 50
+MAX_TOKENS_PER_EXPERTISE = 25  # One "value": "category" pair
+
+# OpenAI account limits for gpt-4o-mini
+RPM_LIMIT = 500
+TPM_LIMIT = 200_000
+MAX_CONCURRENT = 20
 
-# Rate limit delay for GPT calls
-RATE_LIMIT_DELAY = 0.5
+# Initialize OpenAI client; concurrent batches share HTTP/2 connections
+# instead of each opening its own TCP+TLS session
+client = AsyncOpenAI(
+    api_key=os.environ.get("OPENAI_API_KEY"),
+    max_retries=0,  # retry_openai() retries instead of the SDK
+    http_client=DefaultAsyncHttpxClient(
+        http2=True,
+        limits=httpx.Limits(max_connections=MAX_CONCURRENT, max_keepalive_connections=MAX_CONCURRENT)
+    )
+)
+limiter = AsyncLimiter(rpm=RPM_LIMIT, tpm=TPM_LIMIT)
+semaphore = asyncio.Semaphore(MAX_CONCURRENT)
 
 # Standard expertise list (24 items)
 STANDARD_EXPERTISE = [
@@ -349,11 +373,38 @@ EXPERTISE_MAPPING = {
 
 # Create lowercase lookup for case-insensitive matching
 EXPERTISE_MAPPING_LOWER = {k.lower(): v for k, v in EXPERTISE_MAPPING.items()}
+STANDARD_LOWER = {std.lower(): std for std in STANDARD_EXPERTISE}
 
-# Cache for GPT-suggested mappings
+# Every mapping key in one automaton, so a value that merely contains a known
+# phrase ("Growth Marketing Strategy for B2B") is mapped without GPT
+MAPPING_AUTOMATON = ahocorasick.Automaton()
+for key_lower, std in EXPERTISE_MAPPING_LOWER.items():
+    MAPPING_AUTOMATON.add_word(key_lower, (key_lower, std))
+MAPPING_AUTOMATON.make_automaton()
+WORD_PATTERN = re.compile(r"[a-z0-9]+")
+
+# Distribution chart bars, one block per 2 speakers, capped at 30
+BARS = ["█" * i for i in range(31)]
+
+# Cache for GPT-suggested mappings (loaded from GPT_CACHE_FILE in amain)
 gpt_mapping_cache = {}
 
 
+def load_gpt_mapping_cache() -> dict:
+    """Load GPT mappings from previous runs, dropping any category no longer standard."""
+    if not os.path.exists(GPT_CACHE_FILE):
+        return {}
+    with open(GPT_CACHE_FILE, 'rb') as f:
+        cached = orjson.loads(f.read())
+    return {exp: norm for exp, norm in cached.items() if STANDARD_LOWER.get(norm.lower()) == norm}
+
+
+def save_gpt_mapping_cache():
+    """Persist GPT mappings; temperature 0 makes them safe to reuse."""
+    with open(GPT_CACHE_FILE, 'wb') as f:
+        f.write(orjson.dumps(gpt_mapping_cache, option=orjson.OPT_INDENT_2))
+
+
 def normalize_expertise_direct(expertise):
     """Try to normalize expertise using direct mapping rules."""
     # Check exact match
@@ -361,107 +412,139 @@ def normalize_expertise_direct(expertise):
         return EXPERTISE_MAPPING[expertise]
     
     # Check case-insensitive match
-    if expertise.lower() in EXPERTISE_MAPPING_LOWER:
-        return EXPERTISE_MAPPING_LOWER[expertise.lower()]
+    expertise_lower = expertise.lower()
+    if expertise_lower in EXPERTISE_MAPPING_LOWER:
+        return EXPERTISE_MAPPING_LOWER[expertise_lower]
     
-    # Check if it's already a standard expertise
-    if expertise in STANDARD_EXPERTISE:
-        return expertise
-    
-    # Check case-insensitive standard expertise match
-    for std in STANDARD_EXPERTISE:
-        if expertise.lower() == std.lower():
-            return std
+    # Check if it's already a standard expertise (any case)
+    if expertise_lower in STANDARD_LOWER:
+        return STANDARD_LOWER[expertise_lower]
     
-    return None
+    return match_mapping_phrase(expertise_lower)
 
 
-def normalize_expertise_gpt(expertise):
-    """Use GPT to suggest best matching standard expertise."""
-    global gpt_mapping_cache
+def match_mapping_phrase(expertise_lower):
+    """Map by the longest mapping key found as whole words inside the value, if any.
+
+    A key must be a multi-word phrase or cover most of the value's words; a
+    lone generic word ("research" in "AI Policy Research") is left to GPT.
+    """
+    value_words = len(WORD_PATTERN.findall(expertise_lower))
+    best_len = 0
+    best = None
+    for end_idx, (key_lower, std) in MAPPING_AUTOMATON.iter(expertise_lower):
+        start_idx = end_idx - len(key_lower) + 1
+        # Whole words only, so "AI" doesn't match inside "Email"
+        if start_idx > 0 and expertise_lower[start_idx - 1].isalnum():
+            continue
+        if end_idx + 1 < len(expertise_lower) and expertise_lower[end_idx + 1].isalnum():
+            continue
+        key_words = len(WORD_PATTERN.findall(key_lower))
+        if key_words < 2 and key_words * 2 <= value_words:
+            continue
+        if len(key_lower) > best_len:
+            best_len = len(key_lower)
+            best = std
+    return best
+
+
+def match_standard_expertise(suggestion):
+    """Map a GPT suggestion onto the standard list, falling back to Product Strategy."""
+    # Clean up suggestion (remove quotes, extra text)
+    suggestion = suggestion.strip().strip('"\'')
     
-    # Check cache first
-    if expertise in gpt_mapping_cache:
-        return gpt_mapping_cache[expertise]
+    suggestion_lower = suggestion.lower()
+    
+    # Validate it's in our standard list
+    if suggestion_lower in STANDARD_LOWER:
+        return STANDARD_LOWER[suggestion_lower]
+    
+    # Partial match
+    for std_lower, std in STANDARD_LOWER.items():
+        if std_lower in suggestion_lower or suggestion_lower in std_lower:
+            return std
     
-    prompt = f"""Given this expertise: "{expertise}"
+    # Default fallback
+    return "Product Strategy"
+
+
+@retry_openai()
+async def create_completion(messages, max_tokens):
+    """Rate-limited chat completion, retried on transient API errors."""
+    async with semaphore:
+        await limiter.acquire(estimate_tokens(messages, max_tokens))
+        return await client.chat.completions.create(
+            model=MODEL,
+            messages=messages,
+            temperature=0,
+            max_tokens=max_tokens,
+            response_format={"type": "json_object"}
+        )
 
-Choose the BEST matching category from this list:
+
+async def normalize_expertise_gpt_batch(expertise_list):
+    """Use one GPT call to map several expertise values, filling gpt_mapping_cache."""
+    prompt = f"""Categories:
 {json.dumps(STANDARD_EXPERTISE, indent=2)}
 
+For each expertise value below, choose the BEST matching category from the list above.
+
+Expertise values:
+{json.dumps(expertise_list, indent=2, ensure_ascii=False)}
+
 Rules:
-- Pick the SINGLE best match
+- Pick the SINGLE best match for each value
 - If nothing fits well, pick the closest category
-- Return ONLY the exact category name from the list, nothing else
+- Use the exact category name from the list
 
-Best match:"""
+Return ONLY a JSON object mapping each expertise value, exactly as given, to its category."""
 
+    messages = [{"role": "user", "content": prompt}]
+    
     try:
-        response = client.chat.completions.create(
-            model=MODEL,
-            messages=[
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0,
-            max_tokens=50
-        )
-        
-        suggestion = response.choices[0].message.content.strip()
-        
-        # Clean up suggestion (remove quotes, extra text)
-        suggestion = suggestion.strip('"\'')
-        
-        # Validate it's in our standard list
-        for std in STANDARD_EXPERTISE:
-            if suggestion.lower() == std.lower():
-                gpt_mapping_cache[expertise] = std
-                return std
-        
-        # Partial match
-        for std in STANDARD_EXPERTISE:
-            if std.lower() in suggestion.lower() or suggestion.lower() in std.lower():
-                gpt_mapping_cache[expertise] = std
-                return std
-        
-        # Default fallback
-        gpt_mapping_cache[expertise] = "Product Strategy"
-        return "Product Strategy"
+        response = await create_completion(messages, MAX_TOKENS_PER_EXPERTISE * len(expertise_list))
+        suggestions = orjson.loads(response.choices[0].message.content)
         
     except Exception as e:
-        print(f"GPT error for '{expertise}': {e}")
-        return "Product Strategy"
+        print(f"GPT error for {len(expertise_list)} expertise values: {e}")
+        return
+    
+    for expertise in expertise_list:
+        suggestion = suggestions.get(expertise)
+        if isinstance(suggestion, str):
+            gpt_mapping_cache[expertise] = match_standard_expertise(suggestion)
 
 
-def normalize_speaker_expertise(expertise_list):
-    """Normalize a list of expertise values for a speaker."""
+def normalize_speaker_expertise(expertise_list, direct_map):
+    """Normalize a speaker's expertise values. Returns (normalized, n_direct, n_gpt)."""
     normalized = []
+    n_direct = 0
     
     for exp in expertise_list:
         # Try direct mapping first
-        norm = normalize_expertise_direct(exp)
+        norm = direct_map[exp]
         
         if norm:
-            if norm not in normalized:
-                normalized.append(norm)
+            n_direct += 1
         else:
-            # Use GPT for ambiguous cases
-            norm = normalize_expertise_gpt(exp)
-            if norm and norm not in normalized:
-                normalized.append(norm)
+            # Ambiguous cases were sent to GPT up front; unanswered ones fall back
+            norm = gpt_mapping_cache.get(exp, "Product Strategy")
+        
+        normalized.append(norm)
     
-    # Keep max 3 expertise per speaker
-    return normalized[:3]
+    # Drop duplicates (keeping first-seen order), then keep max 3 expertise per speaker
+    return list(dict.fromkeys(normalized))[:3], n_direct, len(expertise_list) - n_direct
 
 
-def main():
+async def amain():
     """Main function to normalize expertise values."""
     print("=" * 60)
     print("Normalizing Speaker Expertise Values")
     print("=" * 60)
     
     # Load input file
-    with open(INPUT_FILE, 'r', encoding='utf-8') as f:
-        profiles = json.load(f)
+    with open(INPUT_FILE, 'rb') as f:
+        profiles = orjson.loads(f.read())
     
     print(f"\nLoaded {len(profiles)} speaker profiles from {INPUT_FILE}")
     
@@ -480,25 +563,34 @@ def main():
     gpt_mappings = 0
     processed_speakers = 0
     
+    # Rules cover most values; classify the rest with a few batched GPT calls
+    # Each unique value is direct-mapped once, however many speakers share it
+    direct_map = {exp: normalize_expertise_direct(exp) for exp in all_expertise}
+    gpt_mapping_cache.update(load_gpt_mapping_cache())
+    unmapped = sorted(exp for exp, norm in direct_map.items()
+                      if not norm and exp not in gpt_mapping_cache)
+    print(f"Cached GPT mappings: {len(gpt_mapping_cache)}")
+    print(f"Values needing GPT: {len(unmapped)}")
+    # Batches are independent; the semaphore and limiter bound the API load
+    await asyncio.gather(*(
+        normalize_expertise_gpt_batch(unmapped[i:i + EXPERTISE_PER_REQUEST])
+        for i in range(0, len(unmapped), EXPERTISE_PER_REQUEST)
+    ))
+    if unmapped:
+        save_gpt_mapping_cache()
+    
     # Process each speaker
     normalized_profiles = {}
     
     print(f"\nProcessing speakers...\n")
     
-    for speaker, profile in profiles.items():
+    for speaker, profile in tqdm(profiles.items(), total=len(profiles), desc="Normalize", unit="speaker"):
         original_expertise = profile.get('expertise', [])
         
-        # Track which method was used
-        for exp in original_expertise:
-            if normalize_expertise_direct(exp):
-                direct_mappings += 1
-            else:
-                gpt_mappings += 1
-                # Small delay for GPT calls
-                time.sleep(RATE_LIMIT_DELAY)
-        
-        # Normalize expertise
-        normalized_expertise = normalize_speaker_expertise(original_expertise)
+        # Normalize expertise, tracking which method was used
+        normalized_expertise, n_direct, n_gpt = normalize_speaker_expertise(original_expertise, direct_map)
+        direct_mappings += n_direct
+        gpt_mappings += n_gpt
         
         # Create normalized profile
         normalized_profiles[speaker] = {
@@ -507,10 +599,6 @@ def main():
         }
         
         processed_speakers += 1
-        
-        # Progress indicator every 50 speakers
-        if processed_speakers % 50 == 0:
-            print(f"  Processed {processed_speakers}/{len(profiles)} speakers...")
     
     # Calculate elapsed time
     end_time = datetime.now()
@@ -524,8 +612,8 @@ def main():
             final_expertise[exp] = final_expertise.get(exp, 0) + 1
     
     # Save normalized profiles
-    with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
-        json.dump(normalized_profiles, f, indent=2, ensure_ascii=False)
+    with open(OUTPUT_FILE, 'wb') as f:
+        f.write(orjson.dumps(normalized_profiles, option=orjson.OPT_INDENT_2))
     
     # Print summary
     print("\n" + "=" * 60)
@@ -541,10 +629,8 @@ def main():
     
     # Show expertise distribution
     print("\nExpertise Distribution (top 15):")
-    sorted_expertise = sorted(final_expertise.items(), key=lambda x: -x[1])
-    for exp, count in sorted_expertise[:15]:
-        bar = "█" * min(count // 2, 30)
-        print(f"  {exp:25} {count:3} {bar}")
+    for exp, count in nlargest(15, final_expertise.items(), key=lambda x: x[1]):
+        print(f"  {exp:25} {count:3} {BARS[min(count // 2, 30)]}")
     
     # Show any expertise that didn't get normalized properly
     unexpected = [exp for exp in final_expertise if exp not in STANDARD_EXPERTISE]
@@ -564,5 +650,9 @@ def main():
     print("\nDone!")
 
 
+def main():
+    asyncio.run(amain())
+
+
 if __name__ == "__main__":
     main()
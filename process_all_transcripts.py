@@ -3,7 +3,7 @@ Full pipeline for processing Lenny's Podcast transcripts.
 Extracts quotes, translates to multiple languages, and exports to Excel.
 
 Features:
-- Batch processing (50 files at a time)
+- Batch processing (50 files at a time, several files in flight at once)
 - Resume capability with checkpoints
 - Progress bar and ETA
 - Cost tracking
@@ -12,15 +12,31 @@ Features:
 """
 
 import os
-import json
+import re
+import sys
+import codecs
+import hashlib
+import signal
 import time
+import queue
+import atexit
+import asyncio
 import logging
+import threading
 from pathlib import Path
 from datetime import datetime, timedelta
 from typing import Optional
 from dotenv import load_dotenv
-from openai import OpenAI
-from anthropic import Anthropic
+from tqdm import tqdm
+import httpx
+import orjson
+import anthropic
+import openai
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+from anthropic import AsyncAnthropic
+from quote_parsing import REPAIR_PROMPT, parse_quotes_response
+from rate_limiter import AsyncLimiter, estimate_tokens, retry_on, retry_openai
+from response_cache import ResponseCache
 
 # Load environment variables
 load_dotenv('.env.local')
@@ -29,11 +45,30 @@ load_dotenv('.env.local')
 # CONFIGURATION
 # ============================================================================
 
-BATCH_SIZE = 50
-BATCH_WAIT_MINUTES = 10  # Wait between batches for rate limit protection
-ERROR_RETRY_WAIT_MINUTES = 5
+BATCH_SIZE = 50  # Files between progress summaries and checkpoint flushes
 MAX_RETRIES = 3
-API_DELAY_SECONDS = 2
+CHECKPOINT_SAVE_EVERY = 25  # Rewrite the checkpoint after this many updates...
+CHECKPOINT_SAVE_SECONDS = 30  # ...or once this long has passed since the last save
+MAX_CONCURRENT_FILES = 10  # Files running extract -> translate at the same time
+QUOTES_PER_TRANSLATION = 8  # Quotes translated together in one request per language
+
+# Starting account limits; every call is paced by these instead of a fixed
+# sleep, and they are replaced by the limits each response's headers report
+ANTHROPIC_RPM_LIMIT = 50
+ANTHROPIC_TPM_LIMIT = 400_000
+ANTHROPIC_MAX_CONCURRENT = 8
+OPENAI_RPM_LIMIT = 500
+OPENAI_TPM_LIMIT = 200_000
+OPENAI_MAX_CONCURRENT = 20
+
+# Fail a hung request instead of stalling its file; long enough for a
+# non-streamed chunk of translations, and the retry decorators resend it
+API_TIMEOUT_SECONDS = 120.0
+API_CONNECT_TIMEOUT_SECONDS = 10.0
+
+# Response headers carrying the account's per-minute limits
+ANTHROPIC_LIMIT_HEADERS = ("anthropic-ratelimit-requests-limit", "anthropic-ratelimit-tokens-limit")
+OPENAI_LIMIT_HEADERS = ("x-ratelimit-limit-requests", "x-ratelimit-limit-tokens")
 
 # Cost estimates (per file, approximate)
 # Extract: ~4K tokens input, ~1K output per transcript
@@ -42,19 +77,51 @@ COST_PER_FILE_EXTRACT_USD = 0.02  # Claude extraction
 COST_PER_FILE_TRANSLATE_USD = 0.03  # OpenAI + Claude translation
 COST_PER_FILE_TOTAL_USD = COST_PER_FILE_EXTRACT_USD + COST_PER_FILE_TRANSLATE_USD
 
-# Time estimates (per file, including delays)
-SECONDS_PER_FILE_EXTRACT = 15  # API call + delay
-SECONDS_PER_QUOTE_TRANSLATE = 8  # 3 API calls with delays
+# Time estimates (per file, sequential; divided by MAX_CONCURRENT_FILES)
+SECONDS_PER_FILE_EXTRACT = 15  # API call
+SECONDS_PER_QUOTE_TRANSLATE = 8  # 3 API calls
 AVG_QUOTES_PER_FILE = 10
 
-# Model configurations
-OPENAI_MODEL = "gpt-5-mini"
+# Model configurations: quote extraction needs the stronger model, while
+# translating a short quote is well within the small, fast tiers
 ANTHROPIC_MODEL = "claude-sonnet-4-20250514"
+TRANSLATE_OPENAI_MODEL = "gpt-4o-mini"  # Korean
+TRANSLATE_ANTHROPIC_MODEL = "claude-haiku-4-5-20251001"  # Chinese and Spanish
+TRANSLATION_MAX_TOKENS = 512  # Per quote per language
+
+# Translations from earlier runs, keyed by the single-quote request
+RESPONSE_CACHE_FILE = os.path.join(".llm_cache", "translations.sqlite")
+
+# Default values for speakers without a profile
+DEFAULT_PROFILE = {"function": "Leadership", "expertise": []}
+
+# Errors worth retrying: rate limits, overload/server errors, dropped connections
+ANTHROPIC_RETRYABLE_ERRORS = (
+    anthropic.RateLimitError,
+    anthropic.InternalServerError,
+    anthropic.ServiceUnavailableError,
+    anthropic.OverloadedError,
+    anthropic.APIConnectionError,
+)
+
+anthropic_limiter = AsyncLimiter(rpm=ANTHROPIC_RPM_LIMIT, tpm=ANTHROPIC_TPM_LIMIT)
+anthropic_semaphore = asyncio.Semaphore(ANTHROPIC_MAX_CONCURRENT)
+openai_limiter = AsyncLimiter(rpm=OPENAI_RPM_LIMIT, tpm=OPENAI_TPM_LIMIT)
+openai_semaphore = asyncio.Semaphore(OPENAI_MAX_CONCURRENT)
+file_semaphore = asyncio.Semaphore(MAX_CONCURRENT_FILES)
+response_cache = ResponseCache(RESPONSE_CACHE_FILE)
 
 # ============================================================================
 # LOGGING SETUP
 # ============================================================================
 
+class TqdmHandler(logging.Handler):
+    """Console handler that prints above the progress bar instead of through it."""
+    
+    def emit(self, record: logging.LogRecord):
+        tqdm.write(self.format(record))
+
+
 def setup_logging(base_dir: Path) -> logging.Logger:
     """Setup logging to both console and file."""
     logger = logging.getLogger("pipeline")
@@ -64,7 +131,7 @@ def setup_logging(base_dir: Path) -> logging.Logger:
     logger.handlers = []
     
     # Console handler
-    console_handler = logging.StreamHandler()
+    console_handler = TqdmHandler()
     console_handler.setLevel(logging.INFO)
     console_format = logging.Formatter('%(message)s')
     console_handler.setFormatter(console_format)
@@ -81,6 +148,61 @@ def setup_logging(base_dir: Path) -> logging.Logger:
     return logger
 
 
+# ============================================================================
+# BACKGROUND WRITER
+# ============================================================================
+
+# (path, JSON bytes) pairs written in order by one thread, so disk I/O never
+# blocks the event loop and a file is never written ahead of an earlier
+# queued one. Data is encoded when queued, so a write holds that moment's
+# state even if the object changes before the writer reaches it.
+write_queue = queue.Queue()
+writer_thread = None  # Started by the first write_json or CheckpointManager
+_writer_lock = threading.Lock()
+
+
+def _writer():
+    """Write queued (path, content, cleanup) items until a None sentinel arrives."""
+    while (item := write_queue.get()) is not None:
+        path, content, cleanup = item
+        try:
+            tmp_path = path.with_name(path.name + ".tmp")
+            with open(tmp_path, "wb") as f:
+                f.write(content)
+            # Atomic rename, so a crash mid-write never leaves a torn file
+            os.replace(tmp_path, path)
+            if cleanup is not None:
+                cleanup.unlink(missing_ok=True)
+        except Exception as e:
+            tqdm.write(f"  -> Failed to write {path}: {e}")
+        finally:
+            write_queue.task_done()
+    write_queue.task_done()
+
+
+def write_json(path: Path, data, cleanup: Optional[Path] = None):
+    """Encode data now and queue it to be written to path by the background writer, then delete cleanup."""
+    start_writer()
+    write_queue.put((path, orjson.dumps(data, option=orjson.OPT_INDENT_2), cleanup))
+
+
+def start_writer():
+    """Start the writer thread once, stopping it again at exit."""
+    global writer_thread
+    with _writer_lock:
+        if writer_thread is not None:
+            return
+        writer_thread = threading.Thread(target=_writer, daemon=True)
+        writer_thread.start()
+        atexit.register(stop_writer)
+
+
+def stop_writer():
+    """Finish every queued write, then stop the writer thread."""
+    write_queue.put(None)
+    writer_thread.join()
+
+
 # ============================================================================
 # CHECKPOINT MANAGEMENT
 # ============================================================================
@@ -91,12 +213,18 @@ class CheckpointManager:
     def __init__(self, base_dir: Path):
         self.checkpoint_path = base_dir / "pipeline_checkpoint.json"
         self.data = self._load()
+        self._dirty_count = 0
+        self._last_save = time.monotonic()
+        # The writer's exit hook is registered first, so it runs after this
+        # flush and writes the updates since the last debounced save
+        start_writer()
+        atexit.register(self.flush)
     
     def _load(self) -> dict:
         """Load checkpoint from file."""
         if self.checkpoint_path.exists():
-            with open(self.checkpoint_path, "r", encoding="utf-8") as f:
-                return json.load(f)
+            with open(self.checkpoint_path, "rb") as f:
+                return orjson.loads(f.read())
         return {
             "extracted_files": [],
             "translated_files": [],
@@ -108,9 +236,22 @@ class CheckpointManager:
         }
     
     def save(self):
-        """Save checkpoint to file."""
-        with open(self.checkpoint_path, "w", encoding="utf-8") as f:
-            json.dump(self.data, f, indent=2, ensure_ascii=False)
+        """Queue the checkpoint to be written to file."""
+        write_json(self.checkpoint_path, self.data)
+        self._dirty_count = 0
+        self._last_save = time.monotonic()
+    
+    def flush(self):
+        """Save checkpoint to file if it has unsaved updates."""
+        if self._dirty_count:
+            self.save()
+    
+    def _maybe_save(self):
+        """Count an update; only rewrite the file every few updates or seconds."""
+        self._dirty_count += 1
+        if (self._dirty_count >= CHECKPOINT_SAVE_EVERY
+                or time.monotonic() - self._last_save >= CHECKPOINT_SAVE_SECONDS):
+            self.save()
     
     def mark_extracted(self, filename: str, quote_count: int, cost: float):
         """Mark a file as extracted."""
@@ -118,7 +259,7 @@ class CheckpointManager:
             self.data["extracted_files"].append(filename)
             self.data["total_quotes_extracted"] += quote_count
             self.data["total_cost_usd"] += cost
-        self.save()
+            self._maybe_save()
     
     def mark_translated(self, filename: str, quote_count: int, cost: float):
         """Mark a file as translated."""
@@ -126,13 +267,13 @@ class CheckpointManager:
             self.data["translated_files"].append(filename)
             self.data["total_quotes_translated"] += quote_count
             self.data["total_cost_usd"] += cost
-        self.save()
+            self._maybe_save()
     
     def add_error(self, error_msg: str):
         """Add an error to the checkpoint."""
         timestamp = datetime.now().isoformat()
         self.data["errors"].append(f"[{timestamp}] {error_msg}")
-        self.save()
+        self._maybe_save()
     
     def is_extracted(self, filename: str) -> bool:
         """Check if a file has been extracted."""
@@ -170,17 +311,9 @@ class CheckpointManager:
 
 
 # ============================================================================
-# PROGRESS BAR
+# TIME FORMATTING
 # ============================================================================
 
-def print_progress_bar(current: int, total: int, prefix: str = "", suffix: str = "", length: int = 40):
-    """Print a progress bar to console."""
-    percent = (current / total) * 100 if total > 0 else 0
-    filled = int(length * current // total) if total > 0 else 0
-    bar = "█" * filled + "░" * (length - filled)
-    print(f"\r{prefix} |{bar}| {current}/{total} ({percent:.1f}%) {suffix}", end="", flush=True)
-
-
 def format_time(seconds: float) -> str:
     """Format seconds into human-readable string."""
     if seconds < 60:
@@ -205,36 +338,67 @@ def load_file(file_path: Path) -> str:
         return f.read()
 
 
-def extract_quotes_api(client: Anthropic, transcript: str, prompt: str) -> list:
+@retry_on(ANTHROPIC_RETRYABLE_ERRORS)
+async def create_message(client: AsyncAnthropic, messages: list[dict], max_tokens: int, model: str = ANTHROPIC_MODEL):
+    """Rate-limited Claude request, retried with backoff on transient API errors."""
+    async with anthropic_semaphore:
+        await anthropic_limiter.acquire(estimate_tokens(messages, max_tokens))
+        # Streamed so long generations keep the connection active instead of
+        # idling toward a read timeout; the final message is the same object
+        async with client.messages.stream(
+            model=model,
+            max_tokens=max_tokens,
+            messages=messages
+        ) as stream:
+            anthropic_limiter.tune_from_headers(stream.response.headers, *ANTHROPIC_LIMIT_HEADERS)
+            return await stream.get_final_message()
+
+
+@retry_openai()
+async def create_completion(client: AsyncOpenAI, messages: list[dict], max_tokens: int):
+    """Rate-limited OpenAI request, retried with backoff on transient API errors."""
+    async with openai_semaphore:
+        await openai_limiter.acquire(estimate_tokens(messages, max_tokens))
+        raw = await client.chat.completions.with_raw_response.create(
+            model=TRANSLATE_OPENAI_MODEL,
+            messages=messages,
+            max_completion_tokens=max_tokens
+        )
+        openai_limiter.tune_from_headers(raw.headers, *OPENAI_LIMIT_HEADERS)
+        return raw.parse()
+
+
+async def extract_quotes_api(client: AsyncAnthropic, transcript: str, prompt: str) -> list:
     """Call Anthropic API to extract quotes from transcript."""
-    message = client.messages.create(
-        model=ANTHROPIC_MODEL,
-        max_tokens=4096,
-        messages=[
-            {
-                "role": "user",
-                "content": f"{prompt}\n\nHere is the podcast transcript to analyze:\n\n{transcript}"
-            }
-        ]
-    )
+    # The extraction prompt is identical for every file, so it goes in its own
+    # block marked for prompt caching; only the transcript block changes
+    message = await create_message(client, [
+        {
+            "role": "user",
+            "content": [
+                {"type": "text", "text": prompt, "cache_control": {"type": "ephemeral"}},
+                {"type": "text", "text": f"Here is the podcast transcript to analyze:\n\n{transcript}"}
+            ]
+        }
+    ], 4096)
     
     response_text = message.content[0].text
-    quotes = json.loads(response_text)
-    return quotes
+    try:
+        return parse_quotes_response(response_text)
+    except orjson.JSONDecodeError:
+        # Have the model fix its own output rather than redo the whole extraction
+        repair = await create_message(client, [
+            {"role": "user", "content": REPAIR_PROMPT.format(text=response_text)}
+        ], 4096)
+        return parse_quotes_response(repair.content[0].text)
 
 
 def enrich_quotes_with_speaker_info(quotes: list, speaker_profiles: dict) -> list:
     """Add speaker_function and speaker_expertise to each quote."""
     for quote in quotes:
-        speaker_name = quote.get("speaker", "")
-        
-        if speaker_name in speaker_profiles:
-            profile = speaker_profiles[speaker_name]
-            quote["speaker_function"] = profile.get("function", "Leadership")
-            quote["speaker_expertise"] = profile.get("expertise", [])
-        else:
-            quote["speaker_function"] = "Leadership"
-            quote["speaker_expertise"] = []
+        profile = speaker_profiles.get(quote.get("speaker", ""), DEFAULT_PROFILE)
+        quote["speaker_function"] = profile.get("function", "Leadership")
+        quote["speaker_expertise"] = profile.get("expertise", [])
     
     return quotes
 
@@ -279,157 +443,417 @@ Quote to translate:
 Return ONLY the Spanish translation, nothing else."""
 }
 
+# Appended to a single-quote prompt whose {text} is a numbered list of quotes
+BATCH_TRANSLATION_SUFFIX = """
+
+The text above is a numbered list of {count} separate quotes. Translate each one on its own, following the same rules. Instead of plain text, return ONLY a JSON object of the form {{"translations": ["...", "..."]}} with exactly {count} translations in list order."""
+
+# Chinese and Spanish for the same quotes in one Claude request; each
+# language's rules are its single-quote prompt up to the quote itself
+CLAUDE_COMBINED_PROMPT = """Translate each English business quote below into both Simplified Chinese and Spanish.
+
+CHINESE:
+{zh_rules}
 
-def translate_to_korean(client: OpenAI, text: str) -> str:
+SPANISH:
+{es_rules}
+
+The quotes are a numbered list of {count} separate quotes. Translate each one on its own.
+
+{text}
+
+Return ONLY a JSON object of the form {{"zh": ["...", "..."], "es": ["...", "..."]}} with exactly {count} translations per language in list order."""
+
+# Outermost {...} in a reply that wraps the JSON object in other text
+TRANSLATIONS_OBJECT_PATTERN = re.compile(r'\{.*\}', re.DOTALL)
+
+
+async def translate_to_korean(client: AsyncOpenAI, text: str) -> str:
     """Translate text to Korean using OpenAI API."""
     prompt = KOREAN_PROMPT.format(text=text)
     
-    response = client.chat.completions.create(
-        model=OPENAI_MODEL,
-        messages=[{"role": "user", "content": prompt}],
-        max_completion_tokens=2000
-    )
+    response = await create_completion(client, [{"role": "user", "content": prompt}], TRANSLATION_MAX_TOKENS)
     
     return response.choices[0].message.content.strip()
 
 
-def translate_with_claude(client: Anthropic, text: str, lang_code: str) -> str:
+async def translate_with_claude(client: AsyncAnthropic, text: str, lang_code: str) -> str:
     """Translate text to Chinese or Spanish using Claude API."""
     prompt = CLAUDE_PROMPTS[lang_code].format(text=text)
     
-    message = client.messages.create(
-        model=ANTHROPIC_MODEL,
-        max_tokens=2048,
-        messages=[{"role": "user", "content": prompt}]
+    message = await create_message(
+        client, [{"role": "user", "content": prompt}], TRANSLATION_MAX_TOKENS, TRANSLATE_ANTHROPIC_MODEL
     )
     
     return message.content[0].text.strip()
 
 
+def translation_cache_key(text: str, lang_code: str) -> str:
+    """Cache key of the single-quote request for text, whether it was sent alone or in a chunk."""
+    if lang_code == "ko":
+        return response_cache.key(TRANSLATE_OPENAI_MODEL, [{"role": "user", "content": KOREAN_PROMPT.format(text=text)}])
+    return response_cache.key(TRANSLATE_ANTHROPIC_MODEL, [{"role": "user", "content": CLAUDE_PROMPTS[lang_code].format(text=text)}])
+
+
+def build_batch_translation_prompt(prompt_template: str, texts: list[str]) -> str:
+    """Turn a single-quote translation prompt into one covering a numbered list of quotes."""
+    numbered = "\n".join(f"{i}. {text}" for i, text in enumerate(texts, start=1))
+    return prompt_template.format(text=numbered) + BATCH_TRANSLATION_SUFFIX.format(count=len(texts))
+
+
+def build_combined_claude_prompt(texts: list[str]) -> str:
+    """One prompt asking for the Chinese and Spanish translations of a numbered list of quotes."""
+    rules = {
+        lang_code: prompt.split("\n\nQuote to translate:")[0]
+        for lang_code, prompt in CLAUDE_PROMPTS.items()
+    }
+    numbered = "\n".join(f"{i}. {text}" for i, text in enumerate(texts, start=1))
+    return CLAUDE_COMBINED_PROMPT.format(
+        zh_rules=rules["zh"], es_rules=rules["es"], count=len(texts), text=numbered
+    )
+
+
+def parse_translation_lists(content: str, count: int, keys: tuple = ("translations",)) -> Optional[dict]:
+    """Parse {key: [...]} for each key; None unless every list holds exactly `count` non-empty strings."""
+    try:
+        data = orjson.loads(content)
+    except orjson.JSONDecodeError:
+        match = TRANSLATIONS_OBJECT_PATTERN.search(content)
+        if not match:
+            return None
+        try:
+            data = orjson.loads(match.group(0))
+        except orjson.JSONDecodeError:
+            return None
+    
+    if not isinstance(data, dict):
+        return None
+    
+    lists = {}
+    for key in keys:
+        translations = data.get(key)
+        if (not isinstance(translations, list) or len(translations) != count
+                or not all(isinstance(t, str) and t.strip() for t in translations)):
+            return None
+        lists[key] = [t.strip() for t in translations]
+    return lists
+
+
+async def translate_batch(
+    openai_client: AsyncOpenAI,
+    anthropic_client: AsyncAnthropic,
+    texts: list[str],
+    lang_code: str
+) -> list[str]:
+    """Translate several texts into one language with a single request (Korean via OpenAI).
+
+    Texts translated by an earlier run come from the response cache; only the
+    rest are sent.
+    """
+    keys = [translation_cache_key(text, lang_code) for text in texts]
+    translations = [response_cache.get(key) for key in keys]
+    missing = [i for i, translation in enumerate(translations) if translation is None]
+    if missing:
+        fresh = await request_translations(
+            openai_client, anthropic_client, [texts[i] for i in missing], lang_code
+        )
+        for i, translation in zip(missing, fresh):
+            translations[i] = translation
+            response_cache.set(keys[i], translation)
+    return translations
+
+
+async def request_translations(
+    openai_client: AsyncOpenAI,
+    anthropic_client: AsyncAnthropic,
+    texts: list[str],
+    lang_code: str
+) -> list[str]:
+    """Send one chunked translation request, falling back to per-quote requests."""
+    if lang_code == "ko":
+        prompt = build_batch_translation_prompt(KOREAN_PROMPT, texts)
+        response = await create_completion(
+            openai_client, [{"role": "user", "content": prompt}], TRANSLATION_MAX_TOKENS * len(texts)
+        )
+        content = response.choices[0].message.content
+    else:
+        prompt = build_batch_translation_prompt(CLAUDE_PROMPTS[lang_code], texts)
+        message = await create_message(
+            anthropic_client, [{"role": "user", "content": prompt}],
+            TRANSLATION_MAX_TOKENS * len(texts), TRANSLATE_ANTHROPIC_MODEL
+        )
+        content = message.content[0].text
+    
+    parsed = parse_translation_lists(content, len(texts))
+    if parsed is not None:
+        return parsed["translations"]
+    
+    # Unparseable or miscounted reply: fall back to one request per quote
+    if lang_code == "ko":
+        return await asyncio.gather(*(translate_to_korean(openai_client, text) for text in texts))
+    return await asyncio.gather(*(translate_with_claude(anthropic_client, text, lang_code) for text in texts))
+
+
+async def translate_claude_languages(
+    openai_client: AsyncOpenAI,
+    anthropic_client: AsyncAnthropic,
+    texts: list[str]
+) -> dict[str, list[str]]:
+    """Translate several texts into Chinese and Spanish with one Claude request.
+
+    Returns {"zh": [...], "es": [...]}. Texts with both translations cached
+    are not sent; if the combined reply can't be parsed, each language is
+    requested on its own.
+    """
+    keys = {lang_code: [translation_cache_key(text, lang_code) for text in texts] for lang_code in CLAUDE_PROMPTS}
+    results = {lang_code: [response_cache.get(key) for key in lang_keys] for lang_code, lang_keys in keys.items()}
+    missing = [i for i in range(len(texts)) if any(results[lang_code][i] is None for lang_code in results)]
+    if not missing:
+        return results
+    
+    missing_texts = [texts[i] for i in missing]
+    prompt = build_combined_claude_prompt(missing_texts)
+    message = await create_message(
+        anthropic_client, [{"role": "user", "content": prompt}],
+        TRANSLATION_MAX_TOKENS * len(CLAUDE_PROMPTS) * len(missing_texts), TRANSLATE_ANTHROPIC_MODEL
+    )
+    fresh = parse_translation_lists(message.content[0].text, len(missing_texts), tuple(CLAUDE_PROMPTS))
+    if fresh is None:
+        translations = await asyncio.gather(*(
+            request_translations(openai_client, anthropic_client, missing_texts, lang_code)
+            for lang_code in CLAUDE_PROMPTS
+        ))
+        fresh = dict(zip(CLAUDE_PROMPTS, translations))
+    
+    for lang_code, lang_translations in fresh.items():
+        for i, translation in zip(missing, lang_translations):
+            results[lang_code][i] = translation
+            response_cache.set(keys[lang_code][i], translation)
+    return results
+
+
 # ============================================================================
 # CORE PIPELINE FUNCTIONS
 # ============================================================================
 
-def extract_single_file(
-    anthropic_client: Anthropic,
+async def extract_single_file(
+    anthropic_client: AsyncAnthropic,
     transcript_path: Path,
     output_dir: Path,
     prompt: str,
     speaker_profiles: dict,
     logger: logging.Logger
-) -> tuple[int, str]:
-    """Extract quotes from a single transcript file. Returns (quote_count, output_filename)."""
+) -> tuple[list, str]:
+    """Extract quotes from a single transcript file. Returns (quotes, output_filename)."""
     transcript = load_file(transcript_path)
-    quotes = extract_quotes_api(anthropic_client, transcript, prompt)
+    quotes = await extract_quotes_api(anthropic_client, transcript, prompt)
     quotes = enrich_quotes_with_speaker_info(quotes, speaker_profiles)
     
     output_filename = transcript_path.stem + "_quotes.json"
     output_path = output_dir / output_filename
     
-    with open(output_path, "w", encoding="utf-8") as f:
-        json.dump(quotes, f, indent=2, ensure_ascii=False)
+    # Translations recorded for an earlier extraction belong to other quotes
+    translation_sidecar_path(output_path).unlink(missing_ok=True)
+    write_json(output_path, quotes)
     
-    return len(quotes), output_filename
+    return quotes, output_filename
+
 
+def translation_sidecar_path(quotes_path: Path) -> Path:
+    """JSONL sidecar holding a quotes file's finished translations until the file is rewritten."""
+    return quotes_path.with_suffix(".translated.jsonl")
 
-def translate_single_file(
-    openai_client: OpenAI,
-    anthropic_client: Anthropic,
+
+def quote_text_hash(text: str) -> str:
+    """Short hash of a quote's text, tying a sidecar entry to the quote it translated."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+def restore_sidecar_translations(quotes: list, sidecar_path: Path):
+    """Fill quotes' missing translations from their sidecar entries, if there is a sidecar."""
+    if not sidecar_path.exists():
+        return
+    with open(sidecar_path, "rb") as f:
+        for line in f:
+            try:
+                entry = orjson.loads(line)
+            except orjson.JSONDecodeError:
+                continue  # Torn last line from a crash mid-append
+            # Entries left over from a different quote list are ignored
+            idx = entry.pop("idx", None)
+            if not isinstance(idx, int) or not 0 <= idx < len(quotes):
+                continue
+            quote = quotes[idx]
+            if entry.pop("text_hash", None) != quote_text_hash(quote["text"]):
+                continue
+            for field, translation in entry.items():
+                quote.setdefault(field, translation)
+
+
+async def translate_chunk(
+    openai_client: AsyncOpenAI,
+    anthropic_client: AsyncAnthropic,
+    chunk: list[dict]
+):
+    """Fill missing text_ko, text_zh and text_es for a few quotes with concurrent OpenAI and Claude requests."""
+    # Quotes translated before a crash or retry keep what they have
+    async def fill_korean():
+        pending = [quote for quote in chunk if not quote.get("text_ko")]
+        if not pending:
+            return
+        translations = await translate_batch(
+            openai_client, anthropic_client, [quote["text"] for quote in pending], "ko"
+        )
+        for quote, translation in zip(pending, translations):
+            quote["text_ko"] = translation
+    
+    async def fill_claude():
+        pending = [quote for quote in chunk if not (quote.get("text_zh") and quote.get("text_es"))]
+        if not pending:
+            return
+        translations = await translate_claude_languages(
+            openai_client, anthropic_client, [quote["text"] for quote in pending]
+        )
+        for lang_code, lang_translations in translations.items():
+            field = f"text_{lang_code}"
+            for quote, translation in zip(pending, lang_translations):
+                if not quote.get(field):
+                    quote[field] = translation
+    
+    await asyncio.gather(
+        fill_korean(),  # Korean (OpenAI)
+        fill_claude()   # Chinese and Spanish (Claude)
+    )
+
+
+async def translate_single_file(
+    openai_client: AsyncOpenAI,
+    anthropic_client: AsyncAnthropic,
     quotes_path: Path,
-    logger: logging.Logger
+    logger: logging.Logger,
+    quotes: Optional[list] = None
 ) -> int:
-    """Translate all quotes in a single file. Returns quote count."""
-    with open(quotes_path, "r", encoding="utf-8") as f:
-        quotes = json.load(f)
-    
-    for quote in quotes:
-        text = quote["text"]
-        
-        # Korean (OpenAI)
-        quote["text_ko"] = translate_to_korean(openai_client, text)
-        time.sleep(API_DELAY_SECONDS)
-        
-        # Chinese (Claude)
-        quote["text_zh"] = translate_with_claude(anthropic_client, text, "zh")
-        time.sleep(API_DELAY_SECONDS)
+    """Translate all quotes in a single file. Returns quote count.
+
+    Finished chunks are appended to a JSONL sidecar next to the quotes file,
+    so a crash keeps them without rewriting the whole file per chunk; the
+    next attempt restores the entries whose index and text hash still match,
+    and the sidecar is removed once the fully translated file is written.
+    """
+    # Freshly extracted quotes are passed in; their file write may still be queued
+    if quotes is None:
+        with open(quotes_path, "rb") as f:
+            quotes = orjson.loads(f.read())
+    
+    sidecar_path = translation_sidecar_path(quotes_path)
+    restore_sidecar_translations(quotes, sidecar_path)
+    
+    with open(sidecar_path, "ab") as sidecar:
+        async def translate_and_record(start: int):
+            chunk = quotes[start:start + QUOTES_PER_TRANSLATION]
+            await translate_chunk(openai_client, anthropic_client, chunk)
+            sidecar.write(b"".join(
+                orjson.dumps({
+                    "idx": idx,
+                    "text_hash": quote_text_hash(quote["text"]),
+                    "text_ko": quote["text_ko"],
+                    "text_zh": quote["text_zh"],
+                    "text_es": quote["text_es"]
+                }) + b"\n"
+                for idx, quote in enumerate(chunk, start=start)
+            ))
+            sidecar.flush()
         
-        # Spanish (Claude)
-        quote["text_es"] = translate_with_claude(anthropic_client, text, "es")
-        time.sleep(API_DELAY_SECONDS)
+        # Every chunk finishes, and is recorded, before the sidecar closes;
+        # a failed chunk is raised only then, so no orphaned task writes to it
+        results = await asyncio.gather(*(
+            translate_and_record(start) for start in range(0, len(quotes), QUOTES_PER_TRANSLATION)
+        ), return_exceptions=True)
     
-    # Save translated quotes back
-    with open(quotes_path, "w", encoding="utf-8") as f:
-        json.dump(quotes, f, indent=2, ensure_ascii=False)
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+    
+    # Save translated quotes back; the sidecar goes once that write lands
+    write_json(quotes_path, quotes, cleanup=sidecar_path)
     
     return len(quotes)
 
 
-def process_batch_extract(
-    batch_files: list[Path],
-    anthropic_client: Anthropic,
+async def run_with_retries(label: str, step, checkpoint: CheckpointManager, logger: logging.Logger):
+    """Await step() up to MAX_RETRIES times. Returns its result, or None once retries run out."""
+    for attempt in range(1, MAX_RETRIES + 1):
+        try:
+            return await step()
+        except Exception as e:
+            error_msg = f"{label} (attempt {attempt}): {str(e)}"
+            logger.error(error_msg)
+            
+            # Rate limits and server errors were already backed off per call,
+            # so whatever reaches here is worth retrying straight away
+            if attempt < MAX_RETRIES:
+                tqdm.write("  -> Error, retrying...")
+            else:
+                checkpoint.add_error(f"FAILED after {MAX_RETRIES} attempts: {error_msg}")
+                tqdm.write(f"  -> Failed after {MAX_RETRIES} attempts, skipping...")
+    return None
+
+
+async def process_file(
+    transcript_path: Path,
+    openai_client: AsyncOpenAI,
+    anthropic_client: AsyncAnthropic,
     output_dir: Path,
     prompt: str,
     speaker_profiles: dict,
     checkpoint: CheckpointManager,
-    logger: logging.Logger,
-    batch_num: int,
-    total_batches: int,
-    total_files: int,
-    files_processed_before: int
-) -> int:
-    """Process a batch of files for extraction. Returns files processed in this batch."""
-    batch_processed = 0
-    
-    for idx, transcript_path in enumerate(batch_files):
-        filename = transcript_path.name
-        global_idx = files_processed_before + idx + 1
+    logger: logging.Logger
+):
+    """Run one transcript through extract -> enrich -> translate, skipping finished steps."""
+    filename = transcript_path.name
+    quotes_filename = transcript_path.stem + "_quotes.json"
+    quotes_path = output_dir / quotes_filename
+    
+    quotes = None
+    
+    async with file_semaphore:
+        if not checkpoint.is_extracted(filename):
+            result = await run_with_retries(
+                f"Extract {filename}",
+                lambda: extract_single_file(
+                    anthropic_client, transcript_path, output_dir,
+                    prompt, speaker_profiles, logger
+                ),
+                checkpoint, logger
+            )
+            if result is None:
+                return
+            quotes = result[0]
+            # Checkpoint updates are synchronous, so concurrent files can't interleave a save
+            checkpoint.mark_extracted(filename, len(quotes), COST_PER_FILE_EXTRACT_USD)
         
-        # Skip if already extracted
-        if checkpoint.is_extracted(filename):
-            batch_processed += 1
-            continue
+        # Skip if already translated or the quotes file doesn't exist (extraction failed)
+        if checkpoint.is_translated(filename) or (quotes is None and not quotes_path.exists()):
+            return
         
-        # Progress bar
-        print_progress_bar(
-            global_idx, total_files,
-            prefix=f"Extract B{batch_num}/{total_batches}",
-            suffix=f"| {filename[:30]}..."
+        quote_count = await run_with_retries(
+            f"Translate {quotes_filename}",
+            lambda: translate_single_file(
+                openai_client, anthropic_client, quotes_path, logger, quotes
+            ),
+            checkpoint, logger
         )
-        
-        retry_count = 0
-        while retry_count < MAX_RETRIES:
-            try:
-                quote_count, output_file = extract_single_file(
-                    anthropic_client, transcript_path, output_dir,
-                    prompt, speaker_profiles, logger
-                )
-                
-                checkpoint.mark_extracted(filename, quote_count, COST_PER_FILE_EXTRACT_USD)
-                batch_processed += 1
-                time.sleep(API_DELAY_SECONDS)
-                break
-                
-            except Exception as e:
-                retry_count += 1
-                error_msg = f"Extract {filename} (attempt {retry_count}): {str(e)}"
-                logger.error(error_msg)
-                
-                if retry_count < MAX_RETRIES:
-                    print(f"\n  -> Error, retrying in {ERROR_RETRY_WAIT_MINUTES} minutes...")
-                    time.sleep(ERROR_RETRY_WAIT_MINUTES * 60)
-                else:
-                    checkpoint.add_error(f"FAILED after {MAX_RETRIES} attempts: {error_msg}")
-                    print(f"\n  -> Failed after {MAX_RETRIES} attempts, skipping...")
-    
-    print()  # New line after progress bar
-    return batch_processed
-
-
-def process_batch_translate(
-    batch_files: list[str],
-    openai_client: OpenAI,
-    anthropic_client: Anthropic,
+        if quote_count is not None:
+            checkpoint.mark_translated(filename, quote_count, COST_PER_FILE_TRANSLATE_USD)
+
+
+async def process_batch(
+    batch_files: list[Path],
+    openai_client: AsyncOpenAI,
+    anthropic_client: AsyncAnthropic,
     output_dir: Path,
+    prompt: str,
+    speaker_profiles: dict,
     checkpoint: CheckpointManager,
     logger: logging.Logger,
     batch_num: int,
@@ -437,55 +861,23 @@ def process_batch_translate(
     total_files: int,
     files_processed_before: int
 ) -> int:
-    """Process a batch of files for translation. Returns files processed in this batch."""
-    batch_processed = 0
+    """Process a batch of files concurrently. Returns files processed in this batch."""
+    tasks = [
+        asyncio.ensure_future(process_file(
+            transcript_path, openai_client, anthropic_client, output_dir,
+            prompt, speaker_profiles, checkpoint, logger
+        ))
+        for transcript_path in batch_files
+    ]
     
-    for idx, filename in enumerate(batch_files):
-        quotes_filename = filename.replace(".txt", "_quotes.json")
-        quotes_path = output_dir / quotes_filename
-        global_idx = files_processed_before + idx + 1
-        
-        # Skip if already translated
-        if checkpoint.is_translated(filename):
-            batch_processed += 1
-            continue
-        
-        # Skip if quotes file doesn't exist (extraction failed)
-        if not quotes_path.exists():
-            continue
-        
-        # Progress bar
-        print_progress_bar(
-            global_idx, total_files,
-            prefix=f"Translate B{batch_num}/{total_batches}",
-            suffix=f"| {quotes_filename[:25]}..."
-        )
-        
-        retry_count = 0
-        while retry_count < MAX_RETRIES:
-            try:
-                quote_count = translate_single_file(
-                    openai_client, anthropic_client, quotes_path, logger
-                )
-                
-                checkpoint.mark_translated(filename, quote_count, COST_PER_FILE_TRANSLATE_USD)
-                batch_processed += 1
-                break
-                
-            except Exception as e:
-                retry_count += 1
-                error_msg = f"Translate {quotes_filename} (attempt {retry_count}): {str(e)}"
-                logger.error(error_msg)
-                
-                if retry_count < MAX_RETRIES:
-                    print(f"\n  -> Error, retrying in {ERROR_RETRY_WAIT_MINUTES} minutes...")
-                    time.sleep(ERROR_RETRY_WAIT_MINUTES * 60)
-                else:
-                    checkpoint.add_error(f"FAILED after {MAX_RETRIES} attempts: {error_msg}")
-                    print(f"\n  -> Failed after {MAX_RETRIES} attempts, skipping...")
-    
-    print()  # New line after progress bar
-    return batch_processed
+    # Progress bar advances as files finish, in whatever order they complete
+    with tqdm(total=total_files, initial=files_processed_before, unit="file",
+              desc=f"Batch {batch_num}/{total_batches}") as pbar:
+        for task in asyncio.as_completed(tasks):
+            await task
+            pbar.update(1)
+    
+    return len(batch_files)
 
 
 def print_batch_summary(
@@ -524,68 +916,58 @@ def print_batch_summary(
 def run_export_to_excel(base_dir: Path, logger: logging.Logger):
     """Run the export_to_excel.py script functionality."""
     import pandas as pd
-    from openpyxl import Workbook
-    from openpyxl.styles import Font, Alignment
-    from openpyxl.utils.dataframe import dataframe_to_rows
-    from openpyxl.utils import get_column_letter
+    import pyarrow as pa
+    import pyarrow.csv as pcsv
+    import xlsxwriter
     from collections import Counter
     
     output_dir = base_dir / "output"
     
-    # Load all quotes
-    all_quotes = []
-    quote_files = sorted(output_dir.glob("*_quotes.json"))
-    
-    for file_path in quote_files:
-        with open(file_path, "r", encoding="utf-8") as f:
-            quotes = json.load(f)
-            all_quotes.extend(quotes)
-    
-    if not all_quotes:
-        logger.error("No quotes found for export")
-        return
-    
-    # Transform to DataFrame
-    rows = []
-    for idx, quote in enumerate(all_quotes, start=1):
-        row = {
-            "id": idx,
-            "speaker": quote.get("speaker", ""),
-            "speaker_function": quote.get("speaker_function", ""),
-            "speaker_expertise": ", ".join(quote.get("speaker_expertise", [])),
-            "text": quote.get("text", ""),
-            "text_ko": quote.get("text_ko", ""),
-            "text_zh": quote.get("text_zh", ""),
-            "text_es": quote.get("text_es", ""),
-            "timestamp": quote.get("timestamp", ""),
-            "context": quote.get("context", ""),
-            "vocabulary_highlights": ", ".join(quote.get("vocabulary_highlights", [])),
-            "topics": ", ".join(quote.get("topics", [])),
-            "difficulty_level": quote.get("difficulty_level", "")
-        }
-        rows.append(row)
-    
     columns = [
         "id", "speaker", "speaker_function", "speaker_expertise",
         "text", "text_ko", "text_zh", "text_es",
         "timestamp", "context", "vocabulary_highlights", "topics", "difficulty_level"
     ]
     
-    df = pd.DataFrame(rows, columns=columns)
+    # Build export rows file by file; each file's parsed quotes are dropped
+    # as soon as its rows exist, instead of collecting every quote first.
+    # Rows are plain tuples in column order, so pandas skips per-row key lookups
+    rows = []
+    join = ", ".join
+    quote_files = sorted(output_dir.glob("*_quotes.json"))
     
-    # Create Excel
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Quotes"
+    for file_path in quote_files:
+        with open(file_path, "rb") as f:
+            quotes = orjson.loads(f.read())
+        
+        for quote in quotes:
+            get = quote.get
+            rows.append((
+                len(rows) + 1,
+                get("speaker", ""),
+                get("speaker_function", ""),
+                join(get("speaker_expertise", [])),
+                get("text", ""),
+                get("text_ko", ""),
+                get("text_zh", ""),
+                get("text_es", ""),
+                get("timestamp", ""),
+                get("context", ""),
+                join(get("vocabulary_highlights", [])),
+                join(get("topics", [])),
+                get("difficulty_level", "")
+            ))
+    
+    if not rows:
+        logger.error("No quotes found for export")
+        return
     
-    for r_idx, row in enumerate(dataframe_to_rows(df, index=False, header=True), start=1):
-        for c_idx, value in enumerate(row, start=1):
-            cell = ws.cell(row=r_idx, column=c_idx, value=value)
-            if r_idx == 1:
-                cell.font = Font(bold=True)
-                cell.alignment = Alignment(horizontal="center", vertical="center")
-            elif c_idx in [5, 6, 7, 8, 10]:
-                cell.alignment = Alignment(wrap_text=True, vertical="top")
+    df = pd.DataFrame.from_records(rows, columns=columns)
+    
+    # Create Excel; constant_memory streams each row to disk as it is written
+    excel_path = output_dir / "quotes_complete.xlsx"
+    wb = xlsxwriter.Workbook(excel_path, {"constant_memory": True, "strings_to_urls": False})
+    ws = wb.add_worksheet("Quotes")
     
     # Auto-width
     max_widths = {
@@ -595,24 +977,74 @@ def run_export_to_excel(base_dir: Path, logger: logging.Logger):
         "topics": 30, "difficulty_level": 15
     }
     
-    for col_idx, column in enumerate(df.columns, start=1):
-        col_letter = get_column_letter(col_idx)
-        width = max_widths.get(column, 50)
-        ws.column_dimensions[col_letter].width = width
+    # Long content columns wrap through their column format, not per cell
+    wrap_fmt = wb.add_format({"text_wrap": True, "valign": "top"})
+    wrap_columns = {"text", "text_ko", "text_zh", "text_es", "context"}
+    for col_idx, column in enumerate(df.columns):
+        ws.set_column(col_idx, col_idx, max_widths.get(column, 50),
+                      wrap_fmt if column in wrap_columns else None)
+    
+    header_fmt = wb.add_format({"bold": True, "align": "center", "valign": "vcenter"})
+    ws.write_row(0, 0, df.columns, header_fmt)
+    for r_idx, row in enumerate(df.itertuples(index=False, name=None), start=1):
+        ws.write_row(r_idx, 0, row)
     
-    ws.auto_filter.ref = ws.dimensions
-    ws.freeze_panes = "A2"
+    ws.autofilter(0, 0, len(df), len(df.columns) - 1)
+    ws.freeze_panes(1, 0)
     
     # Save files
-    excel_path = output_dir / "quotes_complete.xlsx"
-    wb.save(excel_path)
+    wb.close()
     print(f"  -> Saved: {excel_path}")
     
     csv_path = output_dir / "quotes_complete.csv"
-    df.to_csv(csv_path, index=False, encoding="utf-8-sig")
+    # Arrow serializes whole columns in C; it quotes every string field, which
+    # parses the same, and the BOM keeps Excel reading the file as UTF-8
+    with open(csv_path, "wb") as f:
+        f.write(codecs.BOM_UTF8)
+        pcsv.write_csv(pa.Table.from_pandas(df, preserve_index=False), f)
     print(f"  -> Saved: {csv_path}")
     
-    return len(all_quotes), df
+    return len(rows), df
+
+
+async def run_batches(
+    transcript_files: list[Path],
+    openai_client: AsyncOpenAI,
+    anthropic_client: AsyncAnthropic,
+    output_dir: Path,
+    prompt: str,
+    speaker_profiles: dict,
+    checkpoint: CheckpointManager,
+    logger: logging.Logger
+):
+    """Run every batch through the pipeline; the limiters pace calls across batches."""
+    total_files = len(transcript_files)
+    batch_count = (total_files + BATCH_SIZE - 1) // BATCH_SIZE
+    
+    print(f"\nStarting pipeline with {batch_count} batches...\n")
+    
+    # Process each batch
+    for batch_num in range(1, batch_count + 1):
+        start_idx = (batch_num - 1) * BATCH_SIZE
+        end_idx = min(batch_num * BATCH_SIZE, total_files)
+        batch_files = transcript_files[start_idx:end_idx]
+        
+        print(f"\n{'=' * 60}")
+        print(f"BATCH {batch_num}/{batch_count} (files {start_idx + 1}-{end_idx})")
+        print(f"{'=' * 60}\n")
+        
+        # Each file goes extract -> translate on its own, up to MAX_CONCURRENT_FILES at once
+        print(f"Extracting and translating quotes ({MAX_CONCURRENT_FILES} files at a time)...")
+        await process_batch(
+            batch_files, openai_client, anthropic_client, output_dir, prompt,
+            speaker_profiles, checkpoint, logger, batch_num, batch_count,
+            total_files, start_idx
+        )
+        checkpoint.flush()
+        
+        # Print batch summary
+        files_completed = len(checkpoint.data["extracted_files"])
+        print_batch_summary(batch_num, files_completed, total_files, checkpoint)
 
 
 # ============================================================================
@@ -630,6 +1062,9 @@ def main():
     logger = setup_logging(base_dir)
     checkpoint = CheckpointManager(base_dir)
     output_dir.mkdir(exist_ok=True)
+    # atexit hooks skip a plain SIGTERM; exiting instead still flushes the
+    # checkpoint and lets queued file writes land
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(128 + signum))
     
     print("\n" + "=" * 60)
     print("LENNY'S PODCAST QUOTE PIPELINE")
@@ -673,8 +1108,7 @@ def main():
     
     extract_time = remaining_extract * SECONDS_PER_FILE_EXTRACT
     translate_time = remaining_translate * AVG_QUOTES_PER_FILE * SECONDS_PER_QUOTE_TRANSLATE
-    batch_wait_time = ((remaining_extract // BATCH_SIZE) + (remaining_translate // BATCH_SIZE)) * BATCH_WAIT_MINUTES * 60
-    total_time_secs = extract_time + translate_time + batch_wait_time
+    total_time_secs = (extract_time + translate_time) / MAX_CONCURRENT_FILES
     
     print(f"\n{'=' * 60}")
     print("PIPELINE SUMMARY")
@@ -694,71 +1128,46 @@ def main():
         print("Aborted by user.")
         return
     
-    # Initialize API clients
+    # Initialize API clients; pools match each provider's concurrency so
+    # requests reuse warm HTTP/2 connections instead of new TLS handshakes.
+    # SDK retries are off, since retry_openai() and retry_on() already back off.
     print("\nInitializing API clients...")
-    openai_client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
-    anthropic_client = Anthropic(api_key=os.environ.get("ANTHROPIC_API_KEY"))
+    openai_client = AsyncOpenAI(
+        api_key=os.environ.get("OPENAI_API_KEY"),
+        timeout=openai.Timeout(API_TIMEOUT_SECONDS, connect=API_CONNECT_TIMEOUT_SECONDS),
+        max_retries=0,
+        http_client=DefaultAsyncHttpxClient(
+            http2=True,
+            limits=httpx.Limits(max_connections=OPENAI_MAX_CONCURRENT, max_keepalive_connections=OPENAI_MAX_CONCURRENT)
+        )
+    )
+    anthropic_client = AsyncAnthropic(
+        api_key=os.environ.get("ANTHROPIC_API_KEY"),
+        timeout=anthropic.Timeout(API_TIMEOUT_SECONDS, connect=API_CONNECT_TIMEOUT_SECONDS),
+        max_retries=0,
+        http_client=anthropic.DefaultAsyncHttpxClient(
+            http2=True,
+            limits=httpx.Limits(max_connections=ANTHROPIC_MAX_CONCURRENT, max_keepalive_connections=ANTHROPIC_MAX_CONCURRENT)
+        )
+    )
     
     # Load resources
     print("Loading extraction prompt...")
     prompt = load_file(prompt_path)
     
     print("Loading speaker profiles...")
-    with open(speaker_profiles_path, "r", encoding="utf-8") as f:
-        speaker_profiles = json.load(f)
+    with open(speaker_profiles_path, "rb") as f:
+        speaker_profiles = orjson.loads(f.read())
     
     # Start timer
     checkpoint.set_start_time()
     
-    # Create batches
-    batch_count = (total_files + BATCH_SIZE - 1) // BATCH_SIZE
-    
-    print(f"\nStarting pipeline with {batch_count} batches...\n")
-    
-    # Process each batch
-    for batch_num in range(1, batch_count + 1):
-        start_idx = (batch_num - 1) * BATCH_SIZE
-        end_idx = min(batch_num * BATCH_SIZE, total_files)
-        batch_files = transcript_files[start_idx:end_idx]
-        batch_filenames = [f.name for f in batch_files]
-        
-        print(f"\n{'=' * 60}")
-        print(f"BATCH {batch_num}/{batch_count} (files {start_idx + 1}-{end_idx})")
-        print(f"{'=' * 60}\n")
-        
-        # Phase 1: Extract quotes
-        print("Phase 1: Extracting quotes...")
-        process_batch_extract(
-            batch_files, anthropic_client, output_dir, prompt, speaker_profiles,
-            checkpoint, logger, batch_num, batch_count, total_files, start_idx
-        )
-        
-        # Wait between extraction and translation
-        if remaining_extract > 0:
-            print(f"Waiting {BATCH_WAIT_MINUTES} minutes before translation (rate limit protection)...")
-            for remaining in range(BATCH_WAIT_MINUTES * 60, 0, -30):
-                print(f"  {remaining // 60}m {remaining % 60}s remaining...", end="\r")
-                time.sleep(30)
-            print(" " * 40, end="\r")  # Clear line
-        
-        # Phase 2: Translate quotes
-        print("Phase 2: Translating quotes...")
-        process_batch_translate(
-            batch_filenames, openai_client, anthropic_client, output_dir,
-            checkpoint, logger, batch_num, batch_count, total_files, start_idx
-        )
-        
-        # Print batch summary
-        files_completed = len(checkpoint.data["extracted_files"])
-        print_batch_summary(batch_num, files_completed, total_files, checkpoint)
-        
-        # Wait between batches (except last one)
-        if batch_num < batch_count:
-            print(f"Waiting {BATCH_WAIT_MINUTES} minutes before next batch...")
-            for remaining in range(BATCH_WAIT_MINUTES * 60, 0, -30):
-                print(f"  {remaining // 60}m {remaining % 60}s remaining...", end="\r")
-                time.sleep(30)
-            print(" " * 40, end="\r")
+    asyncio.run(run_batches(
+        transcript_files, openai_client, anthropic_client, output_dir,
+        prompt, speaker_profiles, checkpoint, logger
+    ))
+    # The export reads the quote files back, so let queued writes land first
+    write_queue.join()
     
     # Step 4: Export to Excel
     print("\n" + "=" * 60)
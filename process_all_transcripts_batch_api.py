@@ -0,0 +1,312 @@
+"""
+Translate extracted quotes via the OpenAI and Anthropic Batch APIs
+
+Same translations as the translate step of process_all_transcripts.py
+(Korean with OpenAI, Chinese and Spanish with Claude), but every missing
+translation of every file that is extracted and not yet translated goes into
+one OpenAI Batch API job and one Anthropic Message Batch. Translations the
+pipeline saved in a file's .translated.jsonl sidecar are kept, not requested. Batch jobs cost 50% less and
+are not bound by the per-minute rate limits, which suits whole-corpus runs
+nobody waits on. Results arrive within 24h; each file is written once and
+marked translated in the pipeline checkpoint when all its quotes are done.
+
+Run process_all_transcripts.py first to extract, then this script to
+translate; the pipeline skips files this script marks as translated.
+
+Usage:
+    python process_all_transcripts_batch_api.py           # submit, wait, apply
+    python process_all_transcripts_batch_api.py --resume  # wait for the last submitted jobs
+"""
+
+import argparse
+import os
+import time
+from pathlib import Path
+
+import orjson
+from anthropic import Anthropic
+from openai import OpenAI
+from dotenv import load_dotenv
+
+from process_all_transcripts import (
+    CLAUDE_PROMPTS,
+    COST_PER_FILE_TRANSLATE_USD,
+    KOREAN_PROMPT,
+    TRANSLATE_ANTHROPIC_MODEL,
+    TRANSLATE_OPENAI_MODEL,
+    TRANSLATION_MAX_TOKENS,
+    CheckpointManager,
+    quote_text_hash,
+    restore_sidecar_translations,
+    translation_sidecar_path,
+    write_queue,
+)
+
+load_dotenv('.env.local')
+
+BASE_DIR = Path(__file__).parent
+OUTPUT_DIR = BASE_DIR / "output"
+BATCH_INPUT_FILE = "pipeline_translation_batch_input.jsonl"
+BATCH_STATE_FILE = "pipeline_translation_batch_state.json"  # Job IDs and files, for --resume
+POLL_INTERVAL_SECONDS = 60
+OPENAI_TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+LANGUAGE_FIELDS = {"ko": "text_ko", "zh": "text_zh", "es": "text_es"}
+
+openai_client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
+anthropic_client = Anthropic(api_key=os.environ.get("ANTHROPIC_API_KEY"))
+
+
+def pending_files(checkpoint: CheckpointManager) -> list[str]:
+    """Transcript filenames that are extracted, not yet translated, and have a quotes file."""
+    translated = set(checkpoint.data["translated_files"])
+    return [
+        filename for filename in checkpoint.data["extracted_files"]
+        if filename not in translated and (OUTPUT_DIR / quotes_filename(filename)).exists()
+    ]
+
+
+def quotes_filename(filename: str) -> str:
+    """Quotes file written by the pipeline for a transcript filename."""
+    return Path(filename).stem + "_quotes.json"
+
+
+def load_quotes(filename: str) -> list:
+    """Quotes of a file, with translations the pipeline left in its sidecar restored."""
+    quotes_path = OUTPUT_DIR / quotes_filename(filename)
+    with open(quotes_path, "rb") as f:
+        quotes = orjson.loads(f.read())
+    restore_sidecar_translations(quotes, translation_sidecar_path(quotes_path))
+    return quotes
+
+
+def collect_requests(files: list[str]) -> tuple[list[dict], list[dict], dict]:
+    """Build (openai_requests, anthropic_requests, text_hashes), one request per quote per missing language.
+
+    Custom IDs are "<lang>-<file index>-<quote index>" because Anthropic only
+    allows [a-zA-Z0-9_-] in them; the file list is kept in the state file.
+    text_hashes maps "<file index>-<quote index>" to the hash of the quote
+    text sent, so results are only applied to the quote they translate.
+    """
+    openai_requests = []
+    anthropic_requests = []
+    text_hashes = {}
+
+    for file_idx, filename in enumerate(files):
+        for quote_idx, quote in enumerate(load_quotes(filename)):
+            text = quote["text"]
+            if all(quote.get(field) for field in LANGUAGE_FIELDS.values()):
+                continue
+            text_hashes[f"{file_idx}-{quote_idx}"] = quote_text_hash(text)
+            # Translations the pipeline already finished are not requested again
+            if not quote.get(LANGUAGE_FIELDS["ko"]):
+                openai_requests.append({
+                    "custom_id": f"ko-{file_idx}-{quote_idx}",
+                    "method": "POST",
+                    "url": "/v1/chat/completions",
+                    "body": {
+                        "model": TRANSLATE_OPENAI_MODEL,
+                        "messages": [{"role": "user", "content": KOREAN_PROMPT.format(text=text)}],
+                        "max_completion_tokens": TRANSLATION_MAX_TOKENS
+                    }
+                })
+            for lang_code, prompt in CLAUDE_PROMPTS.items():
+                if quote.get(LANGUAGE_FIELDS[lang_code]):
+                    continue
+                anthropic_requests.append({
+                    "custom_id": f"{lang_code}-{file_idx}-{quote_idx}",
+                    "params": {
+                        "model": TRANSLATE_ANTHROPIC_MODEL,
+                        "max_tokens": TRANSLATION_MAX_TOKENS,
+                        "messages": [{"role": "user", "content": prompt.format(text=text)}]
+                    }
+                })
+
+    return openai_requests, anthropic_requests, text_hashes
+
+
+def submit_batches(openai_requests: list[dict], anthropic_requests: list[dict]) -> tuple[str | None, str | None]:
+    """Upload and create the batch jobs that have requests. Returns (openai_batch_id, anthropic_batch_id)."""
+    openai_batch_id = None
+    anthropic_batch_id = None
+
+    if openai_requests:
+        with open(BATCH_INPUT_FILE, 'wb') as f:
+            for request in openai_requests:
+                f.write(orjson.dumps(request) + b"\n")
+
+        with open(BATCH_INPUT_FILE, 'rb') as f:
+            input_file = openai_client.files.create(file=f, purpose="batch")
+
+        openai_batch_id = openai_client.batches.create(
+            input_file_id=input_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h"
+        ).id
+
+    if anthropic_requests:
+        anthropic_batch_id = anthropic_client.messages.batches.create(requests=anthropic_requests).id
+
+    return openai_batch_id, anthropic_batch_id
+
+
+def wait_for_batches(openai_batch_id: str | None, anthropic_batch_id: str | None):
+    """Poll the submitted jobs until each reaches a terminal status. Returns (openai_batch, anthropic_batch)."""
+    openai_batch = None
+    anthropic_batch = None
+
+    while True:
+        if openai_batch_id:
+            openai_batch = openai_client.batches.retrieve(openai_batch_id)
+            counts = openai_batch.request_counts
+            print(f"  OpenAI:    {openai_batch.status} "
+                  f"({counts.completed}/{counts.total} done, {counts.failed} failed)")
+        if anthropic_batch_id:
+            anthropic_batch = anthropic_client.messages.batches.retrieve(anthropic_batch_id)
+            counts = anthropic_batch.request_counts
+            print(f"  Anthropic: {anthropic_batch.processing_status} "
+                  f"({counts.succeeded} done, {counts.processing} processing, {counts.errored} failed)")
+
+        if ((openai_batch is None or openai_batch.status in OPENAI_TERMINAL_STATUSES)
+                and (anthropic_batch is None or anthropic_batch.processing_status == "ended")):
+            return openai_batch, anthropic_batch
+
+        time.sleep(POLL_INTERVAL_SECONDS)
+
+
+def download_results(openai_batch, anthropic_batch_id: str | None) -> dict:
+    """Download both jobs' output and return {(file_idx, quote_idx): {field: translation}}."""
+    results = {}
+
+    def add(custom_id: str, text: str):
+        lang_code, file_idx, quote_idx = custom_id.split("-")
+        results.setdefault((int(file_idx), int(quote_idx)), {})[LANGUAGE_FIELDS[lang_code]] = text.strip()
+
+    if openai_batch and openai_batch.output_file_id:
+        content = openai_client.files.content(openai_batch.output_file_id).text
+        for line in content.splitlines():
+            if not line.strip():
+                continue
+
+            record = orjson.loads(line)
+            response = record.get("response") or {}
+            if response.get("status_code") != 200:
+                continue
+
+            try:
+                add(record["custom_id"], response["body"]["choices"][0]["message"]["content"])
+            except (KeyError, IndexError, AttributeError) as e:
+                print(f"    Bad response for {record['custom_id']}: {e}")
+
+    if anthropic_batch_id:
+        for entry in anthropic_client.messages.batches.results(anthropic_batch_id):
+            if entry.result.type != "succeeded":
+                continue
+            add(entry.custom_id, entry.result.message.content[0].text)
+
+    return results
+
+
+def apply_results(
+    files: list[str], results: dict, text_hashes: dict, checkpoint: CheckpointManager
+) -> tuple[int, int]:
+    """Write translations into the quote files. Returns (files fully translated, quotes updated).
+
+    A result is skipped if its quote's text no longer matches the hash
+    recorded at submit time, e.g. because the file was re-extracted.
+    """
+    files_done = 0
+    quotes_updated = 0
+
+    for file_idx, filename in enumerate(files):
+        quotes = load_quotes(filename)
+        complete = True
+
+        for quote_idx, quote in enumerate(quotes):
+            translations = results.get((file_idx, quote_idx), {})
+            if text_hashes.get(f"{file_idx}-{quote_idx}") != quote_text_hash(quote["text"]):
+                translations = {}
+            # Only empty fields are filled, so existing translations are kept
+            translations = {
+                field: translation for field, translation in translations.items()
+                if not quote.get(field)
+            }
+            if translations:
+                quote.update(translations)
+                quotes_updated += 1
+            if any(not quote.get(field) for field in LANGUAGE_FIELDS.values()):
+                complete = False
+
+        quotes_path = OUTPUT_DIR / quotes_filename(filename)
+        with open(quotes_path, "wb") as f:
+            f.write(orjson.dumps(quotes, option=orjson.OPT_INDENT_2))
+        # The sidecar's translations are in the file now
+        translation_sidecar_path(quotes_path).unlink(missing_ok=True)
+
+        # Files with a missing translation stay pending for the next run or the pipeline
+        if complete:
+            checkpoint.mark_translated(filename, len(quotes), COST_PER_FILE_TRANSLATE_USD / 2)
+            files_done += 1
+
+    return files_done, quotes_updated
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Translate extracted quotes via the OpenAI and Anthropic Batch APIs")
+    parser.add_argument("--resume", action="store_true", help="Wait for and apply the last submitted jobs")
+    args = parser.parse_args()
+
+    checkpoint = CheckpointManager(BASE_DIR)
+
+    print("=" * 60)
+    if args.resume:
+        with open(BATCH_STATE_FILE, "rb") as f:
+            state = orjson.loads(f.read())
+        print(f"Resuming batches {state['openai_batch_id']} and {state['anthropic_batch_id']}")
+    else:
+        files = pending_files(checkpoint)
+        openai_requests, anthropic_requests, text_hashes = collect_requests(files)
+        if not (openai_requests or anthropic_requests):
+            if files:
+                # The pipeline's sidecars already hold every missing translation
+                files_done, _ = apply_results(files, {}, text_hashes, checkpoint)
+                checkpoint.save()
+                write_queue.join()
+                print(f"Wrote {files_done} files finished by earlier pipeline runs.")
+            print("No quotes are waiting for translation! Nothing to do.")
+            return
+
+        print(f"Submitting {len(openai_requests) + len(anthropic_requests)} requests "
+              f"from {len(files)} files to the Batch APIs...")
+        openai_batch_id, anthropic_batch_id = submit_batches(openai_requests, anthropic_requests)
+        state = {
+            "openai_batch_id": openai_batch_id,
+            "anthropic_batch_id": anthropic_batch_id,
+            "files": files,
+            "text_hashes": text_hashes
+        }
+        with open(BATCH_STATE_FILE, "wb") as f:
+            f.write(orjson.dumps(state, option=orjson.OPT_INDENT_2))
+        created = [f"{batch_id} ({name})" for batch_id, name in
+                   ((openai_batch_id, "OpenAI"), (anthropic_batch_id, "Anthropic")) if batch_id]
+        print(f"Batches created: {', '.join(created)}")
+        print("(Resume later with: python process_all_transcripts_batch_api.py --resume)")
+
+    print("=" * 60)
+    openai_batch, _ = wait_for_batches(state["openai_batch_id"], state["anthropic_batch_id"])
+
+    results = download_results(openai_batch, state["anthropic_batch_id"])
+    files_done, quotes_updated = apply_results(state["files"], results, state.get("text_hashes", {}), checkpoint)
+    checkpoint.save()
+    write_queue.join()
+
+    print("\n" + "=" * 60)
+    print("SUMMARY")
+    print("=" * 60)
+    print(f"Quotes updated:           {quotes_updated}")
+    print(f"Files fully translated:   {files_done}/{len(state['files'])}")
+    print("\nRun process_all_transcripts.py to translate anything the batches missed.")
+    print("\nDone!")
+
+
+if __name__ == "__main__":
+    main()
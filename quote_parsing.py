@@ -0,0 +1,35 @@
+"""
+Parsing of quote-extraction responses
+
+Shared by extract_quotes.py and process_all_transcripts.py, which both ask
+Claude for a JSON array of quotes and have it repair its own output when
+that array doesn't parse.
+
+Usage:
+    try:
+        quotes = parse_quotes_response(response_text)
+    except orjson.JSONDecodeError:
+        repair_text = ...  # send REPAIR_PROMPT.format(text=response_text)
+        quotes = parse_quotes_response(repair_text)
+"""
+
+import re
+
+import orjson
+
+# Outermost [...] in a response that wraps the quotes array in other text
+QUOTES_ARRAY_PATTERN = re.compile(r'\[.*\]', re.DOTALL)
+REPAIR_PROMPT = """The text below was meant to be a JSON array of quotes but is not valid JSON. Return ONLY the corrected JSON array, with no other text.
+
+{text}"""
+
+
+def parse_quotes_response(response_text: str) -> list:
+    """Parse the quotes array, tolerating prose or code fences around it."""
+    try:
+        return orjson.loads(response_text)
+    except orjson.JSONDecodeError:
+        match = QUOTES_ARRAY_PATTERN.search(response_text)
+        if not match:
+            raise
+        return orjson.loads(match.group(0))
@@ -0,0 +1,146 @@
+"""
+Rate Limiter for OpenAI calls
+
+Preemptive token-bucket limiter that tracks requests-per-minute and
+tokens-per-minute. Callers await `acquire()` before each request, so
+concurrent batches only wait as long as the account limits require
+instead of sleeping a fixed delay after every call.
+
+`tune_from_headers()` lets the limiter adopt the account's real limits from
+the rate-limit headers on each response, so the configured values are only
+a starting point.
+
+`retry_openai` covers what the limiter cannot prevent: transient 429s
+and 5xx responses are retried with jittered exponential backoff before
+the caller's fallback path runs.
+
+Usage:
+    limiter = AsyncLimiter(rpm=500, tpm=200_000)
+    semaphore = asyncio.Semaphore(20)
+
+    @retry_openai()
+    async def create_completion(messages):
+        async with semaphore:
+            await limiter.acquire(estimate_tokens(messages, max_tokens))
+            return await client.chat.completions.create(...)
+"""
+
+import asyncio
+import time
+
+import openai
+from tenacity import (
+    retry,
+    retry_if_exception_type,
+    stop_after_attempt,
+    wait_random_exponential,
+)
+
+try:
+    import tiktoken
+    _ENCODING = tiktoken.encoding_for_model("gpt-4o-mini")
+except Exception:
+    # tiktoken missing or its encoding files unavailable: estimate from length
+    _ENCODING = None
+
+
+# Errors worth retrying: rate limits, server errors, timeouts, dropped connections
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.InternalServerError,
+    openai.APIConnectionError,
+)
+
+
+def retry_on(errors: tuple, max_attempts: int = 5, base: float = 1.0, cap: float = 30.0):
+    """Retry a sync or async call on the given errors with jittered backoff, then re-raise."""
+    return retry(
+        retry=retry_if_exception_type(errors),
+        wait=wait_random_exponential(multiplier=base, min=base, max=cap),
+        stop=stop_after_attempt(max_attempts),
+        reraise=True,
+    )
+
+
+def retry_openai(max_attempts: int = 5, base: float = 1.0, cap: float = 30.0):
+    """Retry a sync or async OpenAI call on transient errors, then re-raise."""
+    return retry_on(RETRYABLE_ERRORS, max_attempts, base, cap)
+
+
+def _content_text(content) -> str:
+    """Message content as plain text, whether a string or a list of text blocks."""
+    if isinstance(content, str):
+        return content
+    return "".join(block.get("text", "") for block in content)
+
+
+def estimate_tokens(messages: list[dict], max_tokens: int = 0) -> int:
+    """Estimate the tokens a chat request counts against the TPM limit."""
+    text = "".join(_content_text(m.get("content", "")) for m in messages)
+    if _ENCODING is not None:
+        prompt_tokens = len(_ENCODING.encode(text))
+    else:
+        prompt_tokens = len(text) // 4
+    return prompt_tokens + max_tokens
+
+
+class AsyncLimiter:
+    """Token bucket over requests and tokens, refilled continuously per minute."""
+
+    def __init__(self, rpm: int, tpm: int):
+        self.rpm = rpm
+        self.tpm = tpm
+        self._available_requests = float(rpm)
+        self._available_tokens = float(tpm)
+        self._last_refill = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        self._available_requests = min(
+            self.rpm, self._available_requests + elapsed * self.rpm / 60
+        )
+        self._available_tokens = min(
+            self.tpm, self._available_tokens + elapsed * self.tpm / 60
+        )
+
+    def set_limits(self, rpm: int, tpm: int):
+        """Switch to new per-minute limits, keeping what is already available."""
+        if rpm == self.rpm and tpm == self.tpm:
+            return
+        self._refill()
+        self.rpm = rpm
+        self.tpm = tpm
+        self._available_requests = min(self._available_requests, rpm)
+        self._available_tokens = min(self._available_tokens, tpm)
+
+    def tune_from_headers(self, headers, requests_header: str, tokens_header: str):
+        """Adopt the RPM/TPM limits a response reports, if it carries both headers."""
+        try:
+            rpm = int(headers[requests_header])
+            tpm = int(headers[tokens_header])
+        except (KeyError, ValueError):
+            return
+        if rpm > 0 and tpm > 0:
+            self.set_limits(rpm, tpm)
+
+    async def acquire(self, estimated_tokens: int = 0):
+        """Wait until one request and `estimated_tokens` fit within the limits."""
+        estimated_tokens = min(estimated_tokens, self.tpm)
+
+        async with self._lock:
+            while True:
+                self._refill()
+                if (self._available_requests >= 1
+                        and self._available_tokens >= estimated_tokens):
+                    self._available_requests -= 1
+                    self._available_tokens -= estimated_tokens
+                    return
+
+                wait = max(
+                    (1 - self._available_requests) * 60 / self.rpm,
+                    (estimated_tokens - self._available_tokens) * 60 / self.tpm,
+                )
+                await asyncio.sleep(wait)
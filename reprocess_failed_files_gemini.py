@@ -3,9 +3,9 @@ Reprocess failed transcript files using Google Gemini Flash 2.0
 """
 
 import os
-import json
-import time
+import orjson
 import re
+import asyncio
 from datetime import datetime
 from dotenv import load_dotenv
 
@@ -45,14 +45,20 @@ TRANSCRIPTS_DIR = "transcripts"
 OUTPUT_DIR = "output"
 PROMPT_FILE = "extraction_prompt.txt"
 
-# Rate limit delay (seconds)
-RATE_LIMIT_DELAY = 2
+# Gemini requests in flight at once
+MAX_CONCURRENT = 8
 
 # Approximate cost per 1M tokens for Gemini Flash 2.0
 # Input: $0.075/1M tokens, Output: $0.30/1M tokens (approximate)
 COST_PER_1M_INPUT_TOKENS = 0.075
 COST_PER_1M_OUTPUT_TOKENS = 0.30
 
+# Markdown code fence around a JSON response
+FENCE_OPEN_PATTERN = re.compile(r'^```(?:json)?\s*\n?')
+FENCE_CLOSE_PATTERN = re.compile(r'\n?```\s*$')
+
+semaphore = asyncio.Semaphore(MAX_CONCURRENT)
+
 
 def load_extraction_prompt():
     """Load the extraction prompt from file."""
@@ -74,9 +80,9 @@ def extract_json_from_response(response_text):
     # Remove markdown code blocks if present
     if text.startswith("```"):
         # Remove opening code block (```json or ```)
-        text = re.sub(r'^```(?:json)?\s*\n?', '', text)
+        text = FENCE_OPEN_PATTERN.sub('', text)
         # Remove closing code block
-        text = re.sub(r'\n?```\s*$', '', text)
+        text = FENCE_CLOSE_PATTERN.sub('', text)
     
     # Find JSON array in the text
     start_idx = text.find('[')
@@ -84,22 +90,23 @@ def extract_json_from_response(response_text):
     
     if start_idx != -1 and end_idx != -1:
         json_str = text[start_idx:end_idx + 1]
-        return json.loads(json_str)
+        return orjson.loads(json_str)
     
     # Try parsing the whole text as JSON
-    return json.loads(text)
+    return orjson.loads(text)
 
 
-def process_transcript(filename, extraction_prompt):
+async def process_transcript(filename, extraction_prompt):
     """Process a single transcript file with Gemini."""
     # Load transcript
     transcript_text = load_transcript(filename)
     
     # Call Gemini API
-    response = model.generate_content([
-        extraction_prompt,
-        transcript_text
-    ])
+    async with semaphore:
+        response = await model.generate_content_async([
+            extraction_prompt,
+            transcript_text
+        ])
     
     # Parse response
     response_text = response.text
@@ -123,13 +130,13 @@ def save_quotes(filename, quotes):
     output_path = os.path.join(OUTPUT_DIR, output_filename)
     
     # Save to file
-    with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(quotes, f, indent=2, ensure_ascii=False)
+    with open(output_path, 'wb') as f:
+        f.write(orjson.dumps(quotes, option=orjson.OPT_INDENT_2))
     
     return output_path
 
 
-def main():
+async def amain():
     """Main function to reprocess failed files."""
     print("=" * 60)
     print("Reprocessing Failed Files with Gemini Flash 2.0")
@@ -153,12 +160,19 @@ def main():
     
     print(f"\nProcessing {total_files} files...\n")
     
-    for idx, filename in enumerate(FAILED_FILES, 1):
+    # Files are independent; the semaphore bounds how many calls run at once
+    results = await asyncio.gather(
+        *(process_transcript(filename, extraction_prompt) for filename in FAILED_FILES),
+        return_exceptions=True
+    )
+    
+    for idx, (filename, result) in enumerate(zip(FAILED_FILES, results), 1):
         print(f"Processing {filename} ({idx}/{total_files})...", end=" ", flush=True)
         
         try:
-            # Process transcript
-            quotes, input_tokens, output_tokens = process_transcript(filename, extraction_prompt)
+            if isinstance(result, Exception):
+                raise result
+            quotes, input_tokens, output_tokens = result
             
             # Save quotes
             output_path = save_quotes(filename, quotes)
@@ -171,17 +185,13 @@ def main():
             
             print(f"OK - {len(quotes)} quotes extracted")
             
-        except json.JSONDecodeError as e:
+        except orjson.JSONDecodeError as e:
             print(f"FAILED - JSON parsing error: {e}")
             failed_files.append((filename, f"JSON parsing error: {e}"))
             
         except Exception as e:
             print(f"FAILED - {e}")
             failed_files.append((filename, str(e)))
-        
-        # Rate limit delay (skip for last file)
-        if idx < total_files:
-            time.sleep(RATE_LIMIT_DELAY)
     
     # Calculate elapsed time
     end_time = datetime.now()
@@ -212,5 +222,9 @@ def main():
     print("\nDone!")
 
 
+def main():
+    asyncio.run(amain())
+
+
 if __name__ == "__main__":
     main()
@@ -3,7 +3,7 @@ Reprocess failed transcript files using OpenAI GPT-4o-mini
 """
 
 import os
-import json
+import orjson
 import time
 import re
 from datetime import datetime
@@ -53,6 +53,10 @@ RATE_LIMIT_DELAY = 2
 COST_PER_1M_INPUT_TOKENS = 0.15
 COST_PER_1M_OUTPUT_TOKENS = 0.60
 
+# Markdown code fence around a JSON response
+FENCE_OPEN_PATTERN = re.compile(r'^```(?:json)?\s*\n?')
+FENCE_CLOSE_PATTERN = re.compile(r'\n?```\s*$')
+
 
 def load_extraction_prompt():
     """Load the extraction prompt from file."""
@@ -74,9 +78,9 @@ def extract_json_from_response(response_text):
     # Remove markdown code blocks if present
     if text.startswith("```"):
         # Remove opening code block (```json or ```)
-        text = re.sub(r'^```(?:json)?\s*\n?', '', text)
+        text = FENCE_OPEN_PATTERN.sub('', text)
         # Remove closing code block
-        text = re.sub(r'\n?```\s*$', '', text)
+        text = FENCE_CLOSE_PATTERN.sub('', text)
     
     # Find JSON array in the text
     start_idx = text.find('[')
@@ -84,10 +88,10 @@ def extract_json_from_response(response_text):
     
     if start_idx != -1 and end_idx != -1:
         json_str = text[start_idx:end_idx + 1]
-        return json.loads(json_str)
+        return orjson.loads(json_str)
     
     # Try parsing the whole text as JSON
-    return json.loads(text)
+    return orjson.loads(text)
 
 
 def process_transcript(filename, extraction_prompt):
@@ -131,8 +135,8 @@ def save_quotes(filename, quotes):
     output_path = os.path.join(OUTPUT_DIR, output_filename)
     
     # Save to file
-    with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(quotes, f, indent=2, ensure_ascii=False)
+    with open(output_path, 'wb') as f:
+        f.write(orjson.dumps(quotes, option=orjson.OPT_INDENT_2))
     
     return output_path
 
@@ -179,7 +183,7 @@ def main():
             
             print(f"OK - {len(quotes)} quotes extracted")
             
-        except json.JSONDecodeError as e:
+        except orjson.JSONDecodeError as e:
             print(f"FAILED - JSON parsing error: {e}")
             failed_files.append((filename, f"JSON parsing error: {e}"))
             
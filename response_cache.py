@@ -0,0 +1,55 @@
+"""
+Persistent cache of parsed LLM responses
+
+Maps a SHA-256 of (model, messages) to the parsed JSON result in a small
+SQLite table, so re-running a generation script only calls the API for
+prompts it has never answered before. Any change to the prompt text,
+model or input produces a new key, so stale entries are never served.
+
+Usage:
+    cache = ResponseCache(".llm_cache/profiles.sqlite")
+    key = cache.key(MODEL, messages)
+    result = cache.get(key)
+    if result is None:
+        result = ...  # call the API and parse
+        cache.set(key, result)
+"""
+
+import hashlib
+import os
+import sqlite3
+
+import orjson
+
+
+class ResponseCache:
+    """Key-value store of parsed responses backed by SQLite."""
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, value BLOB)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def key(model: str, messages: list[dict]) -> str:
+        """Hash the exact request so any prompt or input change misses the cache."""
+        return hashlib.sha256(model.encode() + orjson.dumps(messages)).hexdigest()
+
+    def get(self, key: str):
+        row = self._conn.execute(
+            "SELECT value FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        return orjson.loads(row[0]) if row else None
+
+    def set(self, key: str, value):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO responses (key, value) VALUES (?, ?)",
+            (key, orjson.dumps(value)),
+        )
+        self._conn.commit()
+
+    def __len__(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
@@ -0,0 +1,40 @@
+import os
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("OPENAI_API_KEY", "test")  # The module builds its client on import
+
+from normalize_expertise import normalize_expertise_direct
+
+
+class PhraseMatchTest(unittest.TestCase):
+    def test_lone_generic_word_is_left_to_gpt(self):
+        for expertise in [
+            "AI Research",
+            "AI Policy Research",
+            "AI Security Research",
+            "Media Relations",
+            "Digital Media Strategy",
+            "Personal Growth",
+            "Developer Productivity Measurement",
+            "Payment Infrastructure",
+            "Prompt Engineering",
+            "Educational Storytelling",
+        ]:
+            with self.subTest(expertise=expertise):
+                self.assertIsNone(normalize_expertise_direct(expertise))
+
+    def test_multi_word_phrase_is_mapped(self):
+        for expertise, category in [
+            ("Growth Marketing Strategy for B2B", "Growth Strategy"),
+            ("B2B Sales Strategy", "Sales Strategy"),
+            ("Career Development Coaching", "Career Development"),
+        ]:
+            with self.subTest(expertise=expertise):
+                self.assertEqual(normalize_expertise_direct(expertise), category)
+
+
+if __name__ == "__main__":
+    unittest.main()
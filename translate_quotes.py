@@ -1,8 +1,16 @@
+import asyncio
+import itertools
 import os
-import json
-import time
+import re
+from collections.abc import Iterator
+import orjson
 from pathlib import Path
-from anthropic import Anthropic
+import anthropic
+import httpx
+from anthropic import AsyncAnthropic, DefaultAsyncHttpxClient
+
+from rate_limiter import AsyncLimiter, estimate_tokens, retry_on
+from response_cache import ResponseCache
 
 
 LANGUAGES = {
@@ -11,7 +19,38 @@ LANGUAGES = {
     "es": "Spanish"
 }
 
-BATCH_SIZE = 5
+MODEL = "claude-sonnet-4-20250514"
+BATCH_SIZE = 10  # Quotes packed into one translation request
+SAVE_EVERY_BATCHES = 2  # Save partial progress after this many finished batches
+MAX_CONCURRENT = 5  # Translation requests in flight at once
+MAX_TOKENS = 2048
+MAX_TOKENS_PER_PACKED_QUOTE = 512  # Output budget per quote of a packed request
+RESPONSE_CACHE_FILE = os.path.join(".llm_cache", "translate_quotes.sqlite")
+
+# Starting account limits; requests are paced by these instead of a fixed
+# sleep, and they are replaced by the limits each response's headers report
+RPM_LIMIT = 50
+TPM_LIMIT = 400_000
+LIMIT_HEADERS = ("anthropic-ratelimit-requests-limit", "anthropic-ratelimit-tokens-limit")
+
+# Errors worth retrying: rate limits, overload/server errors, dropped connections
+RETRYABLE_ERRORS = (
+    anthropic.RateLimitError,
+    anthropic.InternalServerError,
+    anthropic.ServiceUnavailableError,
+    anthropic.OverloadedError,
+    anthropic.APIConnectionError,
+)
+
+semaphore = asyncio.Semaphore(MAX_CONCURRENT)
+# Translations already made for a prompt, so reruns skip unchanged quotes
+response_cache = ResponseCache(RESPONSE_CACHE_FILE)
+# Translations being requested, by cache key, so a text repeated across
+# files is requested once even before its first result is cached
+inflight: dict[str, asyncio.Future] = {}
+
+# Endless round-robin of (client, limiter) pairs, one per API key
+ClientPool = Iterator[tuple[AsyncAnthropic, AsyncLimiter]]
 
 
 TRANSLATION_PROMPTS = {
@@ -79,80 +118,253 @@ Return ONLY the Spanish translation, nothing else."""
 }
 
 
-def get_translation_prompt(text: str, language_code: str) -> str:
-    """Generate translation prompt for a single text based on language."""
-    prompt_template = TRANSLATION_PROMPTS.get(language_code)
-    if prompt_template:
-        return prompt_template.format(text=text)
-    else:
-        # Fallback for unknown languages
-        return f"Translate this to {language_code}: {text}"
+# Each language's rules as a system prompt, sent with the quote alone as the
+# user message. The rules are too short for Anthropic's prompt cache (1024
+# tokens minimum on Sonnet), so no cache_control marker is set.
+SYSTEM_PROMPTS = {
+    lang_code: prompt.replace("\n\nQuote to translate:\n{text}", "")
+    for lang_code, prompt in TRANSLATION_PROMPTS.items()
+}
+
+# Every language's rules, shared by the single-quote and packed system prompts
+TRANSLATION_RULES = """KOREAN:
+{ko_rules}
+
+CHINESE:
+{zh_rules}
+
+SPANISH:
+{es_rules}""".format(**{
+    f"{lang_code}_rules": TRANSLATION_PROMPTS[lang_code].split("\n\nQuote to translate:")[0]
+    for lang_code in LANGUAGES
+})
+
+COMBINED_SYSTEM_PROMPT = f"""Translate the English business quote in the user message into Korean, Simplified Chinese and Spanish.
+
+{TRANSLATION_RULES}
+
+Return ONLY a JSON object of the form {{"ko": "...", "zh": "...", "es": "..."}}."""
+
+# Same rules for a numbered list of quotes; the list length is checked on
+# parse so the system prompt stays identical for every pack
+PACKED_SYSTEM_PROMPT = f"""The user message is a numbered list of separate English business quotes. Translate each one on its own into Korean, Simplified Chinese and Spanish.
+
+{TRANSLATION_RULES}
+
+Return ONLY a JSON object of the form {{"ko": ["...", "..."], "zh": ["...", "..."], "es": ["...", "..."]}} with one translation per quote per language, in list order."""
+
+# Outermost {...} in a reply that wraps the JSON object in other text
+JSON_OBJECT_PATTERN = re.compile(r'\{.*\}', re.DOTALL)
 
 
-def translate_batch(client: Anthropic, texts: list[str], language_code: str) -> list[str]:
-    """Translate a batch of texts to a single language."""
-    translations = []
+def build_request(system_prompt: str, text: str) -> dict:
+    """System and messages fields of a translation request."""
+    return {
+        "system": system_prompt,
+        "messages": [{"role": "user", "content": text}]
+    }
+
+
+def load_json_object(content: str) -> dict | None:
+    """The JSON object in a reply, tolerating text around it; None if there is none."""
+    match = JSON_OBJECT_PATTERN.search(content)
+    if not match:
+        return None
+    try:
+        data = orjson.loads(match.group(0))
+    except orjson.JSONDecodeError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def parse_combined_translation(content: str) -> dict | None:
+    """Parse {"ko", "zh", "es"}; None unless every language has a non-empty string."""
+    data = load_json_object(content)
+    if data is None or not all(
+        isinstance(data.get(lang_code), str) and data[lang_code].strip() for lang_code in LANGUAGES
+    ):
+        return None
+    return {lang_code: data[lang_code].strip() for lang_code in LANGUAGES}
+
+
+def parse_packed_translations(content: str, count: int) -> list[dict] | None:
+    """Parse {"ko": [...], "zh": [...], "es": [...]} into one {lang_code: translation} per quote.
+
+    None unless every language lists exactly `count` non-empty strings.
+    """
+    data = load_json_object(content)
+    if data is None or not all(
+        isinstance(data.get(lang_code), list) and len(data[lang_code]) == count
+        and all(isinstance(t, str) and t.strip() for t in data[lang_code])
+        for lang_code in LANGUAGES
+    ):
+        return None
+    return [{lang_code: data[lang_code][i].strip() for lang_code in LANGUAGES} for i in range(count)]
+
+
+@retry_on(RETRYABLE_ERRORS)
+async def create_message(clients: ClientPool, system_prompt: str, text: str, max_tokens: int = MAX_TOKENS) -> str:
+    """Rate-limited Claude request, retried with backoff on transient API errors. Returns the reply text."""
+    request = build_request(system_prompt, text)
+    estimated_tokens = estimate_tokens([{"role": "system", "content": system_prompt}, *request["messages"]], max_tokens)
     
-    for text in texts:
-        prompt = get_translation_prompt(text, language_code)
-        
-        message = client.messages.create(
-            model="claude-sonnet-4-20250514",
-            max_tokens=2048,
-            messages=[
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ]
+    async with semaphore:
+        # Each request (and retry) goes to the next API key's client and limiter
+        client, limiter = next(clients)
+        await limiter.acquire(estimated_tokens)
+        raw = await client.messages.with_raw_response.create(
+            model=MODEL,
+            max_tokens=max_tokens,
+            **request
         )
-        
-        translation = message.content[0].text.strip()
-        translations.append(translation)
+        limiter.tune_from_headers(raw.headers, *LIMIT_HEADERS)
+    
+    return raw.parse().content[0].text.strip()
+
+
+def translation_cache_key(text: str) -> str:
+    """Cache key for one text's translations, however they were requested."""
+    return response_cache.key(MODEL, [
+        {"role": "system", "content": COMBINED_SYSTEM_PROMPT},
+        {"role": "user", "content": text}
+    ])
+
+
+async def translate_texts(clients: ClientPool, texts: list[str]) -> list[dict]:
+    """Translate texts to all languages, packing the uncached ones into one request.
+
+    Returns one {lang_code: translation} per text.
+    """
+    keys = [translation_cache_key(text) for text in texts]
     
+    # Texts neither cached nor already requested by another batch
+    new_texts = {}
+    for text, key in zip(texts, keys):
+        if key not in inflight and key not in new_texts and response_cache.get(key) is None:
+            new_texts[key] = text
+    
+    if new_texts:
+        packed = asyncio.ensure_future(request_translations(clients, list(new_texts.values())))
+        for index, key in enumerate(new_texts):
+            inflight[key] = asyncio.ensure_future(take_translation(packed, index, key))
+            inflight[key].add_done_callback(lambda _, key=key: inflight.pop(key, None))
+    
+    futures = {key: inflight[key] for key in keys if key in inflight}
+    results = dict(zip(futures, await asyncio.gather(*futures.values())))
+    return [results[key] if key in results else response_cache.get(key) for key in keys]
+
+
+async def take_translation(packed: asyncio.Future, index: int, cache_key: str) -> dict:
+    """One text's translations out of a packed request, cached as they arrive."""
+    translations = (await packed)[index]
+    response_cache.set(cache_key, translations)
     return translations
 
 
-def translate_quotes_in_file(client: Anthropic, quotes: list, filename: str) -> tuple[list, int]:
-    """Translate all quotes in a file to all languages."""
-    total_quotes = len(quotes)
+async def request_translations(clients: ClientPool, texts: list[str]) -> list[dict]:
+    """Request several texts' translations in one call, falling back to one call per text."""
+    if len(texts) > 1:
+        numbered = "\n".join(f"{i}. {text}" for i, text in enumerate(texts, start=1))
+        content = await create_message(
+            clients, PACKED_SYSTEM_PROMPT, numbered, MAX_TOKENS_PER_PACKED_QUOTE * len(texts)
+        )
+        translations = parse_packed_translations(content, len(texts))
+        if translations is not None:
+            return translations
+    
+    # Single text or a reply that doesn't line up with the list
+    return await asyncio.gather(*(request_translation(clients, text) for text in texts))
+
+
+async def request_translation(clients: ClientPool, text: str) -> dict:
+    """Request the combined translation of one text, falling back per language."""
+    translations = parse_combined_translation(await create_message(clients, COMBINED_SYSTEM_PROMPT, text))
+    if translations is None:
+        # Unparseable reply: fall back to one request per language
+        results = await asyncio.gather(*(
+            create_message(clients, SYSTEM_PROMPTS[lang_code], text) for lang_code in LANGUAGES
+        ))
+        translations = dict(zip(LANGUAGES, results))
+    
+    return translations
+
+
+async def translate_quotes_in_file(clients: ClientPool, quotes: list, file_path: Path) -> tuple[list, int]:
+    """Translate the quotes in a file that are missing a language, saving progress as batches finish."""
+    filename = file_path.name
+    # Quotes translated by an earlier, interrupted run are skipped
+    pending = [q for q in quotes if any(not q.get(f"text_{lang_code}") for lang_code in LANGUAGES)]
+    total_quotes = len(pending)
     translated_count = 0
+    finished_batches = 0
     
-    # Process in batches
-    for batch_start in range(0, total_quotes, BATCH_SIZE):
-        batch_end = min(batch_start + BATCH_SIZE, total_quotes)
-        batch_quotes = quotes[batch_start:batch_end]
-        
-        # Get texts to translate from this batch
-        texts_to_translate = [q["text"] for q in batch_quotes]
+    async def translate_quote_batch(batch_quotes: list):
+        nonlocal translated_count, finished_batches
+        all_translations = await translate_texts(clients, [quote["text"] for quote in batch_quotes])
         
-        # Translate to each language
-        for lang_code in LANGUAGES.keys():
-            field_name = f"text_{lang_code}"
-            
-            # Translate batch
-            translations = translate_batch(client, texts_to_translate, lang_code)
-            
-            # Add translations to quotes
-            for i, translation in enumerate(translations):
-                quotes[batch_start + i][field_name] = translation
-            
-            # Delay between language API calls
-            time.sleep(2)
+        for quote, translations in zip(batch_quotes, all_translations):
+            for lang_code, translation in translations.items():
+                if not quote.get(f"text_{lang_code}"):
+                    quote[f"text_{lang_code}"] = translation
         
         translated_count += len(batch_quotes)
         print(f"  Translating {filename}: {translated_count}/{total_quotes} quotes")
+        
+        # Written inline rather than in a thread, so two saves never race
+        finished_batches += 1
+        if finished_batches % SAVE_EVERY_BATCHES == 0:
+            save_quotes(file_path, quotes)
+    
+    # Batches overlap too; the semaphore bounds the total requests in flight
+    await asyncio.gather(*(
+        translate_quote_batch(pending[batch_start:batch_start + BATCH_SIZE])
+        for batch_start in range(0, total_quotes, BATCH_SIZE)
+    ))
     
     return quotes, translated_count
 
 
-def main():
+def load_quotes(file_path: Path) -> list:
+    with open(file_path, "rb") as f:
+        return orjson.loads(f.read())
+
+
+def save_quotes(file_path: Path, quotes: list):
+    tmp_path = file_path.with_name(file_path.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(orjson.dumps(quotes, option=orjson.OPT_INDENT_2))
+    # Atomic rename, so a crash mid-write never leaves a torn file
+    os.replace(tmp_path, file_path)
+
+
+async def translate_file(clients: ClientPool, file_path: Path) -> int:
+    """Load, translate and save one quotes file. Returns the number of quotes translated."""
+    filename = file_path.name
+    print(f"\nProcessing {filename}...")
+    
+    # File I/O runs in a thread so other files' requests keep flowing
+    quotes = await asyncio.to_thread(load_quotes, file_path)
+    quotes, count = await translate_quotes_in_file(clients, quotes, file_path)
+    if not count:
+        print(f"  -> {filename} is already translated")
+        return count
+    
+    await asyncio.to_thread(save_quotes, file_path, quotes)
+    
+    print(f"  -> Saved translations to {filename}")
+    return count
+
+
+def load_api_keys() -> list[str]:
+    """API keys from ANTHROPIC_API_KEYS (comma-separated), else ANTHROPIC_API_KEY."""
+    api_keys = [key.strip() for key in os.environ.get("ANTHROPIC_API_KEYS", "").split(",") if key.strip()]
+    return api_keys or [os.environ.get("ANTHROPIC_API_KEY")]
+
+
+async def amain():
     base_dir = Path(__file__).parent
     output_dir = base_dir / "output"
     
-    # Initialize Anthropic client
-    client = Anthropic(api_key=os.environ.get("ANTHROPIC_API_KEY"))
-    
     # Get all *_quotes.json files
     quote_files = sorted(output_dir.glob("*_quotes.json"))
     
@@ -166,30 +378,36 @@ def main():
     total_quotes_translated = 0
     errors = []
     
-    # Process each file
-    for file_path in quote_files:
-        filename = file_path.name
-        print(f"\nProcessing {filename}...")
+    # One Anthropic client per API key, all sharing a pooled HTTP/2
+    # connection per request slot, so requests reuse warm connections
+    # instead of each paying a TLS handshake
+    api_keys = load_api_keys()
+    async with DefaultAsyncHttpxClient(
+        http2=True,
+        limits=httpx.Limits(max_connections=MAX_CONCURRENT, max_keepalive_connections=MAX_CONCURRENT)
+    ) as http_client:
+        clients = itertools.cycle([
+            (
+                # retry_on() retries instead of the SDK
+                AsyncAnthropic(api_key=api_key, http_client=http_client, max_retries=0),
+                AsyncLimiter(rpm=RPM_LIMIT, tpm=TPM_LIMIT)
+            )
+            for api_key in api_keys
+        ])
         
-        try:
-            # Load quotes
-            with open(file_path, "r", encoding="utf-8") as f:
-                quotes = json.load(f)
-            
-            # Translate quotes
-            quotes, count = translate_quotes_in_file(client, quotes, filename)
-            total_quotes_translated += count
-            
-            # Save updated quotes back to file
-            with open(file_path, "w", encoding="utf-8") as f:
-                json.dump(quotes, f, indent=2, ensure_ascii=False)
-            
-            print(f"  -> Saved translations to {filename}")
-            
-        except Exception as e:
-            error_msg = f"{filename}: {str(e)}"
-            errors.append(error_msg)
-            print(f"  -> ERROR: {str(e)}")
+        # All files run at once; the shared semaphore and per-key limiters
+        # keep the requests in flight bounded however many files there are
+        results = await asyncio.gather(
+            *(translate_file(clients, file_path) for file_path in quote_files),
+            return_exceptions=True
+        )
+    
+    for file_path, result in zip(quote_files, results):
+        if isinstance(result, Exception):
+            errors.append(f"{file_path.name}: {str(result)}")
+            print(f"  -> ERROR in {file_path.name}: {str(result)}")
+        else:
+            total_quotes_translated += result
     
     # Print summary
     print("\n" + "=" * 50)
@@ -208,5 +426,9 @@ def main():
     print("=" * 50)
 
 
+def main():
+    asyncio.run(amain())
+
+
 if __name__ == "__main__":
     main()
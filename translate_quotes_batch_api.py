@@ -0,0 +1,199 @@
+"""
+Translate quotes via the Anthropic Message Batches API
+
+Same translations as translate_quotes.py (one combined Korean, Chinese and
+Spanish prompt per quote), but every quote still missing a language in every
+*_quotes.json goes into a single Message Batch. Batches cost 50% less and are not bound by the
+per-minute rate limits, which suits whole-corpus runs nobody waits on.
+Results arrive within 24h; each file is written once after its results are
+applied.
+
+Usage:
+    python translate_quotes_batch_api.py           # submit, wait, apply
+    python translate_quotes_batch_api.py --resume  # wait for the last submitted batch
+"""
+
+import argparse
+import hashlib
+import os
+import time
+from pathlib import Path
+
+import orjson
+from anthropic import Anthropic
+from dotenv import load_dotenv
+
+from translate_quotes import (
+    COMBINED_SYSTEM_PROMPT,
+    LANGUAGES,
+    MAX_TOKENS,
+    MODEL,
+    build_request,
+    parse_combined_translation,
+)
+
+load_dotenv('.env.local')
+
+BASE_DIR = Path(__file__).parent
+OUTPUT_DIR = BASE_DIR / "output"
+BATCH_STATE_FILE = "translation_batch_state.json"  # Batch ID and files, for --resume
+POLL_INTERVAL_SECONDS = 60
+
+client = Anthropic(api_key=os.environ.get("ANTHROPIC_API_KEY"))
+
+
+def load_quotes(filename: str) -> list:
+    with open(OUTPUT_DIR / filename, "rb") as f:
+        return orjson.loads(f.read())
+
+
+def text_hash(text: str) -> str:
+    """Short hash of a quote's text, tying a batch result to the quote it translated."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+def collect_requests(files: list[str]) -> tuple[list[dict], dict]:
+    """Build one Message Batch request per quote missing a language. Returns (requests, text_hashes).
+
+    Custom IDs are "<file index>-<quote index>" because Anthropic only allows
+    [a-zA-Z0-9_-] in them; the file list and text_hashes, the hash of each
+    custom ID's quote text, are kept in the state file.
+    """
+    requests = []
+    text_hashes = {}
+
+    for file_idx, filename in enumerate(files):
+        for quote_idx, quote in enumerate(load_quotes(filename)):
+            # Quotes translated by an earlier run are skipped
+            if all(quote.get(f"text_{lang_code}") for lang_code in LANGUAGES):
+                continue
+            custom_id = f"{file_idx}-{quote_idx}"
+            text_hashes[custom_id] = text_hash(quote["text"])
+            requests.append({
+                "custom_id": custom_id,
+                "params": {
+                    "model": MODEL,
+                    "max_tokens": MAX_TOKENS,
+                    **build_request(COMBINED_SYSTEM_PROMPT, quote["text"])
+                }
+            })
+
+    return requests, text_hashes
+
+
+def wait_for_batch(batch_id: str):
+    """Poll until the batch has ended."""
+    while True:
+        batch = client.messages.batches.retrieve(batch_id)
+        counts = batch.request_counts
+        print(f"  Status: {batch.processing_status} "
+              f"({counts.succeeded} done, {counts.processing} processing, {counts.errored} failed)")
+
+        if batch.processing_status == "ended":
+            return batch
+
+        time.sleep(POLL_INTERVAL_SECONDS)
+
+
+def download_results(batch_id: str) -> tuple[dict, int]:
+    """Stream the batch results. Returns ({(file_idx, quote_idx): translations}, failed count)."""
+    results = {}
+    failed = 0
+
+    for entry in client.messages.batches.results(batch_id):
+        translations = None
+        if entry.result.type == "succeeded":
+            translations = parse_combined_translation(entry.result.message.content[0].text)
+
+        if translations is None:
+            failed += 1
+            continue
+
+        file_idx, quote_idx = entry.custom_id.split("-")
+        results[(int(file_idx), int(quote_idx))] = translations
+
+    return results, failed
+
+
+def apply_results(files: list[str], results: dict, text_hashes: dict) -> tuple[int, int]:
+    """Fill empty translations in the quote files. Returns (files, quotes) updated.
+
+    A result is skipped if its quote's text no longer matches the hash
+    recorded at submit time.
+    """
+    files_updated = 0
+    quotes_updated = 0
+
+    for file_idx, filename in enumerate(files):
+        quotes = load_quotes(filename)
+        updated = 0
+
+        for quote_idx, quote in enumerate(quotes):
+            translations = results.get((file_idx, quote_idx))
+            if not translations or text_hashes.get(f"{file_idx}-{quote_idx}") != text_hash(quote["text"]):
+                continue
+
+            missing = [lang_code for lang_code in translations if not quote.get(f"text_{lang_code}")]
+            for lang_code in missing:
+                quote[f"text_{lang_code}"] = translations[lang_code]
+            if missing:
+                updated += 1
+
+        if not updated:
+            continue
+
+        with open(OUTPUT_DIR / filename, "wb") as f:
+            f.write(orjson.dumps(quotes, option=orjson.OPT_INDENT_2))
+        files_updated += 1
+        quotes_updated += updated
+
+    return files_updated, quotes_updated
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Translate quotes via the Anthropic Message Batches API")
+    parser.add_argument("--resume", action="store_true", help="Wait for and apply the last submitted batch")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    if args.resume:
+        with open(BATCH_STATE_FILE, "rb") as f:
+            state = orjson.loads(f.read())
+        print(f"Resuming batch {state['batch_id']}")
+    else:
+        files = [path.name for path in sorted(OUTPUT_DIR.glob("*_quotes.json"))]
+        requests, text_hashes = collect_requests(files)
+        if not requests:
+            print("No untranslated quotes in output/ folder. Nothing to do.")
+            return
+
+        print(f"Submitting {len(requests)} quotes from {len(files)} files to the Message Batches API...")
+        batch = client.messages.batches.create(requests=requests)
+        state = {"batch_id": batch.id, "files": files, "text_hashes": text_hashes}
+        with open(BATCH_STATE_FILE, "wb") as f:
+            f.write(orjson.dumps(state, option=orjson.OPT_INDENT_2))
+        print(f"Batch created: {batch.id}")
+        print("(Resume later with: python translate_quotes_batch_api.py --resume)")
+
+    print("=" * 60)
+    wait_for_batch(state["batch_id"])
+
+    results, failed = download_results(state["batch_id"])
+    files_updated, quotes_updated = apply_results(state["files"], results, state.get("text_hashes", {}))
+
+    print("\n" + "=" * 60)
+    print("SUMMARY")
+    print("=" * 60)
+    print(f"Quotes translated:  {quotes_updated}")
+    print(f"Quotes failed:      {failed}")
+    print(f"Files updated:      {files_updated}/{len(state['files'])}")
+    print(f"Total languages:    {len(LANGUAGES)} (ko, zh, es)")
+
+    if failed:
+        print("\nRun translate_quotes.py to retry the quotes the batch missed.")
+
+    print("\nDone!")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,17 @@
+import asyncio
+import itertools
 import os
-import json
-import time
+import orjson
+from collections.abc import Iterator
 from pathlib import Path
 from dotenv import load_dotenv
+import anthropic
+import httpx
+import openai
 from openai import OpenAI
 from anthropic import Anthropic
+from rate_limiter import retry_on, retry_openai
+from response_cache import ResponseCache
 
 # Load API keys from .env.local file
 load_dotenv('.env.local')
@@ -13,6 +20,27 @@ load_dotenv('.env.local')
 OPENAI_MODEL = "gpt-5-mini"
 ANTHROPIC_MODEL = "claude-sonnet-4-20250514"
 
+MAX_CONCURRENT = 6  # Blocking SDK calls running in worker threads at once
+SAVE_EVERY_QUOTES = 20  # Save partial progress after this many finished quotes
+RESPONSE_CACHE_FILE = os.path.join(".llm_cache", "translate_quotes_openai.sqlite")
+
+# Errors worth retrying: rate limits, overload/server errors, dropped connections
+ANTHROPIC_RETRYABLE_ERRORS = (
+    anthropic.RateLimitError,
+    anthropic.InternalServerError,
+    anthropic.ServiceUnavailableError,
+    anthropic.OverloadedError,
+    anthropic.APIConnectionError,
+)
+
+# Translations already made for a prompt, so reruns skip unchanged quotes.
+# SQLite connections belong to their thread, so only the event loop uses it.
+response_cache = ResponseCache(RESPONSE_CACHE_FILE)
+semaphore = asyncio.Semaphore(MAX_CONCURRENT)
+# Translations being requested, by cache key, so a text repeated across
+# files is requested once even before its first result is cached
+inflight: dict[str, asyncio.Future] = {}
+
 # Language configurations
 KOREAN_PROMPT = """Translate this English business quote into natural, conversational Korean that Korean professionals actually use. Use -요/-해요 ending. For technical terms/jargon, add English in parentheses like '호기심 루프(curiosity loop)'. Avoid stiff literal translation. Be natural and conversational. Return ONLY the Korean translation.
 
@@ -63,6 +91,7 @@ Return ONLY the Spanish translation, nothing else."""
 }
 
 
+@retry_openai()
 def translate_to_korean_openai(openai_client: OpenAI, text: str) -> str:
     """Translate text to Korean using OpenAI API."""
     prompt = KOREAN_PROMPT.format(text=text)
@@ -81,6 +110,7 @@ def translate_to_korean_openai(openai_client: OpenAI, text: str) -> str:
     return response.choices[0].message.content.strip()
 
 
+@retry_on(ANTHROPIC_RETRYABLE_ERRORS)
 def translate_with_claude(anthropic_client: Anthropic, text: str, lang_code: str) -> str:
     """Translate text to Chinese or Spanish using Claude API."""
     prompt_template = CLAUDE_PROMPTS.get(lang_code)
@@ -103,43 +133,118 @@ def translate_with_claude(anthropic_client: Anthropic, text: str, lang_code: str
     return message.content[0].text.strip()
 
 
-def translate_quotes_in_file(
-    openai_client: OpenAI,
-    anthropic_client: Anthropic,
+def translation_cache_key(text: str, lang_code: str) -> str:
+    """Cache key for one translation: the model and prompt of its request."""
+    if lang_code == "ko":
+        return response_cache.key(OPENAI_MODEL, [{"role": "user", "content": KOREAN_PROMPT.format(text=text)}])
+    return response_cache.key(ANTHROPIC_MODEL, [{"role": "user", "content": CLAUDE_PROMPTS[lang_code].format(text=text)}])
+
+
+async def run_blocking(func, *args):
+    """Run a blocking SDK call in a worker thread once a request slot is free."""
+    async with semaphore:
+        return await asyncio.to_thread(func, *args)
+
+
+async def request_once(cache_key: str, func, *args):
+    """run_blocking, shared by every caller that needs the same translation at once."""
+    if cache_key not in inflight:
+        inflight[cache_key] = asyncio.ensure_future(run_blocking(func, *args))
+        inflight[cache_key].add_done_callback(lambda _: inflight.pop(cache_key, None))
+    return await inflight[cache_key]
+
+
+async def translate_quotes_in_file(
+    openai_clients: Iterator[OpenAI],
+    anthropic_clients: Iterator[Anthropic],
     quotes: list,
-    filename: str
+    file_path: Path
 ) -> tuple[list, int]:
-    """Translate all quotes in a file using hybrid approach."""
-    total_quotes = len(quotes)
+    """Translate the missing languages of a file's quotes using hybrid approach, saving progress as they finish."""
+    filename = file_path.name
+    # Quotes translated by an earlier, interrupted run are skipped
+    untranslated = [q for q in quotes if any(not q.get(f"text_{lang_code}") for lang_code in ("ko", "zh", "es"))]
+    total_quotes = len(untranslated)
+    translated_count = 0
     
-    for idx, quote in enumerate(quotes, start=1):
+    async def translate_quote(quote: dict):
+        nonlocal translated_count
         text = quote["text"]
         
-        # Translate to Korean using OpenAI
-        quote["text_ko"] = translate_to_korean_openai(openai_client, text)
-        time.sleep(2)
+        # Korean using OpenAI, Chinese and Spanish using Claude; cached
+        # translations are reused and only the rest are requested
+        keys = {
+            lang_code: translation_cache_key(text, lang_code)
+            for lang_code in ("ko", "zh", "es") if not quote.get(f"text_{lang_code}")
+        }
+        pending = {}
+        for lang_code, cache_key in keys.items():
+            cached = response_cache.get(cache_key)
+            if cached is not None:
+                quote[f"text_{lang_code}"] = cached
+            elif lang_code == "ko":
+                pending[lang_code] = request_once(cache_key, translate_to_korean_openai, next(openai_clients), text)
+            else:
+                pending[lang_code] = request_once(cache_key, translate_with_claude, next(anthropic_clients), text, lang_code)
         
-        # Translate to Chinese using Claude
-        quote["text_zh"] = translate_with_claude(anthropic_client, text, "zh")
-        time.sleep(2)
+        for lang_code, translation in zip(pending, await asyncio.gather(*pending.values())):
+            quote[f"text_{lang_code}"] = translation
+            response_cache.set(keys[lang_code], translation)
         
-        # Translate to Spanish using Claude
-        quote["text_es"] = translate_with_claude(anthropic_client, text, "es")
-        time.sleep(2)
+        translated_count += 1
+        print(f"  Translating {filename}: {translated_count}/{total_quotes} quotes")
         
-        print(f"  Translating {filename}: {idx}/{total_quotes} quotes")
+        # Written inline rather than in a thread, so two saves never race
+        if translated_count % SAVE_EVERY_QUOTES == 0:
+            save_quotes(file_path, quotes)
+    
+    # Languages and quotes don't depend on each other, so they all run side
+    # by side; rate limits are retried with backoff instead of a fixed sleep
+    await asyncio.gather(*(translate_quote(quote) for quote in untranslated))
     
     return quotes, total_quotes
 
 
-def main():
+def load_quotes(file_path: Path) -> list:
+    with open(file_path, "rb") as f:
+        return orjson.loads(f.read())
+
+
+def save_quotes(file_path: Path, quotes: list):
+    tmp_path = file_path.with_name(file_path.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(orjson.dumps(quotes, option=orjson.OPT_INDENT_2))
+    # Atomic rename, so a crash mid-write never leaves a torn file
+    os.replace(tmp_path, file_path)
+
+
+async def translate_file(openai_clients: Iterator[OpenAI], anthropic_clients: Iterator[Anthropic], file_path: Path) -> int:
+    """Load, translate and save one quotes file. Returns the number of quotes translated."""
+    filename = file_path.name
+    print(f"\nProcessing {filename}...")
+    
+    quotes = await asyncio.to_thread(load_quotes, file_path)
+    quotes, count = await translate_quotes_in_file(openai_clients, anthropic_clients, quotes, file_path)
+    if not count:
+        print(f"  -> {filename} is already translated")
+        return count
+    
+    await asyncio.to_thread(save_quotes, file_path, quotes)
+    
+    print(f"  -> Saved translations to {filename}")
+    return count
+
+
+def load_api_keys(provider: str) -> list[str]:
+    """API keys from <provider>_API_KEYS (comma-separated), else <provider>_API_KEY."""
+    api_keys = [key.strip() for key in os.environ.get(f"{provider}_API_KEYS", "").split(",") if key.strip()]
+    return api_keys or [os.environ.get(f"{provider}_API_KEY")]
+
+
+async def amain():
     base_dir = Path(__file__).parent
     output_dir = base_dir / "output"
     
-    # Initialize API clients
-    openai_client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))
-    anthropic_client = Anthropic(api_key=os.environ.get("ANTHROPIC_API_KEY"))
-    
     # Get all *_quotes.json files
     quote_files = sorted(output_dir.glob("*_quotes.json"))
     
@@ -154,32 +259,38 @@ def main():
     total_quotes_translated = 0
     errors = []
     
-    # Process each file
-    for file_path in quote_files:
-        filename = file_path.name
-        print(f"\nProcessing {filename}...")
+    # One API client per key, taking requests in turn; each provider's clients
+    # share a keep-alive pool sized to the request slots, so requests reuse
+    # warm connections instead of each paying a TLS handshake. SDK retries
+    # are off, since retry_openai() and retry_on() already back off.
+    limits = httpx.Limits(max_connections=MAX_CONCURRENT, max_keepalive_connections=MAX_CONCURRENT)
+    with openai.DefaultHttpxClient(
+        http2=True, limits=limits
+    ) as openai_http_client, anthropic.DefaultHttpxClient(
+        http2=True, limits=limits
+    ) as anthropic_http_client:
+        openai_clients = itertools.cycle([
+            OpenAI(api_key=api_key, http_client=openai_http_client, max_retries=0)
+            for api_key in load_api_keys("OPENAI")
+        ])
+        anthropic_clients = itertools.cycle([
+            Anthropic(api_key=api_key, http_client=anthropic_http_client, max_retries=0)
+            for api_key in load_api_keys("ANTHROPIC")
+        ])
         
-        try:
-            # Load quotes
-            with open(file_path, "r", encoding="utf-8") as f:
-                quotes = json.load(f)
-            
-            # Translate quotes
-            quotes, count = translate_quotes_in_file(
-                openai_client, anthropic_client, quotes, filename
-            )
-            total_quotes_translated += count
-            
-            # Save updated quotes back to file
-            with open(file_path, "w", encoding="utf-8") as f:
-                json.dump(quotes, f, indent=2, ensure_ascii=False)
-            
-            print(f"  -> Saved translations to {filename}")
-            
-        except Exception as e:
-            error_msg = f"{filename}: {str(e)}"
-            errors.append(error_msg)
-            print(f"  -> ERROR: {str(e)}")
+        # All files run at once; the shared semaphore keeps the total
+        # requests in flight bounded however many files there are
+        results = await asyncio.gather(
+            *(translate_file(openai_clients, anthropic_clients, file_path) for file_path in quote_files),
+            return_exceptions=True
+        )
+    
+    for file_path, result in zip(quote_files, results):
+        if isinstance(result, Exception):
+            errors.append(f"{file_path.name}: {str(result)}")
+            print(f"  -> ERROR in {file_path.name}: {str(result)}")
+        else:
+            total_quotes_translated += result
     
     # Print summary
     print("\n" + "=" * 50)
@@ -198,5 +309,9 @@ def main():
     print("=" * 50)
 
 
+def main():
+    asyncio.run(amain())
+
+
 if __name__ == "__main__":
     main()
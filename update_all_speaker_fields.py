@@ -3,31 +3,47 @@ Update all quote files with speaker_function and speaker_expertise from speaker_
 """
 
 import os
-import json
-import glob
+import functools
+from concurrent.futures import ProcessPoolExecutor
+import orjson
 
 # File paths
 PROFILES_FILE = "speaker_profiles.json"
 OUTPUT_DIR = "output"
 
+# (speaker_function, speaker_expertise) for speakers without a profile
+EMPTY_SPEAKER_FIELDS = ('', [])
+
 
 def load_speaker_profiles():
     """Load speaker profiles from JSON file."""
-    with open(PROFILES_FILE, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    with open(PROFILES_FILE, 'rb') as f:
+        return orjson.loads(f.read())
+
+
+def build_speaker_fields(profiles):
+    """Map each speaker to (function, expertise), looked up once instead of per quote."""
+    return {
+        speaker: (profile.get('function', ''), profile.get('expertise', []))
+        for speaker, profile in profiles.items()
+    }
 
 
 def get_quote_files():
     """Get all quote JSON files from output directory."""
-    pattern = os.path.join(OUTPUT_DIR, "*_quotes.json")
-    return sorted(glob.glob(pattern))
+    # scandir entries carry their file type, so no per-file stat is needed
+    with os.scandir(OUTPUT_DIR) as entries:
+        return sorted(
+            entry.path for entry in entries
+            if entry.name.endswith("_quotes.json") and entry.is_file()
+        )
 
 
-def update_quote_file(filepath, profiles):
+def update_quote_file(filepath, speaker_fields):
     """Update a single quote file with speaker information."""
     # Load quotes
-    with open(filepath, 'r', encoding='utf-8') as f:
-        quotes = json.load(f)
+    with open(filepath, 'rb') as f:
+        quotes = orjson.loads(f.read())
     
     # Track statistics
     quotes_updated = 0
@@ -39,44 +55,36 @@ def update_quote_file(filepath, profiles):
     for quote in quotes:
         speaker = quote.get('speaker', '')
         
-        if speaker in profiles:
-            profile = profiles[speaker]
-            
-            # Update speaker_function
-            old_function = quote.get('speaker_function')
-            new_function = profile.get('function', '')
-            if old_function != new_function:
-                function_updated += 1
-            quote['speaker_function'] = new_function
-            
-            # Update speaker_expertise
-            old_expertise = quote.get('speaker_expertise')
-            new_expertise = profile.get('expertise', [])
-            if old_expertise != new_expertise:
-                expertise_updated += 1
-            quote['speaker_expertise'] = new_expertise
-            
-            quotes_updated += 1
-        else:
-            # Speaker not found in profiles
+        fields = speaker_fields.get(speaker)
+        if fields is None:
+            # Speaker not found in profiles: set empty values
             speakers_not_found.add(speaker)
-            
-            # Set empty values
-            if quote.get('speaker_function') != '':
-                function_updated += 1
-            quote['speaker_function'] = ''
-            
-            if quote.get('speaker_expertise') != []:
-                expertise_updated += 1
-            quote['speaker_expertise'] = []
-            
-            quotes_updated += 1
+            fields = EMPTY_SPEAKER_FIELDS
+        new_function, new_expertise = fields
+        
+        # Update speaker_function
+        if quote.get('speaker_function') != new_function:
+            function_updated += 1
+        quote['speaker_function'] = new_function
+        
+        # Update speaker_expertise
+        if quote.get('speaker_expertise') != new_expertise:
+            expertise_updated += 1
+        quote['speaker_expertise'] = new_expertise
+        
+        quotes_updated += 1
     
-    # Save updated quotes
-    with open(filepath, 'w', encoding='utf-8') as f:
-        json.dump(quotes, f, indent=2, ensure_ascii=False)
+    # Save updated quotes, skipping files where nothing changed; the atomic
+    # rename means a crash mid-write never leaves a torn file
+    changed = function_updated + expertise_updated > 0
+    if changed:
+        tmp_path = filepath + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(orjson.dumps(quotes, option=orjson.OPT_INDENT_2))
+        os.replace(tmp_path, filepath)
     
     return {
+        'changed': changed,
         'quotes_updated': quotes_updated,
         'function_updated': function_updated,
         'expertise_updated': expertise_updated,
@@ -84,6 +92,14 @@ def update_quote_file(filepath, profiles):
     }
 
 
+def try_update_quote_file(filepath, speaker_fields):
+    """Run update_quote_file in a worker process. Returns (result, error message)."""
+    try:
+        return update_quote_file(filepath, speaker_fields), None
+    except Exception as e:
+        return None, str(e)
+
+
 def main():
     """Main function to update all quote files."""
     print("=" * 60)
@@ -93,6 +109,7 @@ def main():
     # Load speaker profiles
     profiles = load_speaker_profiles()
     print(f"\nLoaded {len(profiles)} speaker profiles from {PROFILES_FILE}")
+    speaker_fields = build_speaker_fields(profiles)
     
     # Get all quote files
     quote_files = get_quote_files()
@@ -105,12 +122,15 @@ def main():
     total_expertise_updated = 0
     all_speakers_not_found = set()
     
-    # Process each file
-    for filepath in quote_files:
-        filename = os.path.basename(filepath)
-        
-        try:
-            result = update_quote_file(filepath, profiles)
+    # Files are independent; parse and rewrite them across all cores
+    update = functools.partial(try_update_quote_file, speaker_fields=speaker_fields)
+    with ProcessPoolExecutor() as executor:
+        for filepath, (result, error) in zip(quote_files, executor.map(update, quote_files, chunksize=8)):
+            filename = os.path.basename(filepath)
+            
+            if error is not None:
+                print(f"Updating {filename}... ✗ Error: {error}")
+                continue
             
             total_files += 1
             total_quotes += result['quotes_updated']
@@ -118,12 +138,12 @@ def main():
             total_expertise_updated += result['expertise_updated']
             all_speakers_not_found.update(result['speakers_not_found'])
             
-            # Show progress
-            check = "✓" if not result['speakers_not_found'] else "⚠"
+            # Show progress; "=" marks a file left as it was
+            if result['speakers_not_found']:
+                check = "⚠"
+            else:
+                check = "✓" if result['changed'] else "="
             print(f"Updating {filename}... {check} {result['quotes_updated']} quotes")
-            
-        except Exception as e:
-            print(f"Updating {filename}... ✗ Error: {e}")
     
     # Print summary
     print("\n" + "=" * 60)